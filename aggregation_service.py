@@ -0,0 +1,135 @@
+# aggregation_service.py
+"""Camada de agregação memoizada, compartilhada entre as seções do dashboard.
+
+Cada resultado é guardado pela chave (versão do dataset, janela de datas,
+grão, dimensão, medidas, função). Um rerun que só muda um selectbox
+recalcula apenas o agregado afetado; os demais saem do cache. O cache é um
+LRU limitado em bytes e expõe contadores de acertos e faltas.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2  # 256 MB
+
+
+def _tamanho(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    return sys.getsizeof(valor)
+
+
+class ServicoAgregacao:
+    """Memoiza agregados do cubo diário com remoção LRU limitada por memória.
+
+    Os DataFrames retornados são compartilhados: quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave, calcular):
+        """Retorna o valor em cache para `chave` ou o calcula com `calcular()`."""
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.hits += 1
+                return self._entradas[chave][0]
+            self.misses += 1
+        # O cálculo acontece fora do lock para não serializar sessões diferentes
+        valor = calcular()
+        tamanho = _tamanho(valor)
+        with self._lock:
+            if chave not in self._entradas and tamanho <= self.max_bytes:
+                self._entradas[chave] = (valor, tamanho)
+                self._bytes += tamanho
+                while self._bytes > self.max_bytes:
+                    _, (_, removido) = self._entradas.popitem(last=False)
+                    self._bytes -= removido
+        return valor
+
+    @staticmethod
+    def _janela(inicio, fim):
+        if inicio is None or fim is None:
+            return None
+        return (pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize())
+
+    @staticmethod
+    def _recorte(cubo, janela):
+        return cubo if janela is None else cubo.fatiar(*janela)
+
+    def agregar(self, cubo, inicio, fim, por, medidas, group_by=None):
+        """Agregado do cubo por dimensão (ou "periodo" no grão `group_by`) na janela."""
+        janela = self._janela(inicio, fim)
+        grao = group_by if por == "periodo" else None
+        chave = (cubo.versao, janela, grao, por, tuple(medidas), "agregar")
+        return self.obter(chave, lambda: self._recorte(cubo, janela).agregar(por, medidas, group_by))
+
+    def total(self, cubo, inicio, fim, medida):
+        """Total (ou média derivada) de uma medida na janela."""
+        janela = self._janela(inicio, fim)
+        chave = (cubo.versao, janela, None, None, (medida,), "total")
+        return self.obter(chave, lambda: self._recorte(cubo, janela).total(medida))
+
+    def distintos(self, cubo, inicio, fim, dimensao):
+        """Número de valores distintos de uma dimensão na janela."""
+        janela = self._janela(inicio, fim)
+        chave = (cubo.versao, janela, None, dimensao, (), "distintos")
+        return self.obter(chave, lambda: self._recorte(cubo, janela).distintos(dimensao))
+
+    def momentos(self, cubo, inicio, fim):
+        """Momentos e histogramas das métricas numéricas na janela (None se o cubo não os tiver)."""
+        janela = self._janela(inicio, fim)
+        chave = (cubo.versao, janela, None, None, (), "momentos")
+        return self.obter(chave, lambda: self._recorte(cubo, janela).momentos())
+
+    def visao(self, cubo, inicio, fim):
+        """Visão da janela [inicio, fim] com a mesma interface de consulta do cubo."""
+        return VisaoAgregada(self, cubo, inicio, fim)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+            }
+
+
+class VisaoAgregada:
+    """Cubo restrito a uma janela; cada consulta passa pelo cache do serviço."""
+
+    def __init__(self, servico, cubo, inicio, fim):
+        self.servico = servico
+        self.cubo = cubo
+        self.inicio = inicio
+        self.fim = fim
+
+    @property
+    def empty(self):
+        return self.total("linhas") == 0
+
+    def tem(self, coluna):
+        return self.cubo.tem(coluna)
+
+    def total(self, medida):
+        return self.servico.total(self.cubo, self.inicio, self.fim, medida)
+
+    def distintos(self, dimensao):
+        return self.servico.distintos(self.cubo, self.inicio, self.fim, dimensao)
+
+    def agregar(self, por, medidas, group_by=None):
+        return self.servico.agregar(self.cubo, self.inicio, self.fim, por, medidas, group_by)
+
+    def momentos(self):
+        return self.servico.momentos(self.cubo, self.inicio, self.fim)
@@ -0,0 +1,245 @@
+# answer_cache.py
+"""Cache persistente de respostas do agente SQL (ask_sql_question.py).
+
+Cada entrada guarda a pergunta normalizada, todas as consultas SQL que o
+agente executou (na ordem), o resultado de cada uma, a resposta final e a
+versão dos dados (do histórico de cargas de load_data_to_sql.py) em que foi
+calculada. Uma pergunta repetida com a mesma versão é respondida sem chamar
+o LLM; se a versão mudou, apenas as consultas guardadas são reexecutadas. As entradas expiram por TTL e, acima do
+limite de tamanho, as menos usadas são removidas primeiro.
+
+O cache é um arquivo SQLite (biblioteca padrão), compartilhável entre processos.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import text
+
+LOAD_LOG_TABLE = "northwind_load_log"  # O mesmo nome usado em load_data_to_sql.py
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "northwind_answers.sqlite")
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+# Versão do formato das entradas; arquivos de versões anteriores são recriados
+VERSAO_ESQUEMA = 2
+
+
+def normalizar_pergunta(pergunta):
+    """Minúsculas, sem acentos, sem pontuação e com espaços simples."""
+    texto = unicodedata.normalize("NFKD", pergunta.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def versao_dados(connection, table_name="northwind_data"):
+    """Versão dos dados no banco: a última carga registrada ou, sem histórico, contagem e maior data."""
+    if connection.dialect.has_table(connection, LOAD_LOG_TABLE):
+        ultima = connection.execute(text(f"SELECT MAX(load_id) FROM {LOAD_LOG_TABLE}")).scalar()
+        if ultima is not None:
+            return f"carga:{ultima}"
+    total, maior = connection.execute(text(f"SELECT COUNT(*), MAX(order_date) FROM {table_name}")).one()
+    return f"tabela:{total}:{maior}"
+
+
+class CacheRespostas:
+    """Cache de respostas com TTL, remoção LRU por número de entradas e contadores."""
+
+    def __init__(self, caminho=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS, max_entradas=DEFAULT_MAX_ENTRIES):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self.reexecucoes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != VERSAO_ESQUEMA:
+            # Entradas antigas guardavam só a última consulta: não podem ser revalidadas
+            self._conn.execute("DROP TABLE IF EXISTS respostas")
+            self._conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+        # consultas e resultados: listas JSON, na ordem em que o agente executou as consultas
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " pergunta TEXT PRIMARY KEY, original TEXT, consultas TEXT, resultados TEXT, resposta TEXT,"
+            " versao TEXT, criado_em REAL, usado_em REAL, usos INTEGER DEFAULT 0)"
+        )
+        self._conn.commit()
+
+    def obter(self, pergunta):
+        """Entrada válida (dentro do TTL) para a pergunta, ou None. Não altera os contadores."""
+        chave = normalizar_pergunta(pergunta)
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT consultas, resultados, resposta, versao, criado_em FROM respostas WHERE pergunta = ?",
+                (chave,)
+            ).fetchone()
+            if linha is None:
+                return None
+            if time.time() - linha[4] > self.ttl:
+                self._conn.execute("DELETE FROM respostas WHERE pergunta = ?", (chave,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE respostas SET usado_em = ?, usos = usos + 1 WHERE pergunta = ?",
+                               (time.time(), chave))
+            self._conn.commit()
+        return {"consultas": json.loads(linha[0]), "resultados": json.loads(linha[1]),
+                "resposta": linha[2], "versao": linha[3]}
+
+    def guardar(self, pergunta, consultas, resultados, resposta, versao):
+        """Grava (ou substitui) a entrada da pergunta e remove as menos usadas acima do limite.
+
+        `consultas` e `resultados` são listas paralelas, na ordem de execução.
+        """
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas"
+                " (pergunta, original, consultas, resultados, resposta, versao, criado_em, usado_em)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalizar_pergunta(pergunta), pergunta, json.dumps(list(consultas), ensure_ascii=False),
+                 json.dumps(list(resultados), ensure_ascii=False), resposta, versao, agora, agora),
+            )
+            self._conn.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM respostas WHERE pergunta NOT IN"
+                " (SELECT pergunta FROM respostas ORDER BY usado_em DESC LIMIT ?)", (self.max_entradas,)
+            )
+            self._conn.commit()
+
+    def registrar(self, tipo):
+        """Incrementa um contador: "hit", "miss" ou "reexecucao"."""
+        with self._lock:
+            if tipo == "hit":
+                self.hits += 1
+            elif tipo == "miss":
+                self.misses += 1
+            else:
+                self.reexecucoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+            consultas = self.hits + self.misses + self.reexecucoes
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reexecucoes": self.reexecucoes,
+                "entradas": entradas,
+                # Reexecuções também evitam o agente: contam como respostas sem o loop do LLM
+                "taxa_sem_agente": (self.hits + self.reexecucoes) / consultas if consultas else 0.0,
+            }
+
+
+# ==============================
+# RESPOSTA COM CACHE
+# ==============================
+PROMPT_ATUALIZACAO = (
+    "A pergunta abaixo já foi respondida, mas os dados mudaram. Reescreva a resposta anterior "
+    "usando os novos resultados das mesmas consultas SQL, no mesmo idioma e formato.\n\n"
+    "Pergunta: {pergunta}\nResposta anterior: {resposta}\n\n{consultas}\n\nNova resposta:"
+)
+
+
+def sql_executado(passos):
+    """Consultas bem-sucedidas da ferramenta sql_db_query nos passos intermediários, na ordem.
+
+    Retorna (consultas, resultados): a resposta do agente pode combinar várias
+    consultas, e todas são necessárias para revalidá-la.
+    """
+    consultas, resultados = [], []
+    for acao, observacao in passos:
+        if getattr(acao, "tool", None) != "sql_db_query":
+            continue
+        entrada = acao.tool_input
+        consulta = entrada.get("query") if isinstance(entrada, dict) else entrada
+        if consulta and not str(observacao).startswith("Error"):
+            consultas.append(consulta)
+            resultados.append(str(observacao))
+    return consultas, resultados
+
+
+def _reexecutar(db, consultas):
+    """Resultados atuais de todas as consultas, ou None se alguma falhar."""
+    resultados = []
+    for consulta in consultas:
+        try:
+            resultados.append(str(db.run(consulta)))
+        except Exception as e:
+            logging.warning(f"Falha ao reexecutar o SQL em cache; consultando o agente: {e}")
+            return None
+    return resultados
+
+
+def _texto(mensagem):
+    return getattr(mensagem, "content", mensagem)
+
+
+def consultar_cache(pergunta, db, cache, versao, llm=None, config=None):
+    """Resposta servida pelo cache, como (resposta, origem, consultas), ou None quando o agente é necessário.
+
+    origem: "cache" (sem LLM nem SQL) ou "sql" (consultas guardadas
+    reexecutadas após mudança de versão dos dados). Uma falta é contabilizada aqui.
+    """
+    entrada = cache.obter(pergunta)
+    if entrada is not None and entrada["versao"] == versao:
+        cache.registrar("hit")
+        return entrada["resposta"], "cache", entrada["consultas"]
+
+    if entrada is not None and entrada["consultas"]:
+        consultas = entrada["consultas"]
+        resultados = _reexecutar(db, consultas)
+        if resultados is not None:
+            if resultados == entrada["resultados"]:
+                resposta = entrada["resposta"]
+            elif llm is not None:
+                # Uma única chamada para redigir a resposta, em vez do loop de ferramentas do agente
+                blocos = "\n\n".join(f"SQL {i}: {c}\nNovo resultado {i}: {r}"
+                                      for i, (c, r) in enumerate(zip(consultas, resultados), start=1))
+                resposta = _texto(llm.invoke(PROMPT_ATUALIZACAO.format(
+                    pergunta=pergunta, resposta=entrada["resposta"], consultas=blocos), config=config))
+            else:
+                resposta = "\n".join(resultados)
+            cache.guardar(pergunta, consultas, resultados, resposta, versao)
+            cache.registrar("reexecucao")
+            return resposta, "sql", consultas
+
+    cache.registrar("miss")
+    return None
+
+
+def guardar_saida(pergunta, saida, cache, versao):
+    """Guarda a saída do agente no cache; retorna (resposta, "agente", consultas)."""
+    consultas, resultados = sql_executado(saida.get("intermediate_steps", []))
+    if consultas:
+        # Só respostas baseadas em consultas SQL podem ser revalidadas quando os dados mudam
+        cache.guardar(pergunta, consultas, resultados, saida["output"], versao)
+    return saida["output"], "agente", consultas
+
+
+def responder(pergunta, agente, db, cache, versao, llm=None, config=None):
+    """Responde a pergunta usando o cache; retorna (resposta, origem, consultas).
+
+    origem: "cache", "sql" (ver `consultar_cache`) ou "agente" (loop completo do agente).
+    """
+    em_cache = consultar_cache(pergunta, db, cache, versao, llm, config)
+    if em_cache is not None:
+        return em_cache
+    return guardar_saida(pergunta, agente.invoke({"input": pergunta}, config=config), cache, versao)
+
+
+async def aresponder(pergunta, agente, db, cache, versao, llm=None, config=None):
+    """Versão assíncrona de `responder`, para o modo em lote: o agente roda pela API assíncrona."""
+    em_cache = await asyncio.to_thread(consultar_cache, pergunta, db, cache, versao, llm, config)
+    if em_cache is not None:
+        return em_cache
+    saida = await agente.ainvoke({"input": pergunta}, config=config)
+    return await asyncio.to_thread(guardar_saida, pergunta, saida, cache, versao)
@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import timedelta
+import os
+import time
+from parquet_cache import ParquetCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, hash_bytes
+from xlsx_ingest import VERSAO_ESQUEMA, pico_rss_mb
+from aggregation_service import ServicoAgregacao
+from chart_budget import OrcamentoPontos, MODO_AMOSTRA, MODO_DENSIDADE
+import dashboard_charts as charts
+from multi_ingest import ler_arquivos
+from period_index import ordenar_por_data
+from shared_source import DatasetCompartilhado, VersaoDataset, fonte_da_configuracao
+from stage_profiler import CuboPerfilado, PerfiladorEtapas, ativo_por_padrao
 
 # ==============================
 # CONFIGURAÇÕES INICIAIS E CSS
@@ -55,369 +64,393 @@ st.title("Northwind Traders | Dashboard Moderno")
 # ==============================
 # UPLOAD & FILTROS GLOBAIS (na home page)
 # ==============================
+# Com NORTHWIND_SOURCE definido, o app usa uma fonte compartilhada por todas as sessões
+# (caminho de um .xlsx ou .parquet, "sql" ou "sql:<tabela>") em vez do upload por sessão
+FONTE_COMPARTILHADA = os.getenv("NORTHWIND_SOURCE")
+# Com NORTHWIND_BACKEND=sql, KPIs, filtro de período e agregados são consultas no banco (DATABASE_URL)
+BACKEND_SQL = os.getenv("NORTHWIND_BACKEND", "").lower() == "sql"
+# Processos usados na leitura de vários arquivos/planilhas (padrão: número de CPUs)
+PROCESSOS_LEITURA = int(os.getenv("NORTHWIND_INGEST_PROCESSES", 0)) or None
+# Conjuntos de arquivos enviados mantidos em memória (os menos recentes saem primeiro) e tempo máximo de cada um;
+# fora da memória, um upload repetido volta do cache Parquet em disco
+UPLOADS_EM_MEMORIA = int(os.getenv("NORTHWIND_UPLOAD_CACHE_ENTRIES", 8))
+UPLOADS_TTL_MINUTOS = float(os.getenv("NORTHWIND_UPLOAD_CACHE_TTL_MINUTES", 60))
+
 with st.container():
     st.markdown("## Upload & Filtros Globais")
-    uploaded_file = st.file_uploader("Carregue seu arquivo .xlsx", type=["xlsx"])
-    
-# Função para carregar e processar os dados
-@st.cache_data(show_spinner=False)
-def load_and_process_data(uploaded_file):
-    df_raw = pd.read_excel(uploaded_file)
-    # Remover colunas redundantes (com "-2" no nome)
-    df_raw = df_raw.loc[:, ~df_raw.columns.str.contains('-2')]
-    
-    # Converter colunas de data (se existirem)
-    for col in ["order_date", "required_date", "shipped_date"]:
-        if col in df_raw.columns:
-            df_raw[col] = pd.to_datetime(df_raw[col], errors="coerce")
-    
-    # Calcular receita: unit_price * quantity * (1 - discount)
-    if all(col in df_raw.columns for col in ["unit_price", "quantity", "discount"]):
-        df_raw["revenue"] = df_raw["unit_price"] * df_raw["quantity"] * (1 - df_raw["discount"])
+    if FONTE_COMPARTILHADA or BACKEND_SQL:
+        uploaded_files = []
     else:
-        df_raw["revenue"] = 0
+        # Vários arquivos (ex.: uma exportação por mês) são lidos em paralelo e concatenados
+        uploaded_files = st.file_uploader("Carregue seus arquivos .xlsx", type=["xlsx"], accept_multiple_files=True)
+
+# Orçamento de pontos por gráfico: acima dele os gráficos em nível de linha são reduzidos
+with st.sidebar:
+    st.markdown("### Desempenho dos Gráficos")
+    orcamento = OrcamentoPontos(
+        max_pontos=st.number_input("Orçamento de pontos por gráfico", min_value=500, max_value=500_000,
+                                   value=5000, step=500),
+        modo=st.radio("Dispersões acima do orçamento", (MODO_AMOSTRA, MODO_DENSIDADE)),
+        limite_webgl=st.number_input("Usar WebGL acima de (pontos)", min_value=100, max_value=100_000,
+                                     value=1000, step=100),
+    )
+    # Diagnóstico opcional: tempo, memória alocada e tamanho da saída de cada etapa e gráfico
+    perfilador = PerfiladorEtapas(ativo=st.checkbox("Diagnóstico de desempenho", value=ativo_por_padrao(),
+                                                    key="diagnostico"))
     
-    # Selecionar as colunas essenciais (incluindo "revenue")
-    cols_essenciais = [
-        "order_id", "customer_id", "order_date", "required_date", "shipped_date",
-        "freight", "ship_country", "product_id", "product_name", "unit_price",
-        "quantity", "discount", "company_name", "category_name", "revenue"
-    ]
-    df = df_raw[[c for c in cols_essenciais if c in df_raw.columns]].copy()
-    return df
+# Cache Parquet compartilhado entre sessões e processos (configurável por variáveis de ambiente)
+# A versão do esquema acompanha a lógica de limpeza em xlsx_ingest, invalidando entradas antigas
+parquet_cache = ParquetCache(
+    cache_dir=os.getenv("NORTHWIND_CACHE_DIR", DEFAULT_CACHE_DIR),
+    max_bytes=int(os.getenv("NORTHWIND_CACHE_MAX_MB", DEFAULT_MAX_BYTES // 1024 ** 2)) * 1024 ** 2,
+    schema_version=VERSAO_ESQUEMA,
+)
+
+# Função para carregar e processar os dados
+# cache_resource: o DataFrame é compartilhado (somente leitura) e não é copiado a cada rerun,
+# o que permite que os recortes de período sejam fatias sem cópia
+@st.cache_resource(show_spinner=False, max_entries=UPLOADS_EM_MEMORIA, ttl=UPLOADS_TTL_MINUTOS * 60)
+def load_and_process_data(uploaded_files):
+    # O hash dos bytes de cada arquivo identifica a entrada no cache Parquet; só os arquivos ainda
+    # não processados são lidos, cada planilha em um processo do pool (openpyxl read-only, apenas as
+    # colunas essenciais, já com tipos compactos). Retorna o DataFrame e os tempos de cada planilha
+    df, leituras = ler_arquivos([(f.name, f.getvalue()) for f in uploaded_files],
+                                processos=PROCESSOS_LEITURA, cache=parquet_cache)
+    return ordenar_por_data(df), leituras
+
+# Dataset do upload com o índice de datas (usado por filtrar_periodo) e o cubo diário
+# pré-agregado, construídos uma vez por conjunto de arquivos e usados por todas as seções
+@st.cache_resource(show_spinner=False, max_entries=UPLOADS_EM_MEMORIA, ttl=UPLOADS_TTL_MINUTOS * 60)
+def carregar_dataset(uploaded_files):
+    versao = hash_bytes("".join(hash_bytes(f.getvalue()) for f in uploaded_files).encode())
+    origem = uploaded_files[0].name if len(uploaded_files) == 1 else f"{len(uploaded_files)} arquivos"
+    return VersaoDataset(load_and_process_data(uploaded_files)[0], versao, origem)
 
-# Se houver arquivo carregado, processa os dados e define o filtro de período
-if uploaded_file:
-    df_raw = load_and_process_data(uploaded_file)
-    if "order_date" in df_raw.columns:
-        min_date = df_raw["order_date"].min().date()
-        max_date = df_raw["order_date"].max().date()
+# Fonte compartilhada: carregada uma vez por processo e recarregada em segundo plano quando muda
+@st.cache_resource(show_spinner="Carregando a fonte de dados compartilhada...")
+def carregar_fonte_compartilhada():
+    return DatasetCompartilhado(fonte_da_configuracao(FONTE_COMPARTILHADA, parquet_cache),
+                                intervalo=int(os.getenv("NORTHWIND_RELOAD_SECONDS", 30)))
+
+# Serviço de agregação memoizado, compartilhado por todas as sessões do processo
+@st.cache_resource(show_spinner=False)
+def carregar_servico():
+    return ServicoAgregacao(max_bytes=int(os.getenv("NORTHWIND_AGG_CACHE_MB", 256)) * 1024 ** 2)
+
+# Backend SQL: engine com pool e tabela refletida, compartilhados por todas as sessões
+@st.cache_resource(show_spinner="Conectando ao banco de dados...")
+def carregar_backend_sql():
+    from sql_backend import BackendSql, DEFAULT_AMOSTRA_LINHAS, TABLE_NAME
+    return BackendSql(os.getenv("DATABASE_URL"), os.getenv("NORTHWIND_SQL_TABLE", TABLE_NAME),
+                      intervalo=int(os.getenv("NORTHWIND_RELOAD_SECONDS", 30)),
+                      max_linhas=int(os.getenv("NORTHWIND_SQL_SAMPLE_ROWS", DEFAULT_AMOSTRA_LINHAS)),
+                      servico=carregar_servico())
+
+# Função para filtrar por período: busca binária no índice e fatia contígua, sem máscara nem cópia
+def filtrar_periodo(indice, start, end):
+    return indice.fatiar(start, end)
+
+# A versão do dataset é lida uma única vez por execução: uma recarga em segundo plano
+# só passa a valer no próximo rerun, sem misturar versões na mesma página
+pico_leitura = None
+if BACKEND_SQL:
+    dataset = perfilador.medir("carregar_backend_sql", lambda: carregar_backend_sql().atual)
+    st.caption(f"Backend SQL: {dataset.origem} (consultas agregadas executadas no banco)")
+elif FONTE_COMPARTILHADA:
+    dataset = perfilador.medir("carregar_fonte_compartilhada", lambda: carregar_fonte_compartilhada().atual)
+    st.caption(f"Fonte compartilhada: {dataset.origem} "
+               f"(versão de {time.strftime('%d/%m/%Y %H:%M:%S', time.localtime(dataset.carregado_em))})")
+elif uploaded_files:
+    dataset = perfilador.medir("load_and_process_data", carregar_dataset, uploaded_files)
+    leituras = load_and_process_data(uploaded_files)[1]
+    pico_leitura = leituras.attrs["pico_rss_mb"]
+    with st.expander(f"Tempos de leitura por arquivo ({len(uploaded_files)} arquivo(s))"):
+        st.dataframe(leituras, hide_index=True)
+        st.caption(f"Leitura total: {leituras.attrs['total_segundos']:.1f}s em {leituras.attrs['processos']} "
+                   f"processo(s) (soma das planilhas: {leituras['segundos'].sum():.1f}s). "
+                   f"Linhas repetidas (order_id, product_id) removidas: {leituras.attrs['removidas']:,}."
+                   + (f" Maior pico de RSS nos processos de leitura: {pico_leitura:.0f} MB."
+                      if pd.notna(pico_leitura) else ""))
+else:
+    dataset = None
+
+# Se houver dados carregados, define o filtro de período
+if dataset is not None:
+    df_raw = dataset.df
+    cubo_raw = dataset.cubo
+    if df_raw is not None:
+        st.caption(
+            f"{len(df_raw):,} linhas | DataFrame: {df_raw.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB | "
+            f"Pico de RSS do processo: {pico_rss_mb():.0f} MB"
+            # A leitura roda no pool de processos: o pico dos workers não aparece no ru_maxrss deste
+            + (f" | Pico de RSS na leitura: {pico_leitura:.0f} MB" if pd.notna(pico_leitura) else "")
+        )
+    if dataset.indice is not None:
+        indice = dataset.indice
+        min_date = indice.min_date.date()
+        max_date = indice.max_date.date()
         # Filtro de período – indicação do formato brasileiro (dd/mm/aaaa)
         st.markdown("### Selecione o Período de Análise (dd/mm/aaaa)")
         start_date, end_date = st.date_input("Período de Análise", [min_date, max_date])
         if isinstance(start_date, list):
             start_date, end_date = start_date
-        # Função para filtrar por período
-        def filtrar_periodo(df, data_col, start, end):
-            mask = (df[data_col] >= pd.to_datetime(start)) & (df[data_col] <= pd.to_datetime(end))
-            return df[mask]
-        df = filtrar_periodo(df_raw, "order_date", start_date, end_date)
+        df = perfilador.medir("filtrar_periodo", filtrar_periodo, indice, start_date, end_date)
+        cubo = carregar_servico().visao(cubo_raw, start_date, end_date)
+        if df_raw is None:
+            # No backend SQL, os gráficos em nível de linha recebem uma amostra limitada da janela
+            st.caption(f"Gráficos em nível de linha: amostra de {len(df):,} de {cubo.total('linhas'):,} linhas do período.")
         # Definir período anterior para comparação – se aplicável
         delta_days = (end_date - start_date).days + 1
         prev_end_date = pd.to_datetime(start_date) - timedelta(days=1)
         prev_start_date = prev_end_date - timedelta(days=delta_days - 1)
-        df_previous = filtrar_periodo(df_raw, "order_date", prev_start_date, prev_end_date)
+        cubo_previous = carregar_servico().visao(cubo_raw, prev_start_date, prev_end_date)
+        if perfilador.ativo:
+            # Cada agregação pedida pelas seções vira uma etapa do diagnóstico
+            cubo = CuboPerfilado(cubo, perfilador)
+            cubo_previous = CuboPerfilado(cubo_previous, perfilador)
     else:
         df = df_raw.copy()
-        df_previous = pd.DataFrame(columns=df.columns)
+        cubo = carregar_servico().visao(cubo_raw, None, None)
+        cubo_previous = cubo_raw.vazio()
 else:
-    st.info("Por favor, carregue um arquivo .xlsx para iniciar a análise.")
+    st.info("Por favor, carregue um ou mais arquivos .xlsx para iniciar a análise.")
 
 # ==============================
 # FUNÇÕES AUXILIARES
 # ==============================
-def calcular_delta(novo_valor, antigo_valor):
-    # Se o valor anterior for zero ou inválido, retorna 0 (para evitar N/A)
-    if antigo_valor == 0 or pd.isnull(antigo_valor):
-        return 0
-    return (novo_valor - antigo_valor) / antigo_valor * 100
+# Indicadores e figuras vêm de dashboard_charts (também usado pelo relatório do report.py);
+# aqui ficam apenas os widgets e a disposição de cada seção
+def aviso_reducao(container, texto):
+    if texto:
+        container.caption(texto)
 
-def get_time_group(df, group_by):
-    df_temp = df.copy()
-    if group_by == "Dia":
-        df_temp["periodo"] = df_temp["order_date"].dt.date
-    elif group_by == "Mês":
-        df_temp["periodo"] = df_temp["order_date"].dt.to_period("M").astype(str)
-    else:
-        df_temp["periodo"] = df_temp["order_date"].dt.year.astype(str)
-    return df_temp
+def plotar(container, fig, **kwargs):
+    # Envio do gráfico ao navegador; no diagnóstico, a saída é o JSON da figura
+    with perfilador.etapa(f"grafico: {fig.layout.title.text or 'sem título'}", tipo="grafico") as info:
+        container.plotly_chart(fig, **kwargs)
+        if perfilador.ativo:
+            info["saida"] = fig
 
-def format_currency(val):
-    return f"R$ {val:,.2f}"
+def exibir(container, grafico, **kwargs):
+    aviso_reducao(container, grafico.aviso)
+    plotar(container, grafico.figura, use_container_width=True, **kwargs)
+
+def metricas(container, indicadores):
+    for coluna, (rotulo, valor, *delta) in zip(container.columns(len(indicadores)), indicadores):
+        coluna.metric(rotulo, valor, delta=delta[0] if delta else None)
 
 # ==============================
 # SEÇÃO: DASHBOARD GERAL
 # ==============================
-def render_dashboard(df, df_previous):
+def render_dashboard(cubo, cubo_previous, orcamento):
     st.header("Dashboard Geral")
-    # KPIs
-    total_revenue = df["revenue"].sum()
-    previous_revenue = df_previous["revenue"].sum() if not df_previous.empty else 0
-    delta_revenue = calcular_delta(total_revenue, previous_revenue)
-    
-    total_orders = df["order_id"].nunique() if "order_id" in df.columns else 0
-    previous_orders = df_previous["order_id"].nunique() if "order_id" in df_previous.columns else 0
-    delta_orders = calcular_delta(total_orders, previous_orders)
-    
-    total_freight = df["freight"].sum() if "freight" in df.columns else 0
-    total_quantity = df["quantity"].sum() if "quantity" in df.columns else 0
-    total_customers = df["company_name"].nunique() if "company_name" in df.columns else 0
-    avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-    avg_discount = df["discount"].mean() * 100 if "discount" in df.columns else 0
-    if "order_date" in df.columns and "shipped_date" in df.columns:
-        shipping_time = (df["shipped_date"] - df["order_date"]).dt.days
-        avg_shipping_time = shipping_time.mean()
-    else:
-        avg_shipping_time = 0
-    unique_products = df["product_id"].nunique() if "product_id" in df.columns else 0
-
+    # KPIs (lidos do cubo diário da janela atual e da anterior)
+    indicadores = charts.indicadores_gerais(cubo, cubo_previous)
     st.subheader("Principais Indicadores")
-    kpi_cols = st.columns(5)
-    kpi_cols[0].metric("Receita Total", format_currency(total_revenue),
-                        delta=f"{delta_revenue:.1f}%")
-    kpi_cols[1].metric("Nº de Pedidos", f"{total_orders:,}",
-                        delta=f"{delta_orders:.1f}%")
-    kpi_cols[2].metric("Custo de Frete", format_currency(total_freight))
-    kpi_cols[3].metric("Quantidade Vendida", f"{total_quantity:,}")
-    kpi_cols[4].metric("Nº de Clientes", f"{total_customers:,}")
-    
-    kpi_cols2 = st.columns(4)
-    kpi_cols2[0].metric("Ticket Médio", format_currency(avg_order_value))
-    kpi_cols2[1].metric("Desconto Médio", f"{avg_discount:.1f}%")
-    kpi_cols2[2].metric("Tempo Médio de Envio (dias)", f"{avg_shipping_time:.1f}")
-    kpi_cols2[3].metric("Produtos Únicos", f"{unique_products:,}")
+    metricas(st, indicadores[:5])
+    metricas(st, indicadores[5:])
     
     st.markdown("---")
     st.markdown("### Tendência de Receita")
     group_by = st.selectbox("Agrupar por:", ("Dia", "Mês", "Ano"), index=1, key="dash_group")
-    df_time = get_time_group(df, group_by)
-    df_grouped = df_time.groupby("periodo").agg({"revenue": "sum"}).reset_index().sort_values("periodo")
-    fig_area = px.area(df_grouped, x="periodo", y="revenue",
-                       title="Evolução da Receita ao Longo do Tempo",
-                       labels={"periodo": group_by, "revenue": "Receita (US$)"},
-                       color_discrete_sequence=["#4CA1AF"])
-    fig_area.update_traces(line=dict(width=3))
-    st.plotly_chart(fig_area, use_container_width=True)
+    exibir(st, charts.grafico_tendencia_receita(cubo, group_by, orcamento))
 
 # ==============================
 # SEÇÃO: ANÁLISES DE VENDAS
 # ==============================
-def render_vendas(df):
+def render_vendas(cubo, orcamento):
     st.header("Análises de Vendas")
     st.markdown("#### Evolução da Receita e Número de Pedidos")
     group_by = st.selectbox("Agrupar por:", ("Dia", "Mês", "Ano"), index=1, key="vendas_group")
-    df_time = get_time_group(df, group_by)
-    sales_by_time = df_time.groupby("periodo").agg({
-        "revenue": "sum",
-        "order_id": pd.Series.nunique
-    }).reset_index().sort_values("periodo")
-    fig_line = px.line(sales_by_time, x="periodo", y="revenue", markers=True,
-                       title="Receita ao Longo do Tempo",
-                       labels={"periodo": group_by, "revenue": "Receita (US$)"},
-                       color_discrete_sequence=["#2C3E50"])
-    st.plotly_chart(fig_line, use_container_width=True)
+    exibir(st, charts.grafico_receita_pedidos(cubo, group_by, orcamento))
     
     st.markdown("#### Top 10 Produtos por Receita")
-    if "product_name" in df.columns:
-        prod_sales = df.groupby("product_name")["revenue"].sum().reset_index()
-        prod_sales = prod_sales.sort_values("revenue", ascending=False).head(10)
-        fig_bar = px.bar(prod_sales, x="revenue", y="product_name", orientation="h",
-                         title="Produtos com Maior Receita",
-                         labels={"product_name": "Produto", "revenue": "Receita (US$)"},
-                         color="revenue", color_continuous_scale=px.colors.sequential.Plasma)
-        fig_bar.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if cubo.tem("product_name"):
+        exibir(st, charts.grafico_top_produtos_receita(cubo.agregar("product_name", ["revenue"])),
+               key="vendas_top_produtos")
     
     st.markdown("#### Receita por Categoria")
-    if "category_name" in df.columns:
-        cat_sales = df.groupby("category_name")["revenue"].sum().reset_index()
-        fig_pie = px.pie(cat_sales, names="category_name", values="revenue",
-                         title="Distribuição de Receita por Categoria",
-                         color_discrete_sequence=px.colors.sequential.RdBu)
-        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_pie, use_container_width=True)
+    if cubo.tem("category_name"):
+        exibir(st, charts.grafico_receita_categoria(cubo))
 
 # ==============================
 # SEÇÃO: ANÁLISES DE QUANTIDADE
 # ==============================
-def render_quantidade(df):
+def render_quantidade(cubo, df, orcamento):
     st.header("Análises de Quantidade")
     st.markdown("#### Quantidade Vendida ao Longo do Tempo")
     group_by = st.selectbox("Agrupar por:", ("Dia", "Mês", "Ano"), index=1, key="qtd_group")
-    df_time = get_time_group(df, group_by)
-    qty_by_time = df_time.groupby("periodo").agg({"quantity": "sum"}).reset_index().sort_values("periodo")
-    fig_area = px.area(qty_by_time, x="periodo", y="quantity",
-                       title="Quantidade Vendida ao Longo do Tempo",
-                       labels={"periodo": group_by, "quantity": "Quantidade"},
-                       color_discrete_sequence=["#4CA1AF"])
-    fig_area.update_traces(line=dict(width=3))
-    st.plotly_chart(fig_area, use_container_width=True)
+    exibir(st, charts.grafico_quantidade_tempo(cubo, group_by, orcamento))
     
     st.markdown("#### Top 10 Destinos (Países) por Quantidade")
-    if "ship_country" in df.columns:
-        dest_qty = df.groupby("ship_country")["quantity"].sum().reset_index()
-        dest_qty = dest_qty.sort_values("quantity", ascending=False).head(10)
-        fig_bar = px.bar(dest_qty, x="quantity", y="ship_country", orientation="h",
-                         title="Países com Maior Quantidade Vendida",
-                         labels={"ship_country": "País", "quantity": "Quantidade"},
-                         color="quantity", color_continuous_scale=px.colors.sequential.Viridis)
-        fig_bar.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if cubo.tem("ship_country"):
+        exibir(st, charts.grafico_top_paises_quantidade(cubo))
     
     st.markdown("#### Distribuição da Quantidade por Pedido")
-    fig_hist = px.histogram(df, x="quantity", nbins=20,
-                            title="Histograma da Quantidade por Pedido",
-                            labels={"quantity": "Quantidade"},
-                            color_discrete_sequence=["#2C3E50"])
-    st.plotly_chart(fig_hist, use_container_width=True)
+    exibir(st, charts.grafico_histograma_quantidade(df, orcamento))
 
 # ==============================
 # SEÇÃO: ANÁLISES DE CLIENTES
 # ==============================
-def render_clientes(df):
+def render_clientes(cubo):
     st.header("Análises de Clientes")
     st.markdown("#### Top 10 Clientes por Receita")
-    if "company_name" in df.columns:
-        cust = df.groupby("company_name").agg({
-            "order_id": "nunique",
-            "revenue": "sum",
-            "quantity": "sum"
-        }).reset_index().rename(columns={"order_id": "n_pedidos"})
-        cust = cust.sort_values("revenue", ascending=False).head(10)
-        fig_bar = px.bar(cust, x="revenue", y="company_name", orientation="h",
-                         title="Clientes com Maior Receita",
-                         labels={"company_name": "Cliente", "revenue": "Receita (US$)"},
-                         color="revenue", color_continuous_scale=px.colors.sequential.Teal)
-        fig_bar.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if cubo.tem("company_name"):
+        top_clientes, pedidos_receita = charts.graficos_clientes(cubo)
+        exibir(st, top_clientes)
         
         st.markdown("#### Relação: Número de Pedidos x Receita")
-        fig_scatter = px.scatter(cust, x="n_pedidos", y="revenue",
-                                 size="quantity", hover_name="company_name",
-                                 title="Pedidos vs. Receita por Cliente",
-                                 labels={"n_pedidos": "Nº de Pedidos", "revenue": "Receita (US$)", "quantity": "Quantidade Total"},
-                                 color="revenue", color_continuous_scale=px.colors.sequential.Cividis)
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        exibir(st, pedidos_receita)
     else:
         st.warning("Coluna 'company_name' não encontrada.")
 
 # ==============================
 # SEÇÃO: ANÁLISE DE PRODUTOS
 # ==============================
-def render_produtos(df):
+def render_produtos(cubo, df, orcamento):
     st.header("Análise de Produtos")
     cols = st.columns(4)
-    if "product_id" in df.columns:
-        cols[0].metric("Total de Produtos", f"{df['product_id'].nunique():,}")
-    if "quantity" in df.columns:
-        avg_qty = df.groupby("product_id")["quantity"].sum().mean()
-        cols[1].metric("Qtd Média por Produto", f"{avg_qty:.1f}")
-    if "unit_price" in df.columns:
-        cols[2].metric("Preço Médio", format_currency(df["unit_price"].mean()))
-    if "category_name" in df.columns:
-        cols[3].metric("Total de Categorias", f"{df['category_name'].nunique():,}")
+    for coluna, (rotulo, valor) in zip(cols, charts.indicadores_produtos(cubo)):
+        coluna.metric(rotulo, valor)
+    
+    # Uma única reagregação por produto atende aos dois rankings abaixo
+    if cubo.tem("product_name"):
+        prod_all = cubo.agregar("product_name", ["revenue", "quantity"])
     
     st.markdown("---")
     st.markdown("#### Top 10 Produtos por Receita")
-    if "product_name" in df.columns:
-        prod = df.groupby("product_name").agg({
-            "revenue": "sum",
-            "quantity": "sum"
-        }).reset_index().sort_values("revenue", ascending=False).head(10)
-        fig_bar = px.bar(prod, x="revenue", y="product_name", orientation="h",
-                         title="Produtos com Maior Receita",
-                         labels={"product_name": "Produto", "revenue": "Receita (US$)"},
-                         color="revenue", color_continuous_scale=px.colors.sequential.Plasma)
-        fig_bar.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if cubo.tem("product_name"):
+        exibir(st, charts.grafico_top_produtos_receita(prod_all), key="produtos_top_receita")
     
     st.markdown("#### Top 10 Produtos por Quantidade Vendida")
-    if "product_name" in df.columns:
-        prod_qty = df.groupby("product_name")["quantity"].sum().reset_index().sort_values("quantity", ascending=False).head(10)
-        fig_bar_qty = px.bar(prod_qty, x="quantity", y="product_name", orientation="h",
-                             title="Produtos com Maior Quantidade Vendida",
-                             labels={"product_name": "Produto", "quantity": "Quantidade"},
-                             color="quantity", color_continuous_scale=px.colors.sequential.Teal)
-        fig_bar_qty.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar_qty, use_container_width=True)
+    if cubo.tem("product_name"):
+        exibir(st, charts.grafico_top_produtos_quantidade(prod_all))
     
     st.markdown("#### Análise de Preço e Desconto")
     col1, col2 = st.columns(2)
     if "unit_price" in df.columns:
-        fig_price = px.histogram(df, x="unit_price", nbins=30,
-                                 title="Distribuição de Preços Unitários",
-                                 labels={"unit_price": "Preço Unitário (US$)"},
-                                 color_discrete_sequence=["#3498DB"])
-        col1.plotly_chart(fig_price, use_container_width=True)
-    if "discount" in df.columns and df["discount"].gt(0).any():
-        df_disc = df[df["discount"] > 0].copy()
-        df_disc["discount_pct"] = df_disc["discount"] * 100
-        fig_disc = px.scatter(df_disc, x="unit_price", y="discount_pct",
-                              title="Preço vs. Desconto",
-                              labels={"unit_price": "Preço Unitário (US$)", "discount_pct": "Desconto (%)"},
-                              size="quantity", color="quantity",
-                              color_continuous_scale="Blues", opacity=0.7)
-        col2.plotly_chart(fig_disc, use_container_width=True)
+        exibir(col1, charts.grafico_histograma_precos(df, orcamento))
+    preco_desconto = charts.grafico_preco_desconto(df, orcamento)
+    if preco_desconto is not None:
+        exibir(col2, preco_desconto)
 
 # ==============================
 # SEÇÃO: SEGMENTAÇÕES AVANÇADAS
 # ==============================
-def render_segmentacoes(df):
+def render_segmentacoes(cubo, df, orcamento):
     st.header("Segmentações Avançadas")
     
     st.markdown("#### Mapa de Correlação entre Variáveis Numéricas")
-    num_df = df.select_dtypes(include=np.number)
-    if not num_df.empty:
-        corr = num_df.corr()
-        fig_corr = px.imshow(corr, text_auto=True, aspect="auto",
-                             color_continuous_scale=px.colors.sequential.RdBu,
-                             title="Correlação entre Variáveis Numéricas")
-        st.plotly_chart(fig_corr, use_container_width=True)
+    momentos = charts.momentos_janela(cubo, df)
+    if momentos.n > 1:
+        exibir(st, charts.grafico_correlacao(momentos))
     else:
         st.warning("Sem variáveis numéricas suficientes.")
     
     st.markdown("#### Scatter Matrix de Métricas Estratégicas")
     # Scatter Matrix para visualizar relações entre receita, frete, quantidade e desconto
-    if not num_df.empty:
-        fig_matrix = px.scatter_matrix(df,
-                                       dimensions=["revenue", "freight", "quantity", "discount"],
-                                       title="Matriz de Dispersão: Receita, Frete, Quantidade e Desconto",
-                                       color="revenue",
-                                       color_continuous_scale=px.colors.sequential.Viridis)
-        st.plotly_chart(fig_matrix, use_container_width=True)
+    if momentos.n > 1:
+        exibir(st, charts.grafico_matriz_dispersao(df, orcamento))
+
+    st.markdown("#### Distribuições Marginais")
+    if momentos.n > 0:
+        exibir(st, charts.grafico_marginais(momentos))
     
     st.markdown("#### Frete Médio por País")
-    if "ship_country" in df.columns:
-        freight_by_country = df.groupby("ship_country")["freight"].mean().reset_index()
-        fig_bar_freight = px.bar(freight_by_country, x="ship_country", y="freight",
-                                 title="Frete Médio por País",
-                                 labels={"ship_country": "País", "freight": "Frete Médio (US$)"},
-                                 color="freight", color_continuous_scale=px.colors.sequential.Plasma)
-        st.plotly_chart(fig_bar_freight, use_container_width=True)
+    if cubo.tem("ship_country") and cubo.tem("freight"):
+        exibir(st, charts.grafico_frete_pais(cubo))
     
     st.markdown("#### Tempo de Envio Médio por Mês")
-    if "order_date" in df.columns and "shipped_date" in df.columns:
-        df_time = get_time_group(df, "Mês")
-        df_time["shipping_time"] = (df_time["shipped_date"] - df_time["order_date"]).dt.days
-        avg_shipping_by_period = df_time.groupby("periodo")["shipping_time"].mean().reset_index()
-        fig_line_shipping = px.line(avg_shipping_by_period, x="periodo", y="shipping_time",
-                                    title="Tempo de Envio Médio por Mês",
-                                    labels={"periodo": "Mês", "shipping_time": "Dias Médios para Envio"},
-                                    markers=True, color_discrete_sequence=["#2C3E50"])
-        st.plotly_chart(fig_line_shipping, use_container_width=True)
+    if cubo.tem("shipping_days_sum"):
+        exibir(st, charts.grafico_tempo_envio(cubo))
     
     st.markdown("#### Bubble Chart: Receita, Desconto e Quantidade")
-    fig_bubble = px.scatter(df, x="discount", y="revenue",
-                            size="quantity", hover_name="product_name",
-                            title="Relação entre Desconto, Receita e Quantidade",
-                            labels={"discount": "Desconto", "revenue": "Receita (US$)", "quantity": "Quantidade"},
-                            color="quantity", color_continuous_scale=px.colors.sequential.Inferno, opacity=0.7)
-    st.plotly_chart(fig_bubble, use_container_width=True)
+    exibir(st, charts.grafico_bolhas(df, orcamento))
+
+# ==============================
+# NAVEGAÇÃO E TEMPOS POR SEÇÃO
+# ==============================
+RENDERIZADORES = {
+    "Dashboard Geral": render_dashboard,
+    "Vendas": render_vendas,
+    "Quantidade": render_quantidade,
+    "Clientes": render_clientes,
+    "Produtos": render_produtos,
+    "Segmentações": render_segmentacoes,
+}
+
+# Cada seção roda em um fragmento: interações com os widgets dela reexecutam só a própria seção
+@st.fragment
+def renderizar_secao(nome, *args):
+    inicio = time.perf_counter()
+    with perfilador.etapa(RENDERIZADORES[nome].__name__, tipo="secao"):
+        RENDERIZADORES[nome](*args)
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    st.session_state.setdefault("tempos_secoes", {})[nome] = duracao_ms
+    st.caption(f"Tempo de renderização da seção: {duracao_ms:,.0f} ms")
 
 # ==============================
-# ROTEIRO PRINCIPAL – EXIBIÇÃO DE TODAS AS SEÇÕES
+# ROTEIRO PRINCIPAL – EXIBIÇÃO DAS SEÇÕES
 # ==============================
-if uploaded_file:
-    render_dashboard(df, df_previous)
-    st.markdown("##")
-    render_vendas(df)
-    st.markdown("##")
-    render_quantidade(df)
-    st.markdown("##")
-    render_clientes(df)
-    st.markdown("##")
-    render_produtos(df)
-    st.markdown("##")
-    render_segmentacoes(df)
+if dataset is not None:
+    with st.sidebar:
+        st.markdown("### Navegação")
+        modo_navegacao = st.radio("Exibir", ("Uma seção por vez", "Todas as seções"), key="modo_navegacao")
+    argumentos = {
+        "Dashboard Geral": (cubo, cubo_previous, orcamento),
+        "Vendas": (cubo, orcamento),
+        "Quantidade": (cubo, df, orcamento),
+        "Clientes": (cubo,),
+        "Produtos": (cubo, df, orcamento),
+        "Segmentações": (cubo, df, orcamento),
+    }
+    if modo_navegacao == "Uma seção por vez":
+        # Apenas a seção ativa é calculada e serializada
+        secoes = [st.radio("Seção", list(RENDERIZADORES), horizontal=True, key="secao_ativa")]
+    else:
+        secoes = list(RENDERIZADORES)
+    for i, nome in enumerate(secoes):
+        if i:
+            st.markdown("##")
+        renderizar_secao(nome, *argumentos[nome])
+
+    with st.expander("Tempos de renderização por seção"):
+        tempos = st.session_state.get("tempos_secoes", {})
+        st.dataframe(
+            pd.DataFrame({"Seção": list(tempos), "Tempo (ms)": [round(t, 1) for t in tempos.values()]}),
+            hide_index=True,
+        )
+        stats_agg = carregar_servico().estatisticas()
+        st.caption(
+            f"Cache de agregações: {stats_agg['hits']} acertos, {stats_agg['misses']} faltas, "
+            f"{stats_agg['entradas']} entradas ({stats_agg['bytes'] / 1024 ** 2:.1f} MB)"
+        )
 else:
     st.info("Carregue um arquivo .xlsx para iniciar a análise.")
+
+# ==============================
+# DIAGNÓSTICO DE DESEMPENHO (opcional)
+# ==============================
+if perfilador.ativo:
+    contexto = {
+        "data": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "sessao": st.session_state.setdefault("id_sessao", os.urandom(4).hex()),
+        "origem": getattr(dataset, "origem", None),
+        "linhas": None if dataset is None or dataset.df is None else len(dataset.df),
+    }
+    with st.expander("Diagnóstico de desempenho"):
+        tabela_diagnostico = perfilador.tabela()
+        st.dataframe(
+            tabela_diagnostico.rename(columns={
+                "etapa": "Etapa", "tipo": "Tipo", "nivel": "Nível", "ms": "Tempo (ms)",
+                "ms_proprio": "Tempo próprio (ms)", "alocado_mb": "Memória alocada (MB)", "saida_kb": "Saída (KB)",
+            }),
+            hide_index=True,
+        )
+        st.caption("Tempo próprio: tempo fora das etapas internas (numa seção, a construção das figuras e os widgets). "
+                   "Saída: bytes do DataFrame ou do JSON da figura enviada ao navegador.")
+        st.download_button("Exportar diagnóstico (JSON)", perfilador.como_json(**contexto),
+                           file_name="diagnostico_northwind.json", mime="application/json")
+    # Com NORTHWIND_PROFILE_LOG, cada execução é acrescentada ao arquivo (JSONL) para agregação entre sessões
+    if os.getenv("NORTHWIND_PROFILE_LOG"):
+        perfilador.anexar_log(os.getenv("NORTHWIND_PROFILE_LOG"), **contexto)
@@ -1,88 +1,296 @@
-# 2_ask_sql_question.py
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from langchain_community.utilities.sql_database import SQLDatabase
-from langchain_openai import ChatOpenAI
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain.agents import create_sql_agent, AgentExecutor
-import logging
-
-# Configuração do logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
-
-# Pegar credenciais do ambiente
-DATABASE_URL = os.getenv("DATABASE_URL")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-TABLE_NAME = "northwind_data" # O mesmo nome de tabela usado no script 1
-
-# Verificar se as variáveis de ambiente foram carregadas
-if not DATABASE_URL:
-    logging.error("Erro: A variável de ambiente DATABASE_URL não está definida no .env.")
-    exit()
-if not OPENAI_API_KEY:
-    logging.error("Erro: A variável de ambiente OPENAI_API_KEY não está definida no .env.")
-    exit()
-
-def ask_sql_database():
-    """Configura o agente Langchain e permite fazer perguntas ao banco de dados."""
-    try:
-        logging.info("Conectando ao banco de dados SQL Server...")
-        engine = create_engine(DATABASE_URL)
-
-        # Criar a instância do SQLDatabase do Langchain
-        # include_tables: Especifica quais tabelas o agente deve considerar. MUITO IMPORTANTE!
-        logging.info(f"Configurando Langchain para acessar a tabela: {TABLE_NAME}")
-        db = SQLDatabase(engine=engine, include_tables=[TABLE_NAME])
-
-        # Configurar o modelo LLM (GPT-4o)
-        logging.info("Configurando o modelo LLM (gpt-4o)...")
-        llm = ChatOpenAI(model="gpt-4o", temperature=0, openai_api_key=OPENAI_API_KEY)
-
-        # Criar o Toolkit e o Agente SQL
-        # O toolkit fornece as ferramentas necessárias para o agente interagir com o DB
-        logging.info("Criando o SQL Agent Toolkit...")
-        toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-
-        logging.info("Criando o SQL Agent Executor...")
-        # agent_type="openai-tools": Utiliza as capacidades de "tools" da OpenAI
-        # verbose=True: Mostra os pensamentos e ações do agente (útil para debug)
-        agent_executor = create_sql_agent(
-            llm=llm,
-            toolkit=toolkit,
-            verbose=True,
-            agent_type="openai-tools"
-        )
-
-        logging.info("Agente SQL pronto. Digite sua pergunta ou 'sair' para terminar.")
-
-        # Loop para fazer perguntas
-        while True:
-            user_question = input("\nSua pergunta: ")
-            if user_question.lower() in ['sair', 'exit', 'quit']:
-                logging.info("Encerrando...")
-                break
-            if not user_question:
-                continue
-
-            # Invocar o agente com a pergunta
-            try:
-                logging.info(f"Processando pergunta: {user_question}")
-                # O agente decide se precisa consultar o DB, qual query usar, etc.
-                result = agent_executor.invoke({"input": user_question})
-                print("\nResposta:")
-                print(result['output'])
-            except Exception as e:
-                logging.error(f"Erro ao processar a pergunta: {e}")
-                print("\nOcorreu um erro ao tentar obter a resposta. Verifique os logs.")
-                logging.exception("Detalhes do erro:") # Loga o stack trace
-
-    except Exception as e:
-        logging.error(f"Ocorreu um erro inesperado na configuração ou execução: {e}")
-        logging.exception("Detalhes do erro:")
-
-if __name__ == "__main__":
-    ask_sql_database()
\ No newline at end of file
+# 2_ask_sql_question.py
+import os
+import time
+import argparse
+import asyncio
+import json
+INICIO_PROCESSO = time.perf_counter()
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from db_engine import criar_engine_pool
+import logging
+from answer_cache import CacheRespostas, DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, aresponder, responder, versao_dados
+from schema_card import cartao_como_texto, gerar_cartao, ler_cartao
+from sql_guardrails import (ExecutorProtegido, DEFAULT_CUSTO_MAXIMO, DEFAULT_MAX_LINHAS, DEFAULT_TAMANHO_BLOCO,
+                            DEFAULT_TIMEOUT_S)
+# Os imports do langchain (os mais pesados) acontecem apenas em criar_llm e criar_agente
+
+# Configuração do logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Carregar variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Pegar credenciais do ambiente
+DATABASE_URL = os.getenv("DATABASE_URL")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+TABLE_NAME = "northwind_data" # O mesmo nome de tabela usado no script 1
+
+# Cache persistente de respostas (pergunta normalizada + SQL executado + resultado)
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", DEFAULT_CACHE_PATH)
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", 24))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+# Proteções para o SQL gerado pelo agente (limite de linhas, tempo limite e orçamento de custo do plano)
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", DEFAULT_MAX_LINHAS))
+SQL_TIMEOUT_SECONDS = float(os.getenv("SQL_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_S))
+SQL_MAX_COST = float(os.getenv("SQL_MAX_COST", DEFAULT_CUSTO_MAXIMO))
+SQL_FETCH_CHUNK = int(os.getenv("SQL_FETCH_CHUNK", DEFAULT_TAMANHO_BLOCO))
+
+# Perguntas simultâneas no modo em lote
+DEFAULT_CONCORRENCIA = 4
+
+# Ferramentas de descoberta dispensadas: o cartão de esquema já vai no prompt
+FERRAMENTAS_DESCOBERTA = ("sql_db_list_tables", "sql_db_schema")
+
+# Verificar se as variáveis de ambiente foram carregadas
+if not DATABASE_URL:
+    logging.error("Erro: A variável de ambiente DATABASE_URL não está definida no .env.")
+    exit()
+if not OPENAI_API_KEY:
+    logging.error("Erro: A variável de ambiente OPENAI_API_KEY não está definida no .env.")
+    exit()
+
+def carregar_cartao(engine):
+    """Cartão de esquema gravado pelo loader; se ausente ou de outra versão, gera um na hora."""
+    with engine.connect() as connection:
+        versao = versao_dados(connection, TABLE_NAME)
+        cartao = ler_cartao(connection, TABLE_NAME)
+        if cartao is None or cartao["versao"] != versao:
+            logging.warning("Cartão de esquema ausente ou desatualizado; gerando agora "
+                            "(execute load_data_to_sql.py para deixá-lo pré-calculado).")
+            cartao = gerar_cartao(connection, TABLE_NAME, versao)
+    logging.info(f"Cartão de esquema de '{TABLE_NAME}' (versão {cartao['versao']}, {len(cartao['colunas'])} colunas).")
+    return cartao
+
+def criar_contador():
+    """Callback que conta as chamadas ao LLM e os tokens usados (o loop do agente faz várias por pergunta)."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class ContadorChamadas(BaseCallbackHandler):
+        def __init__(self):
+            self.chamadas = 0
+            self.tokens = {"prompt": 0, "completion": 0, "total": 0}
+
+        def on_llm_start(self, *args, **kwargs):
+            self.chamadas += 1
+
+        def on_chat_model_start(self, *args, **kwargs):
+            self.chamadas += 1
+
+        def on_llm_end(self, response, **kwargs):
+            # usage_metadata da mensagem (presente também no streaming, com stream_usage=True);
+            # sem ela, o token_usage agregado em llm_output
+            usos = [g.message.usage_metadata for lista in response.generations for g in lista
+                    if getattr(getattr(g, "message", None), "usage_metadata", None)]
+            if usos:
+                for uso in usos:
+                    self.tokens["prompt"] += uso.get("input_tokens") or 0
+                    self.tokens["completion"] += uso.get("output_tokens") or 0
+                    self.tokens["total"] += uso.get("total_tokens") or 0
+                return
+            uso = (response.llm_output or {}).get("token_usage") or {}
+            for chave in self.tokens:
+                self.tokens[chave] += uso.get(f"{chave}_tokens") or 0
+
+    return ContadorChamadas()
+
+def criar_llm():
+    """Cria o LLM com um contador de chamadas; retorna (llm, contador)."""
+    from langchain_openai import ChatOpenAI
+
+    contador = criar_contador()
+    # stream_usage: o uso de tokens vem em usage_metadata mesmo quando a resposta é transmitida em partes
+    llm = ChatOpenAI(model="gpt-4o", temperature=0, openai_api_key=OPENAI_API_KEY, stream_usage=True,
+                     callbacks=[contador])
+    return llm, contador
+
+def criar_agente(engine, llm, cartao):
+    """Cria o agente SQL com o cartão de esquema no prompt e sem as ferramentas de descoberta."""
+    from langchain_community.utilities.sql_database import SQLDatabase
+    from langchain_community.agent_toolkits import SQLDatabaseToolkit
+    from langchain.agents import create_sql_agent
+
+    class ToolkitSemDescoberta(SQLDatabaseToolkit):
+        def get_tools(self):
+            return [t for t in super().get_tools() if t.name not in FERRAMENTAS_DESCOBERTA]
+
+    executor = ExecutorProtegido(engine, max_linhas=SQL_MAX_ROWS, timeout_s=SQL_TIMEOUT_SECONDS,
+                                 custo_maximo=SQL_MAX_COST, tamanho_bloco=SQL_FETCH_CHUNK)
+
+    class SQLDatabaseProtegido(SQLDatabase):
+        """Todo SQL do agente passa pelo executor protegido em vez de ir direto à engine."""
+
+        def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+            linhas, truncado = executor.executar(str(command), parameters)
+            if truncado:
+                # Avisa o agente de que o resultado foi cortado, para que ele agregue ou filtre
+                linhas.append({"aviso": f"resultado truncado em {SQL_MAX_ROWS} linhas"})
+            return linhas[:1] if fetch == "one" else linhas
+
+    # Criar a instância do SQLDatabase do Langchain
+    # include_tables: Especifica quais tabelas o agente deve considerar. MUITO IMPORTANTE!
+    # Sem reflexão antecipada nem linhas de exemplo: essas informações já estão no cartão
+    logging.info(f"Configurando Langchain para acessar a tabela: {TABLE_NAME}")
+    db = SQLDatabaseProtegido(engine=engine, include_tables=[TABLE_NAME], sample_rows_in_table_info=0,
+                              lazy_table_reflection=True)
+
+    # Criar o Toolkit e o Agente SQL
+    # O toolkit fornece as ferramentas necessárias para o agente interagir com o DB
+    toolkit = ToolkitSemDescoberta(db=db, llm=llm)
+
+    # agent_type="openai-tools": Utiliza as capacidades de "tools" da OpenAI
+    # verbose=True: Mostra os pensamentos e ações do agente (útil para debug)
+    # O sufixo (mensagem inicial do agente) traz o cartão no lugar de "vou olhar as tabelas"
+    agent_executor = create_sql_agent(
+        llm=llm,
+        toolkit=toolkit,
+        verbose=True,
+        agent_type="openai-tools",
+        suffix=("Já conheço o esquema, não preciso listar tabelas nem consultar o esquema:\n"
+                f"{cartao_como_texto(cartao)}\n"
+                "Vou escrever a consulta SQL diretamente e executá-la com sql_db_query."),
+        # Os passos intermediários expõem o SQL executado, guardado no cache de respostas
+        agent_executor_kwargs={"return_intermediate_steps": True},
+    )
+    return agent_executor, db
+
+def ask_sql_database():
+    """Configura o agente Langchain e permite fazer perguntas ao banco de dados."""
+    try:
+        logging.info("Conectando ao banco de dados SQL Server...")
+        engine = create_engine(DATABASE_URL)
+        cartao = carregar_cartao(engine)
+
+        # Configurar o modelo LLM (GPT-4o)
+        logging.info("Configurando o modelo LLM (gpt-4o)...")
+        llm, contador = criar_llm()
+
+        logging.info("Criando o SQL Agent Executor...")
+        agent_executor, db = criar_agente(engine, llm, cartao)
+
+        cache = CacheRespostas(ANSWER_CACHE_PATH, ttl=ANSWER_CACHE_TTL_HOURS * 3600,
+                               max_entradas=ANSWER_CACHE_MAX_ENTRIES)
+        logging.info(f"Cache de respostas em '{ANSWER_CACHE_PATH}' ({cache.estatisticas()['entradas']} entradas).")
+
+        inicializacao = time.perf_counter() - INICIO_PROCESSO
+        logging.info(f"Agente SQL pronto em {inicializacao:.2f}s. Digite sua pergunta ou 'sair' para terminar.")
+        primeira_resposta = True
+
+        # Loop para fazer perguntas
+        while True:
+            user_question = input("\nSua pergunta: ")
+            if user_question.lower() in ['sair', 'exit', 'quit']:
+                logging.info(f"Estatísticas do cache de respostas: {cache.estatisticas()}")
+                logging.info("Encerrando...")
+                break
+            if not user_question:
+                continue
+
+            # Invocar o agente com a pergunta
+            try:
+                logging.info(f"Processando pergunta: {user_question}")
+                inicio = time.perf_counter()
+                chamadas_antes = contador.chamadas
+                # A versão dos dados (última carga registrada) decide se a resposta em cache ainda vale
+                with engine.connect() as connection:
+                    versao = versao_dados(connection, TABLE_NAME)
+                # Perguntas repetidas saem do cache; as demais passam pelo agente, que decide
+                # se precisa consultar o DB, qual query usar, etc.
+                resposta, origem, _ = responder(user_question, agent_executor, db, cache, versao, llm)
+                latencia = time.perf_counter() - inicio
+                logging.info(f"Resposta obtida via {origem} em {latencia:.2f}s "
+                             f"({contador.chamadas - chamadas_antes} chamadas ao LLM).")
+                if primeira_resposta:
+                    # Inicialização + latência da primeira pergunta (sem o tempo de digitação)
+                    logging.info(f"Tempo até a primeira resposta: {inicializacao + latencia:.2f}s.")
+                    primeira_resposta = False
+                print("\nResposta:")
+                print(resposta)
+            except Exception as e:
+                logging.error(f"Erro ao processar a pergunta: {e}")
+                print("\nOcorreu um erro ao tentar obter a resposta. Verifique os logs.")
+                logging.exception("Detalhes do erro:") # Loga o stack trace
+
+    except Exception as e:
+        logging.error(f"Ocorreu um erro inesperado na configuração ou execução: {e}")
+        logging.exception("Detalhes do erro:")
+
+def ler_perguntas(caminho):
+    """Perguntas de um arquivo JSONL: {"id": ..., "pergunta": ...} (ou "question") por linha."""
+    perguntas = []
+    with open(caminho, encoding="utf-8") as f:
+        for n, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            texto = registro.get("pergunta") or registro.get("question")
+            if not texto:
+                logging.warning(f"Linha {n} de '{caminho}' sem pergunta; ignorada.")
+                continue
+            perguntas.append((registro.get("id", n), texto))
+    return perguntas
+
+async def _responder_lote(perguntas, saida, concorrencia):
+    # Um único pool de conexões (dimensionado pela concorrência) e um único cliente LLM para todo o lote
+    engine = criar_engine_pool(DATABASE_URL, pool_size=concorrencia)
+    cartao = carregar_cartao(engine)
+    llm, _ = criar_llm()
+    agent_executor, db = criar_agente(engine, llm, cartao)
+    cache = CacheRespostas(ANSWER_CACHE_PATH, ttl=ANSWER_CACHE_TTL_HOURS * 3600,
+                           max_entradas=ANSWER_CACHE_MAX_ENTRIES)
+    with engine.connect() as connection:
+        versao = versao_dados(connection, TABLE_NAME)
+    limite = asyncio.Semaphore(concorrencia)
+
+    async def responder_uma(id_pergunta, pergunta):
+        async with limite:
+            # Contador próprio por pergunta: as chamadas simultâneas não se misturam
+            contador = criar_contador()
+            inicio = time.perf_counter()
+            registro = {"id": id_pergunta, "pergunta": pergunta}
+            try:
+                resposta, origem, consultas = await aresponder(pergunta, agent_executor, db, cache, versao, llm,
+                                                               config={"callbacks": [contador]})
+                registro.update(resposta=resposta, origem=origem, sql=consultas)
+            except Exception as e:
+                logging.error(f"Erro ao processar a pergunta {id_pergunta}: {e}")
+                registro["erro"] = str(e)
+            registro.update(latencia_s=round(time.perf_counter() - inicio, 3),
+                            chamadas_llm=contador.chamadas, tokens=contador.tokens)
+            return registro
+
+    inicio = time.perf_counter()
+    latencias = []
+    with open(saida, "w", encoding="utf-8") as f:
+        # Cada resposta é gravada assim que termina, na ordem de conclusão
+        for tarefa in asyncio.as_completed([responder_uma(i, p) for i, p in perguntas]):
+            registro = await tarefa
+            latencias.append(registro["latencia_s"])
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            logging.info(f"Pergunta {registro['id']} respondida via {registro.get('origem', 'erro')} "
+                         f"em {registro['latencia_s']:.2f}s.")
+    duracao = time.perf_counter() - inicio
+    logging.info(f"Lote concluído: {len(perguntas)} perguntas em {duracao:.1f}s "
+                 f"(soma das latências {sum(latencias):.1f}s, concorrência {concorrencia}). "
+                 f"Cache de respostas: {cache.estatisticas()}")
+
+def responder_lote(caminho, saida, concorrencia=DEFAULT_CONCORRENCIA):
+    """Responde as perguntas de um JSONL em paralelo (até `concorrencia` por vez) e grava um JSONL de saída."""
+    perguntas = ler_perguntas(caminho)
+    logging.info(f"{len(perguntas)} perguntas lidas de '{caminho}'; respostas em '{saida}'.")
+    asyncio.run(_responder_lote(perguntas, saida, concorrencia))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perguntas em linguagem natural sobre a tabela northwind_data.")
+    parser.add_argument("--lote", help="Arquivo JSONL de perguntas; sem ele, abre o modo interativo")
+    parser.add_argument("--saida", default="respostas.jsonl", help="Arquivo JSONL de respostas do modo em lote")
+    parser.add_argument("--concorrencia", type=int, default=DEFAULT_CONCORRENCIA,
+                        help="Número máximo de perguntas processadas ao mesmo tempo no modo em lote")
+    args = parser.parse_args()
+
+    if args.lote:
+        responder_lote(args.lote, args.saida, args.concorrencia)
+    else:
+        ask_sql_database()
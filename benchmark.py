@@ -0,0 +1,209 @@
+# benchmark.py
+"""Benchmark de escala do pipeline do dashboard, sem navegador.
+
+Para cada escala, gera dados sintéticos (synthetic_data.py) e mede tempo,
+pico de memória alocada (tracemalloc) e RSS de cada etapa:
+
+- ingestao_xlsx: leitura streaming da planilha (até --xlsx-ate linhas)
+- ingestao_parquet: leitura das colunas essenciais do .parquet sintético
+- cache_gravacao / cache_leitura: ida e volta pelo cache Parquet do app
+- indice_cubo: índice de datas e cubo diário (VersaoDataset)
+- filtro_periodo / recorte_cubo: recortes de janelas aleatórias
+- app_carga, app_todas_secoes e secao:<nome>: o app.py executado pelo
+  AppTest do Streamlit, com os tempos de cada seção (render_*)
+- carga_sql / pos_carga: carga bulk e pós-carga do load_data_to_sql.py
+
+Cada medição é acrescentada como uma linha JSON ao arquivo de resultados,
+com o commit, a data e a escala, para comparar execuções entre commits.
+
+Uso: python benchmark.py --escalas 100k,1m [--saida benchmark_resultados.jsonl]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import MAX_LINHAS_XLSX, PerfilNorthwind, gerar, salvar
+from xlsx_ingest import rss_atual_mb
+
+DEFAULT_SAIDA = "benchmark_resultados.jsonl"
+DEFAULT_JANELAS = 200
+DEFAULT_TIMEOUT_APP = 1800  # Segundos por execução do app no AppTest
+# Escrever e ler .xlsx com openpyxl custa minutos por milhão de linhas; acima disso só o Parquet é medido
+DEFAULT_XLSX_ATE = 100_000
+
+
+def versao_codigo():
+    """Commit atual (com "-dirty" se houver alterações não commitadas), ou None fora de um repositório git."""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def escala_de(texto):
+    """"100k" -> 100000, "1m" -> 1000000, "50M" -> 50000000."""
+    multiplicadores = {"k": 1_000, "m": 1_000_000}
+    texto = texto.strip().lower()
+    if texto[-1] in multiplicadores:
+        return int(float(texto[:-1]) * multiplicadores[texto[-1]])
+    return int(texto)
+
+
+class Medidor:
+    """Mede etapas e acrescenta cada resultado ao arquivo JSONL assim que termina."""
+
+    def __init__(self, saida, escala, seed, memoria=True):
+        self.saida = saida
+        self.memoria = memoria
+        self.base = {"commit": versao_codigo(), "escala": escala, "seed": seed}
+
+    def registrar(self, etapa, segundos, pico_mb=None, **extras):
+        registro = {**self.base, "data": pd.Timestamp.now().isoformat(timespec="seconds"), "etapa": etapa,
+                    "segundos": round(segundos, 4),
+                    "pico_alocado_mb": None if pico_mb is None else round(pico_mb, 1),
+                    "rss_mb": round(rss_atual_mb(), 1), **extras}
+        with open(self.saida, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        pico = "" if pico_mb is None else f", pico alocado {pico_mb:,.1f} MB"
+        logging.info(f"[{self.base['escala']:,}] {etapa}: {segundos:.3f}s{pico}")
+        return registro
+
+    def medir(self, etapa, funcao, *args, memoria=None, **extras):
+        """Executa `funcao(*args)` medindo tempo e pico de memória alocada; retorna o resultado.
+
+        O tracemalloc deixa o código Python puro (openpyxl) bem mais lento; com
+        memoria=False só o tempo é medido.
+        """
+        memoria = self.memoria if memoria is None else memoria
+        if memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(*args)
+        finally:
+            segundos = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if memoria else None
+            if memoria:
+                tracemalloc.stop()
+        self.registrar(etapa, segundos, pico, **extras)
+        return resultado
+
+
+# ==============================
+# ETAPAS
+# ==============================
+def janelas_aleatorias(indice, n, seed):
+    """`n` janelas [inicio, fim] sorteadas dentro do período dos dados."""
+    rng = np.random.default_rng(seed)
+    dias = max((indice.max_date - indice.min_date).days, 1)
+    inicios = rng.integers(0, dias, n)
+    duracoes = rng.integers(1, dias + 1, n)
+    return [(indice.min_date + pd.Timedelta(days=int(i)), indice.min_date + pd.Timedelta(days=int(i + d)))
+            for i, d in zip(inicios, duracoes)]
+
+
+def medir_app(medidor, caminho):
+    """Executa o app.py com a fonte compartilhada apontando para `caminho`, como uma sessão."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["NORTHWIND_SOURCE"] = caminho
+    # Recursos em cache são do processo: sem limpar, a escala anterior seria reaproveitada
+    st.cache_resource.clear()
+    at = AppTest.from_file("app.py", default_timeout=DEFAULT_TIMEOUT_APP)
+    medidor.medir("app_carga", at.run)
+    if at.exception:
+        raise RuntimeError(f"Falha ao executar o app: {at.exception[0].message}")
+    medidor.medir("app_todas_secoes", at.sidebar.radio(key="modo_navegacao").set_value("Todas as seções").run)
+    for nome, ms in at.session_state["tempos_secoes"].items():
+        medidor.registrar(f"secao:{nome}", ms / 1000)
+
+
+def medir_sql(medidor, caminho, database_url):
+    """Carga bulk e pós-carga do parquet sintético (todas as colunas, como a planilha)."""
+    from load_data_to_sql import carregar_bulk, criar_engine, limpar_colunas, pos_carga
+
+    df = pd.read_parquet(caminho)
+    # Texto como str (os dicionários do Parquet viram categóricos no pandas)
+    df = df.astype({c: "str" for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    limpar_colunas(df)
+    engine = criar_engine(database_url)
+    linhas_por_segundo = medidor.medir("carga_sql", carregar_bulk, df, engine, dialeto=engine.dialect.name)
+    medidor.registrar("carga_sql_vazao", 0, linhas_por_segundo=round(linhas_por_segundo))
+    medidor.medir("pos_carga", pos_carga, engine, dialeto=engine.dialect.name)
+    engine.dispose()
+
+
+def executar(escala, perfil, diretorio, saida, seed=0, janelas=DEFAULT_JANELAS, database_url=None,
+             xlsx_ate=DEFAULT_XLSX_ATE, memoria=True, com_app=True, com_sql=True):
+    """Roda todas as etapas para uma escala."""
+    from parquet_cache import ParquetCache
+    from period_index import ordenar_por_data
+    from shared_source import FonteParquet, VersaoDataset
+    from xlsx_ingest import ler_xlsx_streaming
+
+    medidor = Medidor(saida, escala, seed, memoria=memoria)
+    # A geração não faz parte do pipeline: só o tempo é registrado
+    parquet = os.path.join(diretorio, f"northwind_{escala}.parquet")
+    medidor.medir("geracao_parquet", lambda: salvar(gerar(perfil, escala, seed=seed), parquet, perfil), memoria=False)
+
+    if escala <= min(xlsx_ate, MAX_LINHAS_XLSX):
+        xlsx = os.path.join(diretorio, f"northwind_{escala}.xlsx")
+        medidor.medir("geracao_xlsx", lambda: salvar(gerar(perfil, escala, seed=seed), xlsx, perfil), memoria=False)
+        medidor.medir("ingestao_xlsx", lambda: ordenar_por_data(ler_xlsx_streaming(xlsx)[0]))
+        os.remove(xlsx)
+    else:
+        medidor.registrar("ingestao_xlsx", 0, ignorada=f"acima de {min(xlsx_ate, MAX_LINHAS_XLSX):,} linhas")
+
+    df = medidor.medir("ingestao_parquet", FonteParquet(parquet).carregar)
+    cache = ParquetCache(cache_dir=os.path.join(diretorio, "cache"))
+    medidor.medir("cache_gravacao", cache.put, str(escala), df)
+    medidor.medir("cache_leitura", cache.get, str(escala))
+
+    dataset = medidor.medir("indice_cubo", VersaoDataset, df, str(escala), os.path.basename(parquet))
+    recortes = janelas_aleatorias(dataset.indice, janelas, seed)
+    medidor.medir("filtro_periodo", lambda: [dataset.indice.fatiar(i, f) for i, f in recortes], janelas=janelas)
+    medidor.medir("recorte_cubo", lambda: [dataset.cubo.fatiar(i, f).total("revenue") for i, f in recortes],
+                  janelas=janelas)
+    del df, dataset
+
+    if com_app:
+        medir_app(medidor, parquet)
+    if com_sql:
+        medir_sql(medidor, parquet, database_url or f"sqlite:///{os.path.join(diretorio, 'benchmark.db')}")
+    os.remove(parquet)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Benchmark de escala do dashboard Northwind (sem navegador).")
+    parser.add_argument("--escalas", default="100k,1m", help="Linhas por escala, separadas por vírgula (ex.: 1m,10m,50m)")
+    parser.add_argument("--saida", default=DEFAULT_SAIDA, help="Arquivo JSONL ao qual os resultados são acrescentados")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos dados sintéticos e das janelas")
+    parser.add_argument("--janelas", type=int, default=DEFAULT_JANELAS, help="Janelas sorteadas no filtro de período")
+    parser.add_argument("--xlsx-ate", type=int, default=DEFAULT_XLSX_ATE,
+                        help="Maior escala em que a ingestão do .xlsx é medida")
+    parser.add_argument("--sem-memoria", action="store_true",
+                        help="Não mede o pico de memória alocada (tracemalloc deixa as etapas mais lentas)")
+    parser.add_argument("--database-url", help="Banco da carga SQL (padrão: SQLite temporário)")
+    parser.add_argument("--sem-app", action="store_true", help="Não executa o app.py (tempos por seção)")
+    parser.add_argument("--sem-sql", action="store_true", help="Não mede a carga no SQL")
+    parser.add_argument("--diretorio", help="Diretório dos arquivos temporários (padrão: diretório temporário do sistema)")
+    args = parser.parse_args()
+
+    perfil = PerfilNorthwind.da_planilha()
+    with tempfile.TemporaryDirectory(dir=args.diretorio) as diretorio:
+        for escala in map(escala_de, args.escalas.split(",")):
+            executar(escala, perfil, diretorio, args.saida, seed=args.seed, janelas=args.janelas,
+                     database_url=args.database_url, xlsx_ate=args.xlsx_ate, memoria=not args.sem_memoria,
+                     com_app=not args.sem_app, com_sql=not args.sem_sql)
+    logging.info(f"Resultados acrescentados a '{args.saida}'.")
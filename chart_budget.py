@@ -0,0 +1,119 @@
+# chart_budget.py
+"""Redução de pontos para gráficos em nível de linha.
+
+Cada gráfico recebe um orçamento de pontos. Acima dele, as dispersões são
+reduzidas por amostragem estratificada ou por binning 2-D (densidade), as
+séries diárias por LTTB (Largest-Triangle-Three-Buckets) e os histogramas
+são calculados no servidor. Traces com muitos pontos usam WebGL.
+"""
+import numpy as np
+import pandas as pd
+
+MODO_AMOSTRA = "Amostra estratificada"
+MODO_DENSIDADE = "Densidade 2-D"
+
+
+def amostra_estratificada(df, n, estrato=None, seed=0):
+    """Amostra de ~n linhas mantendo a proporção de cada valor de `estrato`."""
+    if len(df) <= n:
+        return df
+    if estrato is None or estrato not in df.columns:
+        return df.sample(n=n, random_state=seed)
+    frac = n / len(df)
+    return (df.groupby(estrato, observed=True, dropna=False, group_keys=False)
+            .sample(frac=frac, random_state=seed))
+
+
+def lttb(x, y, n):
+    """Índices dos pontos escolhidos pelo LTTB para reduzir a série (x, y) a n pontos."""
+    total = len(x)
+    if n >= total or n < 3:
+        return np.arange(total)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # Primeiro e último pontos são sempre mantidos; os demais vêm de n-2 buckets
+    limites = np.linspace(1, total - 1, n - 1).astype("int64")
+    indices = np.empty(n, dtype="int64")
+    indices[0] = 0
+    anterior = 0
+    for b in range(n - 2):
+        inicio, fim = limites[b], limites[b + 1]
+        # Média do próximo bucket (ou o último ponto, no bucket final)
+        prox_inicio, prox_fim = limites[b + 1], limites[b + 2] if b + 2 < len(limites) else total
+        media_x = x[prox_inicio:prox_fim].mean()
+        media_y = y[prox_inicio:prox_fim].mean()
+        # Ponto do bucket que forma o maior triângulo com o anterior e a média seguinte
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        indices[b + 1] = anterior
+    indices[-1] = total - 1
+    return indices
+
+
+def binning_2d(x, y, bins=60):
+    """Histograma 2-D calculado no servidor: (contagens[y, x], centros_x, centros_y)."""
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    validos = ~(np.isnan(x) | np.isnan(y))
+    contagens, bordas_x, bordas_y = np.histogram2d(x[validos], y[validos], bins=bins)
+    centros_x = (bordas_x[:-1] + bordas_x[1:]) / 2
+    centros_y = (bordas_y[:-1] + bordas_y[1:]) / 2
+    return contagens.T, centros_x, centros_y
+
+
+def histograma(valores, nbins):
+    """Histograma 1-D calculado no servidor, como DataFrame (centro, contagem, largura)."""
+    valores = pd.Series(valores).dropna().to_numpy(dtype="float64")
+    contagens, bordas = np.histogram(valores, bins=nbins)
+    return pd.DataFrame({
+        "centro": (bordas[:-1] + bordas[1:]) / 2,
+        "contagem": contagens,
+        "largura": np.diff(bordas),
+    })
+
+
+class OrcamentoPontos:
+    """Orçamento de pontos por gráfico e regras de redução."""
+
+    def __init__(self, max_pontos=5000, modo=MODO_AMOSTRA, limite_webgl=1000, seed=0):
+        self.max_pontos = max_pontos
+        self.modo = modo
+        self.limite_webgl = limite_webgl
+        self.seed = seed
+
+    def excede(self, n):
+        return n > self.max_pontos
+
+    def render_mode(self, n):
+        """Modo de renderização do Plotly Express: WebGL acima do limite configurado."""
+        return "webgl" if n > self.limite_webgl else "svg"
+
+    def amostrar(self, df, estrato=None):
+        """Retorna (df reduzido, reduzido?) usando amostragem estratificada."""
+        if not self.excede(len(df)):
+            return df, False
+        return amostra_estratificada(df, self.max_pontos, estrato, self.seed), True
+
+    def reduzir_serie(self, df, x, y):
+        """Retorna (df reduzido, reduzido?) aplicando LTTB à série ordenada por x."""
+        if not self.excede(len(df)):
+            return df, False
+        eixo_x = pd.to_datetime(df[x]).astype("int64") if not pd.api.types.is_numeric_dtype(df[x]) else df[x]
+        return df.iloc[lttb(eixo_x.to_numpy(), df[y].to_numpy(), self.max_pontos)], True
+
+    def usar_densidade(self, n):
+        return self.excede(n) and self.modo == MODO_DENSIDADE
+
+    @property
+    def bins_densidade(self):
+        # bins × bins células cabem no orçamento de pontos
+        return max(10, min(100, int(np.sqrt(self.max_pontos))))
+
+    def descricao_amostra(self, n):
+        return f"amostra estratificada por categoria com {n:,} pontos"
+
+    def descricao_densidade(self):
+        return f"densidade 2-D em {self.bins_densidade}×{self.bins_densidade} células"
@@ -0,0 +1,319 @@
+# dashboard_charts.py
+"""Indicadores e figuras das seções do dashboard, sem dependência do Streamlit.
+
+Cada função recebe o cubo diário da janela (ou a visão agregada), as
+linhas do período quando o gráfico é em nível de linha e o orçamento de
+pontos, e devolve um `Grafico`: a figura Plotly, a tabela agregada que a
+originou e o aviso de redução, se houver. O app.py distribui esses
+resultados nos widgets de cada seção; o report.py monta com eles o
+relatório estático, sem abrir o navegador.
+"""
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from chart_budget import binning_2d, histograma
+from mergeable_stats import MomentosDiarios
+
+ROTULOS_NUMERICOS = {"revenue": "Receita", "freight": "Frete", "quantity": "Quantidade",
+                     "discount": "Desconto", "unit_price": "Preço Unitário"}
+
+
+class Grafico:
+    """Figura, tabela agregada usada por ela (None para amostras de linhas) e aviso de redução."""
+
+    def __init__(self, figura, tabela=None, aviso=None):
+        self.figura = figura
+        self.tabela = tabela
+        self.aviso = aviso
+
+
+# ==============================
+# FUNÇÕES AUXILIARES
+# ==============================
+def calcular_delta(novo_valor, antigo_valor):
+    # Se o valor anterior for zero ou inválido, retorna 0 (para evitar N/A)
+    if antigo_valor == 0 or pd.isnull(antigo_valor):
+        return 0
+    return (novo_valor - antigo_valor) / antigo_valor * 100
+
+def format_currency(val):
+    return f"R$ {val:,.2f}"
+
+def texto_reducao(total, descricao):
+    return f"Visualização reduzida: {descricao} (de {total:,} pontos no período)."
+
+def reduzir_serie_diaria(df_grouped, y, group_by, orcamento):
+    """Retorna (série, aviso): apenas o grão diário pode ter mais pontos que o orçamento; reduz com LTTB."""
+    if group_by != "Dia":
+        return df_grouped, None
+    serie, reduzida = orcamento.reduzir_serie(df_grouped, "periodo", y)
+    return serie, texto_reducao(len(df_grouped), f"{len(serie):,} pontos por LTTB") if reduzida else None
+
+def figura_densidade(df, x, y, title, labels, orcamento, colorscale="Blues"):
+    # Binning 2-D no servidor: o navegador recebe apenas a matriz de contagens
+    contagens, centros_x, centros_y = binning_2d(df[x], df[y], bins=orcamento.bins_densidade)
+    fig = go.Figure(go.Heatmap(z=contagens, x=centros_x, y=centros_y, colorscale=colorscale,
+                               colorbar=dict(title="Linhas")))
+    fig.update_layout(title=title, xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    tabela = pd.DataFrame(contagens, index=pd.Index(centros_y, name=y), columns=centros_x)
+    return fig, tabela.rename(columns=str).reset_index()
+
+def figura_histograma(df, x, nbins, title, labels, color, orcamento):
+    # Acima do orçamento, as barras são calculadas no servidor em vez de enviar todas as linhas
+    hist = histograma(df[x], nbins)
+    if not orcamento.excede(len(df)):
+        return px.histogram(df, x=x, nbins=nbins, title=title, labels=labels,
+                            color_discrete_sequence=[color]), hist
+    fig = px.bar(hist, x="centro", y="contagem", title=title,
+                 labels={"centro": labels.get(x, x), "contagem": "count"},
+                 color_discrete_sequence=[color])
+    fig.update_traces(width=hist["largura"])
+    fig.update_layout(bargap=0)
+    return fig, hist
+
+def _ranking(tabela, coluna, dimensao, title, labels, escala, n=10):
+    top = tabela.sort_values(coluna, ascending=False).head(n)
+    fig = px.bar(top, x=coluna, y=dimensao, orientation="h", title=title, labels=labels,
+                 color=coluna, color_continuous_scale=escala)
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+    return Grafico(fig, top)
+
+# ==============================
+# SEÇÃO: DASHBOARD GERAL
+# ==============================
+def indicadores_gerais(cubo, cubo_previous):
+    """KPIs da janela atual e deltas em relação à anterior: lista de (rótulo, valor, delta ou None)."""
+    total_revenue = cubo.total("revenue")
+    previous_revenue = cubo_previous.total("revenue") if not cubo_previous.empty else 0
+    delta_revenue = calcular_delta(total_revenue, previous_revenue)
+
+    total_orders = cubo.total("n_pedidos") if cubo.tem("n_pedidos") else 0
+    previous_orders = cubo_previous.total("n_pedidos") if cubo_previous.tem("n_pedidos") else 0
+    delta_orders = calcular_delta(total_orders, previous_orders)
+
+    total_freight = cubo.total("freight") if cubo.tem("freight") else 0
+    total_quantity = cubo.total("quantity") if cubo.tem("quantity") else 0
+    # Distintos combinados das estruturas diárias: a janela anterior custa o mesmo que a atual
+    total_customers = cubo.distintos("company_name") if cubo.tem("company_name") else 0
+    previous_customers = cubo_previous.distintos("company_name") if cubo_previous.tem("company_name") else 0
+    delta_customers = calcular_delta(total_customers, previous_customers)
+    avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+    previous_avg_order_value = previous_revenue / previous_orders if previous_orders > 0 else 0
+    delta_avg_order_value = calcular_delta(avg_order_value, previous_avg_order_value)
+    avg_discount = cubo.total("discount") * 100 if cubo.tem("discount_sum") else 0
+    avg_shipping_time = cubo.total("shipping_time") if cubo.tem("shipping_days_sum") else 0
+    unique_products = cubo.distintos("product_id") if cubo.tem("product_id") else 0
+    previous_products = cubo_previous.distintos("product_id") if cubo_previous.tem("product_id") else 0
+    delta_products = calcular_delta(unique_products, previous_products)
+
+    return [
+        ("Receita Total", format_currency(total_revenue), f"{delta_revenue:.1f}%"),
+        ("Nº de Pedidos", f"{total_orders:,}", f"{delta_orders:.1f}%"),
+        ("Custo de Frete", format_currency(total_freight), None),
+        ("Quantidade Vendida", f"{total_quantity:,}", None),
+        ("Nº de Clientes", f"{total_customers:,}", f"{delta_customers:.1f}%"),
+        ("Ticket Médio", format_currency(avg_order_value), f"{delta_avg_order_value:.1f}%"),
+        ("Desconto Médio", f"{avg_discount:.1f}%", None),
+        ("Tempo Médio de Envio (dias)", f"{avg_shipping_time:.1f}", None),
+        ("Produtos Únicos", f"{unique_products:,}", f"{delta_products:.1f}%"),
+    ]
+
+def grafico_tendencia_receita(cubo, group_by, orcamento):
+    df_grouped, aviso = reduzir_serie_diaria(cubo.agregar("periodo", ["revenue"], group_by), "revenue",
+                                             group_by, orcamento)
+    fig_area = px.area(df_grouped, x="periodo", y="revenue",
+                       title="Evolução da Receita ao Longo do Tempo",
+                       labels={"periodo": group_by, "revenue": "Receita (US$)"},
+                       color_discrete_sequence=["#4CA1AF"])
+    fig_area.update_traces(line=dict(width=3))
+    return Grafico(fig_area, df_grouped, aviso)
+
+# ==============================
+# SEÇÃO: ANÁLISES DE VENDAS
+# ==============================
+def grafico_receita_pedidos(cubo, group_by, orcamento):
+    sales_by_time = cubo.agregar("periodo", ["revenue", "n_pedidos"], group_by)
+    sales_by_time, aviso = reduzir_serie_diaria(sales_by_time, "revenue", group_by, orcamento)
+    fig_line = px.line(sales_by_time, x="periodo", y="revenue", markers=True,
+                       title="Receita ao Longo do Tempo",
+                       labels={"periodo": group_by, "revenue": "Receita (US$)"},
+                       color_discrete_sequence=["#2C3E50"])
+    return Grafico(fig_line, sales_by_time, aviso)
+
+def grafico_top_produtos_receita(prod_sales):
+    """`prod_sales`: receita por product_name (cubo.agregar), compartilhada entre seções."""
+    return _ranking(prod_sales, "revenue", "product_name", "Produtos com Maior Receita",
+                    {"product_name": "Produto", "revenue": "Receita (US$)"}, px.colors.sequential.Plasma)
+
+def grafico_receita_categoria(cubo):
+    cat_sales = cubo.agregar("category_name", ["revenue"])
+    fig_pie = px.pie(cat_sales, names="category_name", values="revenue",
+                     title="Distribuição de Receita por Categoria",
+                     color_discrete_sequence=px.colors.sequential.RdBu)
+    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+    return Grafico(fig_pie, cat_sales)
+
+# ==============================
+# SEÇÃO: ANÁLISES DE QUANTIDADE
+# ==============================
+def grafico_quantidade_tempo(cubo, group_by, orcamento):
+    qty_by_time, aviso = reduzir_serie_diaria(cubo.agregar("periodo", ["quantity"], group_by), "quantity",
+                                              group_by, orcamento)
+    fig_area = px.area(qty_by_time, x="periodo", y="quantity",
+                       title="Quantidade Vendida ao Longo do Tempo",
+                       labels={"periodo": group_by, "quantity": "Quantidade"},
+                       color_discrete_sequence=["#4CA1AF"])
+    fig_area.update_traces(line=dict(width=3))
+    return Grafico(fig_area, qty_by_time, aviso)
+
+def grafico_top_paises_quantidade(cubo):
+    return _ranking(cubo.agregar("ship_country", ["quantity"]), "quantity", "ship_country",
+                    "Países com Maior Quantidade Vendida", {"ship_country": "País", "quantity": "Quantidade"},
+                    px.colors.sequential.Viridis)
+
+def grafico_histograma_quantidade(df, orcamento):
+    fig_hist, hist = figura_histograma(df, "quantity", 20,
+                                       title="Histograma da Quantidade por Pedido",
+                                       labels={"quantity": "Quantidade"},
+                                       color="#2C3E50", orcamento=orcamento)
+    return Grafico(fig_hist, hist)
+
+# ==============================
+# SEÇÃO: ANÁLISES DE CLIENTES
+# ==============================
+def graficos_clientes(cubo):
+    """(top 10 clientes por receita, pedidos x receita dos mesmos clientes)."""
+    cust = cubo.agregar("company_name", ["n_pedidos", "revenue", "quantity"])
+    top = _ranking(cust, "revenue", "company_name", "Clientes com Maior Receita",
+                   {"company_name": "Cliente", "revenue": "Receita (US$)"}, px.colors.sequential.Teal)
+    fig_scatter = px.scatter(top.tabela, x="n_pedidos", y="revenue",
+                             size="quantity", hover_name="company_name",
+                             title="Pedidos vs. Receita por Cliente",
+                             labels={"n_pedidos": "Nº de Pedidos", "revenue": "Receita (US$)", "quantity": "Quantidade Total"},
+                             color="revenue", color_continuous_scale=px.colors.sequential.Cividis)
+    return top, Grafico(fig_scatter, top.tabela)
+
+# ==============================
+# SEÇÃO: ANÁLISE DE PRODUTOS
+# ==============================
+def indicadores_produtos(cubo):
+    """Lista de (rótulo, valor) com as métricas disponíveis da seção de produtos."""
+    metricas = []
+    if cubo.tem("product_id"):
+        metricas.append(("Total de Produtos", f"{cubo.distintos('product_id'):,}"))
+    if cubo.tem("quantity") and cubo.tem("product_id"):
+        avg_qty = cubo.agregar("product_id", ["quantity"])["quantity"].mean()
+        metricas.append(("Qtd Média por Produto", f"{avg_qty:.1f}"))
+    if cubo.tem("unit_price_sum"):
+        metricas.append(("Preço Médio", format_currency(cubo.total("unit_price"))))
+    if cubo.tem("category_name"):
+        metricas.append(("Total de Categorias", f"{cubo.distintos('category_name'):,}"))
+    return metricas
+
+def grafico_top_produtos_quantidade(prod_all):
+    return _ranking(prod_all, "quantity", "product_name", "Produtos com Maior Quantidade Vendida",
+                    {"product_name": "Produto", "quantity": "Quantidade"}, px.colors.sequential.Teal)
+
+def grafico_histograma_precos(df, orcamento):
+    fig_price, hist = figura_histograma(df, "unit_price", 30,
+                                        title="Distribuição de Preços Unitários",
+                                        labels={"unit_price": "Preço Unitário (US$)"},
+                                        color="#3498DB", orcamento=orcamento)
+    return Grafico(fig_price, hist)
+
+def grafico_preco_desconto(df, orcamento):
+    """Preço vs. desconto das linhas com desconto, ou None se não houver nenhuma."""
+    if "discount" not in df.columns or not df["discount"].gt(0).any():
+        return None
+    df_disc = df[df["discount"] > 0].copy()
+    df_disc["discount_pct"] = df_disc["discount"] * 100
+    labels_disc = {"unit_price": "Preço Unitário (US$)", "discount_pct": "Desconto (%)"}
+    if orcamento.usar_densidade(len(df_disc)):
+        fig_disc, tabela = figura_densidade(df_disc, "unit_price", "discount_pct", "Preço vs. Desconto",
+                                            labels_disc, orcamento)
+        return Grafico(fig_disc, tabela, texto_reducao(len(df_disc), orcamento.descricao_densidade()))
+    df_plot, reduzida = orcamento.amostrar(df_disc, estrato="category_name")
+    fig_disc = px.scatter(df_plot, x="unit_price", y="discount_pct",
+                          title="Preço vs. Desconto",
+                          labels=labels_disc,
+                          size="quantity", color="quantity",
+                          color_continuous_scale="Blues", opacity=0.7,
+                          render_mode=orcamento.render_mode(len(df_plot)))
+    aviso = texto_reducao(len(df_disc), orcamento.descricao_amostra(len(df_plot))) if reduzida else None
+    return Grafico(fig_disc, None, aviso)
+
+# ==============================
+# SEÇÃO: SEGMENTAÇÕES AVANÇADAS
+# ==============================
+def momentos_janela(cubo, df):
+    # Momentos combinados dos parciais diários da janela, apenas para as métricas da lista (sem ids);
+    # no backend SQL, calculados sobre a amostra de linhas
+    return cubo.momentos() or MomentosDiarios.de_linhas(df)
+
+def grafico_correlacao(momentos):
+    corr = momentos.corr()
+    fig_corr = px.imshow(corr, text_auto=".2f", aspect="auto",
+                         color_continuous_scale=px.colors.sequential.RdBu,
+                         title="Correlação entre Variáveis Numéricas")
+    return Grafico(fig_corr, corr.rename_axis("variavel").reset_index())
+
+def grafico_matriz_dispersao(df, orcamento):
+    # A matriz (splom) já é desenhada em WebGL; acima do orçamento usa uma amostra estratificada
+    df_matrix, reduzida = orcamento.amostrar(df, estrato="category_name")
+    fig_matrix = px.scatter_matrix(df_matrix,
+                                   dimensions=["revenue", "freight", "quantity", "discount"],
+                                   title="Matriz de Dispersão: Receita, Frete, Quantidade e Desconto",
+                                   color="revenue",
+                                   color_continuous_scale=px.colors.sequential.Viridis)
+    aviso = texto_reducao(len(df), orcamento.descricao_amostra(len(df_matrix))) if reduzida else None
+    return Grafico(fig_matrix, None, aviso)
+
+def grafico_marginais(momentos):
+    # Histogramas somados dos dias da janela (bordas fixas do dataset), sem reler as linhas
+    fig_marg = make_subplots(rows=1, cols=len(momentos.colunas),
+                             subplot_titles=[ROTULOS_NUMERICOS.get(c, c) for c in momentos.colunas])
+    tabelas = []
+    for i, coluna in enumerate(momentos.colunas, start=1):
+        hist = momentos.histograma(coluna)
+        fig_marg.add_trace(go.Bar(x=hist["centro"], y=hist["contagem"], width=hist["largura"],
+                                  marker_color="#4CA1AF", name=ROTULOS_NUMERICOS.get(coluna, coluna)),
+                           row=1, col=i)
+        tabelas.append(hist.assign(variavel=coluna))
+    fig_marg.update_layout(title="Distribuições Marginais das Métricas", showlegend=False, bargap=0)
+    return Grafico(fig_marg, pd.concat(tabelas, ignore_index=True))
+
+def grafico_frete_pais(cubo):
+    freight_by_country = (cubo.agregar("ship_country", ["freight_mean"])
+                          .rename(columns={"freight_mean": "freight"}))
+    fig_bar_freight = px.bar(freight_by_country, x="ship_country", y="freight",
+                             title="Frete Médio por País",
+                             labels={"ship_country": "País", "freight": "Frete Médio (US$)"},
+                             color="freight", color_continuous_scale=px.colors.sequential.Plasma)
+    return Grafico(fig_bar_freight, freight_by_country)
+
+def grafico_tempo_envio(cubo):
+    avg_shipping_by_period = cubo.agregar("periodo", ["shipping_time"], "Mês")
+    fig_line_shipping = px.line(avg_shipping_by_period, x="periodo", y="shipping_time",
+                                title="Tempo de Envio Médio por Mês",
+                                labels={"periodo": "Mês", "shipping_time": "Dias Médios para Envio"},
+                                markers=True, color_discrete_sequence=["#2C3E50"])
+    return Grafico(fig_line_shipping, avg_shipping_by_period)
+
+def grafico_bolhas(df, orcamento):
+    labels_bubble = {"discount": "Desconto", "revenue": "Receita (US$)", "quantity": "Quantidade"}
+    if orcamento.usar_densidade(len(df)):
+        fig_bubble, tabela = figura_densidade(df, "discount", "revenue",
+                                              "Relação entre Desconto, Receita e Quantidade",
+                                              labels_bubble, orcamento, colorscale="Inferno")
+        return Grafico(fig_bubble, tabela, texto_reducao(len(df), orcamento.descricao_densidade()))
+    df_bubble, reduzida = orcamento.amostrar(df, estrato="category_name")
+    fig_bubble = px.scatter(df_bubble, x="discount", y="revenue",
+                            size="quantity", hover_name="product_name",
+                            title="Relação entre Desconto, Receita e Quantidade",
+                            labels=labels_bubble,
+                            color="quantity", color_continuous_scale=px.colors.sequential.Inferno, opacity=0.7,
+                            render_mode=orcamento.render_mode(len(df_bubble)))
+    aviso = texto_reducao(len(df), orcamento.descricao_amostra(len(df_bubble))) if reduzida else None
+    return Grafico(fig_bubble, None, aviso)
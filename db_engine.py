@@ -0,0 +1,26 @@
+# db_engine.py
+"""Criação das engines do SQLAlchemy usadas pelo loader, pelo dashboard e pelo agente SQL.
+
+Módulo leve (só o SQLAlchemy), para que os scripts não precisem importar
+uns aos outros apenas para criar uma engine.
+"""
+from sqlalchemy import create_engine
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+
+
+def criar_engine(database_url):
+    """Cria a engine; no SQL Server (pyodbc) habilita o fast_executemany (parâmetros em array)."""
+    if database_url.startswith("mssql"):
+        return create_engine(database_url, connect_args={"timeout": 50}, fast_executemany=True) # Aumenta o timeout para 50 segundos
+    # SQLite/Postgres (substitutos locais para benchmark): executemany padrão do driver
+    return create_engine(database_url)
+
+
+def criar_engine_pool(database_url, pool_size=DEFAULT_POOL_SIZE, max_overflow=DEFAULT_MAX_OVERFLOW):
+    """Engine com pool de conexões, compartilhada por todas as sessões (ou perguntas) do processo."""
+    opcoes = {"pool_pre_ping": True, "pool_recycle": 1800}
+    if not database_url.startswith("sqlite"):
+        opcoes.update(pool_size=pool_size, max_overflow=max_overflow)
+    return create_engine(database_url, **opcoes)
@@ -1,65 +1,494 @@
-# 1_load_data_to_sql.py
-import os
-import pandas as pd
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
-import logging
-
-# Configuração do logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
-
-# Pegar a URL do banco de dados do ambiente
-DATABASE_URL = os.getenv("DATABASE_URL")
-EXCEL_FILE_PATH = "base_northwind.xlsx"
-TABLE_NAME = "northwind_data" # Nome da tabela que será criada no SQL Server
-
-if not DATABASE_URL:
-    logging.error("Erro: A variável de ambiente DATABASE_URL não está definida.")
-    exit()
-
-if not os.path.exists(EXCEL_FILE_PATH):
-    logging.error(f"Erro: O arquivo Excel '{EXCEL_FILE_PATH}' não foi encontrado.")
-    exit()
-
-def load_data_to_sql():
-    """Lê dados do Excel e carrega para o SQL Server."""
-    try:
-        logging.info(f"Lendo dados do arquivo Excel: {EXCEL_FILE_PATH}...")
-        # Assume que os dados estão na primeira planilha (sheet_name=0)
-        df = pd.read_excel(EXCEL_FILE_PATH, sheet_name=0)
-        logging.info(f"Leitura do Excel concluída. {len(df)} linhas encontradas.")
-
-        logging.info("Conectando ao banco de dados SQL Server...")
-        # Criar a engine do SQLAlchemy
-        engine = create_engine(DATABASE_URL, connect_args={"timeout": 50}) # Aumenta o timeout para 30 segundos
-
-        # Verificar conexão (opcional, mas bom para debug)
-        with engine.connect() as connection:
-            logging.info("Conexão com o banco de dados estabelecida com sucesso.")
-
-            # Limpar nomes de colunas (substituir espaços e caracteres especiais)
-            df.columns = df.columns.str.replace(r'[^A-Za-z0-9_]+', '', regex=True)
-            # Renomear colunas que possam ser palavras reservadas do SQL (ex: 'ORDER')
-            df.rename(columns={'ORDER': 'Order_Col'}, inplace=True, errors='ignore') # Adicione outros se necessário
-
-            logging.info(f"Carregando dados para a tabela '{TABLE_NAME}' no SQL Server...")
-            # Usar to_sql para carregar o DataFrame
-            # if_exists='replace': Se a tabela já existir, ela será excluída e recriada.
-            #                  Use 'append' se quiser adicionar dados a uma tabela existente.
-            #                  Use 'fail' se não quiser fazer nada caso a tabela exista.
-            df.to_sql(TABLE_NAME, con=engine, if_exists='replace', index=False, chunksize=1000) # chunksize ajuda com tabelas grandes
-            logging.info(f"Dados carregados com sucesso na tabela '{TABLE_NAME}'.")
-
-    except FileNotFoundError:
-        logging.error(f"Erro: Arquivo Excel não encontrado em '{EXCEL_FILE_PATH}'.")
-    except ImportError:
-        logging.error("Erro: Biblioteca 'openpyxl' necessária para ler arquivos .xlsx. Instale com 'pip install openpyxl'.")
-    except Exception as e:
-        logging.error(f"Ocorreu um erro inesperado durante o carregamento dos dados: {e}")
-        logging.exception("Detalhes do erro:") # Loga o stack trace completo
-
-if __name__ == "__main__":
-    load_data_to_sql()
\ No newline at end of file
+# 1_load_data_to_sql.py
+import os
+import argparse
+import time
+import pandas as pd
+from sqlalchemy import text, func, select, cast, distinct, literal, inspect, MetaData, Table, Column, Index, BigInteger, Integer, Float, Date, DateTime, Boolean, String, Unicode, UnicodeText
+from dotenv import load_dotenv
+import logging
+from answer_cache import versao_dados
+from db_engine import criar_engine
+from schema_card import gerar_cartao, salvar_cartao, SCHEMA_CARD_TABLE
+from multi_ingest import ler_arquivos, ler_planilha_completa
+
+# Configuração do logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Carregar variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Pegar a URL do banco de dados do ambiente
+DATABASE_URL = os.getenv("DATABASE_URL")
+EXCEL_FILE_PATH = "base_northwind.xlsx"
+TABLE_NAME = "northwind_data" # Nome da tabela que será criada no SQL Server
+
+LOAD_LOG_TABLE = "northwind_load_log" # Histórico de cargas com o watermark de cada uma
+
+# Tabelas de resumo reconstruídas no pós-carga, por grão de período
+SUMMARY_TABLES = {"dia": "northwind_daily_summary", "mes": "northwind_monthly_summary"}
+# Colunas indexadas no pós-carga (filtros e junções mais comuns)
+INDEXED_COLUMNS = ["order_date", "order_id", "product_id", "customer_id", "ship_country"]
+# Dimensões dos resumos: nome gravado na coluna "dimension" -> coluna de origem
+SUMMARY_DIMENSIONS = {"product": "product_name", "customer": "company_name", "country": "ship_country"}
+
+# Orçamento padrão de bytes por lote no modo bulk
+DEFAULT_BATCH_MB = 8
+# Dias antes do watermark reprocessados no modo incremental (pedidos alterados recentemente)
+DEFAULT_LOOKBACK_DAYS = 7
+# Largura fixa das colunas de texto (NVARCHAR(4000)); acima disso, NVARCHAR(MAX)/TEXT
+TEXT_WIDTH = 4000
+
+def limpar_colunas(df):
+    """Ajusta os nomes das colunas para uso no SQL."""
+    # Limpar nomes de colunas (substituir espaços e caracteres especiais)
+    df.columns = df.columns.str.replace(r'[^A-Za-z0-9_]+', '', regex=True)
+    # Renomear colunas que possam ser palavras reservadas do SQL (ex: 'ORDER')
+    df.rename(columns={'ORDER': 'Order_Col'}, inplace=True, errors='ignore') # Adicione outros se necessário
+    return df
+
+def tipos_sql(df):
+    """Tipos explícitos das colunas, em vez dos inferidos pelo pandas."""
+    tipos = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_bool_dtype(serie):
+            tipos[col] = Boolean()
+        elif pd.api.types.is_integer_dtype(serie):
+            maior = serie.abs().max() if len(serie) else 0
+            tipos[col] = Integer() if maior < 2 ** 31 else BigInteger()
+        elif pd.api.types.is_float_dtype(serie):
+            tipos[col] = Float(precision=53)
+        elif pd.api.types.is_datetime64_any_dtype(serie):
+            tipos[col] = DateTime()
+        else:
+            # Texto: largura fixa e folgada, não a da amostra, para as cargas incrementais
+            # com strings maiores não serem truncadas (NVARCHAR(MAX) se a planilha já passar dela)
+            maior = int(serie.dropna().astype(str).str.len().max()) if serie.notna().any() else 0
+            tipos[col] = Unicode(TEXT_WIDTH) if maior <= TEXT_WIDTH else UnicodeText()
+    return tipos
+
+def linhas_por_lote(df, batch_bytes):
+    """Número de linhas por lote para que cada lote ocupe ~batch_bytes em memória."""
+    if df.empty:
+        return 1
+    bytes_por_linha = df.memory_usage(deep=True, index=False).sum() / len(df)
+    return max(1, int(batch_bytes // max(bytes_por_linha, 1)))
+
+def _registros(lote):
+    # NaN/NaT viram None e os escalares numpy viram tipos nativos do Python
+    return lote.astype(object).where(lote.notna(), None).to_dict("records")
+
+def _renomear(connection, origem, destino):
+    if connection.dialect.name == "mssql":
+        connection.execute(text(f"EXEC sp_rename '{origem}', '{destino}'"))
+    else:
+        connection.execute(text(f"ALTER TABLE {origem} RENAME TO {destino}"))
+
+def _iniciar_transacao_ddl(connection):
+    """No SQLite, abre a transação com BEGIN explícito.
+
+    O pysqlite só emite BEGIN antes de INSERT/UPDATE/DELETE: sem isso, os
+    DROP/ALTER da troca rodariam em autocommit, um a um.
+    """
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN")
+
+def _inserir_em_lotes(connection, tabela, df, batch_bytes):
+    tamanho = linhas_por_lote(df, batch_bytes)
+    logging.info(f"Inserindo {len(df)} linhas em '{tabela.name}' em lotes de {tamanho} linhas...")
+    for pos in range(0, len(df), tamanho):
+        # executemany em lote (fast_executemany no pyodbc, insertmanyvalues nos demais drivers)
+        connection.execute(tabela.insert(), _registros(df.iloc[pos:pos + tamanho]))
+
+def _alargar_colunas(connection, tabela, df):
+    """Troca por texto sem limite as colunas da tabela menores que as strings do DataFrame.
+
+    Altera os tipos em `tabela` (e no banco, exceto no SQLite, que não impõe
+    largura) antes da cópia para a staging. Retorna as colunas alargadas.
+    """
+    alargadas = []
+    for coluna in tabela.columns:
+        largura = getattr(coluna.type, "length", None)
+        if coluna.name not in df.columns or not largura or not isinstance(coluna.type, String):
+            continue
+        serie = df[coluna.name].dropna().astype(str)
+        if serie.empty or serie.str.len().max() <= largura:
+            continue
+        coluna.type = UnicodeText()
+        alargadas.append(coluna.name)
+        tipo = coluna.type.compile(dialect=connection.dialect)
+        if connection.dialect.name == "mssql":
+            connection.execute(text(f"ALTER TABLE {tabela.name} ALTER COLUMN {coluna.name} {tipo}"))
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(f"ALTER TABLE {tabela.name} ALTER COLUMN {coluna.name} TYPE {tipo}"))
+        elif connection.dialect.name in ("mysql", "mariadb"):
+            connection.execute(text(f"ALTER TABLE {tabela.name} MODIFY COLUMN {coluna.name} {tipo}"))
+    if alargadas:
+        logging.warning(f"Colunas alargadas para texto sem limite em '{tabela.name}': {alargadas}")
+    return alargadas
+
+def tabela_log(metadata):
+    """Tabela de metadados com o watermark e as contagens de cada carga."""
+    return Table(
+        LOAD_LOG_TABLE, metadata,
+        Column("load_id", Integer, primary_key=True, autoincrement=True),
+        Column("loaded_at", DateTime, nullable=False),
+        Column("mode", Unicode(32), nullable=False),
+        Column("watermark_order_date", DateTime),
+        Column("watermark_order_id", BigInteger),
+        Column("rows_read", BigInteger),
+        Column("rows_inserted", BigInteger),
+        Column("rows_deleted", BigInteger),
+        Column("orders_affected", BigInteger),
+    )
+
+def registrar_carga(connection, modo, watermark, linhas_lidas, inseridas, removidas=0, pedidos=0):
+    """Grava uma linha no histórico de cargas (na mesma transação da carga, quando houver)."""
+    log = tabela_log(MetaData())
+    log.create(connection, checkfirst=True)
+    data, pedido = watermark
+    connection.execute(log.insert().values(
+        loaded_at=pd.Timestamp.now().to_pydatetime(), mode=modo,
+        watermark_order_date=None if pd.isnull(data) else pd.Timestamp(data).to_pydatetime(),
+        watermark_order_id=None if pd.isnull(pedido) else int(pedido),
+        rows_read=int(linhas_lidas), rows_inserted=int(inseridas),
+        rows_deleted=int(removidas), orders_affected=int(pedidos),
+    ))
+
+def engine_has_table(connection, nome):
+    return connection.dialect.has_table(connection, nome)
+
+def ler_watermark(connection, table_name=TABLE_NAME):
+    """Último watermark (order_date, order_id) registrado; sem histórico, usa os máximos da tabela."""
+    if engine_has_table(connection, LOAD_LOG_TABLE):
+        log = tabela_log(MetaData())
+        linha = connection.execute(
+            select(log.c.watermark_order_date, log.c.watermark_order_id).order_by(log.c.load_id.desc()).limit(1)
+        ).first()
+        if linha is not None:
+            return tuple(linha)
+    tabela = Table(table_name, MetaData(), autoload_with=connection)
+    return tuple(connection.execute(select(func.max(tabela.c.order_date), func.max(tabela.c.order_id))).one())
+
+def _maior(*valores):
+    valores = [v for v in valores if not pd.isnull(v)]
+    return max(valores) if valores else None
+
+def watermark_de(df):
+    """Watermark (maior order_date, maior order_id) de um DataFrame."""
+    if df.empty:
+        return (None, None)
+    return (df["order_date"].max(), df["order_id"].max())
+
+def _ha_mudancas(connection, table_name, staging, colunas):
+    """Se as linhas da staging diferem das linhas atuais dos mesmos pedidos (EXCEPT nos dois sentidos)."""
+    lista = ", ".join(colunas)
+    novas = f"SELECT {lista} FROM {staging}"
+    atuais = f"SELECT {lista} FROM {table_name} WHERE order_id IN (SELECT DISTINCT order_id FROM {staging})"
+    for a, b in ((novas, atuais), (atuais, novas)):
+        if connection.execute(text(f"SELECT COUNT(*) FROM ({a} EXCEPT {b}) diferenca")).scalar():
+            return True
+    return False
+
+def carregar_incremental(df, engine, table_name=TABLE_NAME, batch_bytes=DEFAULT_BATCH_MB * 1024 ** 2,
+                         lookback_days=DEFAULT_LOOKBACK_DAYS):
+    """Carrega apenas os pedidos novos ou alterados desde o último watermark.
+
+    Pedidos com order_id acima do watermark ou com order_date a partir de
+    (watermark - lookback_days) são apagados e reinseridos na mesma transação.
+    Se essas linhas já estão no banco como estão na planilha, nada é gravado
+    nem registrado (a versão dos dados não muda). Retorna se os dados mudaram.
+    """
+    with engine.connect() as connection:
+        existe = engine_has_table(connection, table_name)
+    if not existe:
+        logging.info(f"Tabela '{table_name}' não existe; executando carga completa.")
+        carregar_bulk(df, engine, table_name, batch_bytes)
+        with engine.begin() as connection:
+            registrar_carga(connection, "completa", watermark_de(df), len(df), len(df))
+        return True
+
+    inicio = time.perf_counter()
+    df = df.copy()
+    df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
+    with engine.begin() as connection:
+        _iniciar_transacao_ddl(connection)
+        wm_data, wm_pedido = ler_watermark(connection, table_name)
+        filtro = pd.Series(True, index=df.index)
+        if wm_pedido is not None and wm_data is not None:
+            corte = pd.Timestamp(wm_data) - pd.Timedelta(days=lookback_days)
+            filtro = (df["order_id"] > wm_pedido) | (df["order_date"] >= corte)
+        pedidos_afetados = df.loc[filtro, "order_id"].unique()
+        # Todas as linhas dos pedidos afetados (um pedido é apagado e reinserido por inteiro)
+        delta = df[df["order_id"].isin(pedidos_afetados)]
+        logging.info(f"Watermark atual: order_date={wm_data}, order_id={wm_pedido}. "
+                     f"{len(pedidos_afetados)} pedidos ({len(delta)} linhas) a atualizar.")
+
+        destino = Table(table_name, MetaData(), autoload_with=connection)
+        colunas = [c.name for c in destino.columns]
+        extras = [c for c in delta.columns if c not in colunas]
+        if extras:
+            logging.warning(f"Colunas ignoradas (não existem em '{table_name}'): {extras}")
+        _alargar_colunas(connection, destino, delta)
+        staging = Table(f"{table_name}_delta", MetaData(), *[Column(c.name, c.type) for c in destino.columns])
+        staging.drop(connection, checkfirst=True)
+        staging.create(connection)
+        _inserir_em_lotes(connection, staging, delta.reindex(columns=colunas), batch_bytes)
+
+        # Compara só as colunas vindas da planilha (revenue, por exemplo, é preenchida no pós-carga)
+        if not _ha_mudancas(connection, table_name, staging.name, [c for c in colunas if c in delta.columns]):
+            staging.drop(connection)
+            logging.info(f"Carga incremental sem mudanças em {time.perf_counter() - inicio:.1f}s: "
+                         f"os {len(pedidos_afetados)} pedidos do delta já estão atualizados.")
+            return False
+
+        # Delete-and-insert por pedido afetado, na mesma transação
+        removidas = connection.execute(text(
+            f"DELETE FROM {table_name} WHERE order_id IN (SELECT DISTINCT order_id FROM {staging.name})"
+        )).rowcount
+        lista = ", ".join(colunas)
+        inseridas = connection.execute(text(
+            f"INSERT INTO {table_name} ({lista}) SELECT {lista} FROM {staging.name}"
+        )).rowcount
+        staging.drop(connection)
+
+        novo_data, novo_pedido = watermark_de(delta)
+        watermark = (_maior(wm_data, novo_data), _maior(wm_pedido, novo_pedido))
+        registrar_carga(connection, "incremental", watermark, len(df), inseridas, removidas, len(pedidos_afetados))
+
+    logging.info(f"Carga incremental concluída em {time.perf_counter() - inicio:.1f}s: "
+                 f"{inseridas} linhas inseridas, {removidas} removidas, {len(pedidos_afetados)} pedidos afetados.")
+    return True
+
+def carregar_bulk(df, engine, table_name=TABLE_NAME, batch_bytes=DEFAULT_BATCH_MB * 1024 ** 2):
+    """Carrega o DataFrame em uma tabela de staging e a troca pela definitiva em uma transação.
+
+    A troca (renomear a antiga, renomear a staging, apagar a antiga) é atômica
+    onde o DDL é transacional: Postgres, SQL Server (sp_rename) e SQLite (com
+    BEGIN explícito). No MySQL/MariaDB cada DDL faz commit implícito, e os
+    leitores podem não encontrar a tabela entre os dois renames.
+
+    Retorna o número de linhas por segundo da inserção.
+    """
+    staging = f"{table_name}_staging"
+    antiga = f"{table_name}_old"
+    metadata = MetaData()
+    tipos = tipos_sql(df)
+    tabela_staging = Table(staging, metadata, *[Column(c, tipos[c]) for c in df.columns])
+
+    with engine.begin() as connection:
+        tabela_staging.drop(connection, checkfirst=True)
+        tabela_staging.create(connection)
+
+    inicio = time.perf_counter()
+    with engine.begin() as connection:
+        _inserir_em_lotes(connection, tabela_staging, df, batch_bytes)
+    duracao = time.perf_counter() - inicio
+    linhas_por_segundo = len(df) / duracao if duracao > 0 else float("inf")
+
+    # Troca atômica: os leitores veem a tabela antiga ou a nova, nunca uma tabela vazia;
+    # uma falha no meio da troca desfaz os renames
+    with engine.begin() as connection:
+        _iniciar_transacao_ddl(connection)
+        existe = engine.dialect.has_table(connection, table_name)
+        if existe:
+            Table(antiga, MetaData()).drop(connection, checkfirst=True)
+            _renomear(connection, table_name, antiga)
+        _renomear(connection, staging, table_name)
+        if existe:
+            connection.execute(text(f"DROP TABLE {antiga}"))
+
+    logging.info(f"Carga bulk concluída: {len(df)} linhas em {duracao:.1f}s ({linhas_por_segundo:,.0f} linhas/s).")
+    return linhas_por_segundo
+
+def _truncar_data(coluna, grao, dialeto):
+    """Expressão SQL com o início do dia ou do mês de uma coluna de data."""
+    if dialeto == "sqlite":
+        return func.date(coluna) if grao == "dia" else func.date(coluna, "start of month")
+    if dialeto == "mssql":
+        if grao == "dia":
+            return cast(coluna, Date)
+        return func.datefromparts(func.year(coluna), func.month(coluna), 1)
+    return cast(func.date_trunc("day" if grao == "dia" else "month", coluna), Date)
+
+def tabela_resumo(metadata, nome):
+    """Resumo por período e membro de uma dimensão (produto, cliente ou país)."""
+    return Table(
+        nome, metadata,
+        Column("period", Date, nullable=False),
+        Column("dimension", Unicode(16), nullable=False),
+        Column("member", Unicode(256)),
+        Column("revenue", Float(precision=53)),
+        Column("quantity", BigInteger),
+        Column("freight", Float(precision=53)),
+        Column("orders", BigInteger),
+        Index(f"ix_{nome}_period", "dimension", "period"),
+    )
+
+def _persistir_receita(connection, tabela):
+    """Adiciona a coluna revenue, se necessário, e a preenche nas linhas sem valor."""
+    if "revenue" not in tabela.c:
+        tipo = Float(precision=53).compile(dialect=connection.dialect)
+        # O SQL Server não aceita a palavra COLUMN no ADD
+        coluna = "" if connection.dialect.name == "mssql" else "COLUMN "
+        connection.execute(text(f"ALTER TABLE {tabela.name} ADD {coluna}revenue {tipo}"))
+    return connection.execute(text(
+        f"UPDATE {tabela.name} SET revenue = unit_price * quantity * (1 - discount) WHERE revenue IS NULL"
+    )).rowcount
+
+def _criar_indices(connection, tabela):
+    existentes = {i["name"] for i in inspect(connection).get_indexes(tabela.name)}
+    criados = []
+    for coluna in INDEXED_COLUMNS:
+        nome = f"ix_{tabela.name}_{coluna}"
+        if coluna in tabela.c and nome not in existentes:
+            Index(nome, tabela.c[coluna]).create(connection)
+            criados.append(nome)
+    return criados
+
+def _reconstruir_resumo(connection, tabela, grao, nome):
+    resumo = tabela_resumo(MetaData(), nome)
+    resumo.create(connection, checkfirst=True)
+    connection.execute(resumo.delete())
+    periodo = _truncar_data(tabela.c.order_date, grao, connection.dialect.name)
+    for dimensao, origem in SUMMARY_DIMENSIONS.items():
+        if origem not in tabela.c:
+            continue
+        membro = tabela.c[origem]
+        consulta = (select(periodo, literal(dimensao), membro,
+                           func.sum(tabela.c.revenue), func.sum(tabela.c.quantity), func.sum(tabela.c.freight),
+                           func.count(distinct(tabela.c.order_id)))
+                    .where(tabela.c.order_date.isnot(None))
+                    .group_by(periodo, membro))
+        connection.execute(resumo.insert().from_select(
+            ["period", "dimension", "member", "revenue", "quantity", "freight", "orders"], consulta))
+    return connection.execute(select(func.count()).select_from(resumo)).scalar()
+
+def pos_carga(engine, table_name=TABLE_NAME):
+    """Índices, coluna revenue persistida e tabelas de resumo diária/mensal, em uma única transação.
+
+    Sem isso, o agente SQL e as consultas do dashboard fazem full scan em northwind_data.
+    """
+    inicio_total = time.perf_counter()
+    with engine.begin() as connection:
+        _iniciar_transacao_ddl(connection)
+        tabela = Table(table_name, MetaData(), autoload_with=connection)
+
+        inicio = time.perf_counter()
+        atualizadas = _persistir_receita(connection, tabela)
+        logging.info(f"Coluna revenue persistida: {atualizadas} linhas preenchidas em {time.perf_counter() - inicio:.2f}s.")
+        # Reflete de novo para enxergar a coluna revenue recém-criada
+        tabela = Table(table_name, MetaData(), autoload_with=connection)
+
+        inicio = time.perf_counter()
+        criados = _criar_indices(connection, tabela)
+        logging.info(f"Índices criados em {time.perf_counter() - inicio:.2f}s: {criados or 'nenhum (já existiam)'}.")
+
+        for grao, nome in SUMMARY_TABLES.items():
+            inicio = time.perf_counter()
+            linhas = _reconstruir_resumo(connection, tabela, grao, nome)
+            logging.info(f"Resumo '{nome}' reconstruído: {linhas} linhas em {time.perf_counter() - inicio:.2f}s.")
+    logging.info(f"Pós-carga concluído em {time.perf_counter() - inicio_total:.1f}s.")
+
+def gerar_cartao_esquema(engine, table_name=TABLE_NAME):
+    """Gera e grava o cartão de esquema usado pelo agente SQL, com a versão da carga atual."""
+    with engine.begin() as connection:
+        versao = versao_dados(connection, table_name)
+        cartao = gerar_cartao(connection, table_name, versao)
+        salvar_cartao(connection, cartao)
+    logging.info(f"Cartão de esquema gravado em '{SCHEMA_CARD_TABLE}' (versão {versao}, "
+                 f"{len(cartao['colunas'])} colunas) em {cartao['segundos']:.2f}s.")
+
+def load_data_to_sql(excel_file_path=EXCEL_FILE_PATH, database_url=None, bulk=False, batch_mb=DEFAULT_BATCH_MB,
+                     incremental=False, lookback_days=DEFAULT_LOOKBACK_DAYS, post_load=True, processos=None):
+    """Lê dados do Excel (um caminho ou uma lista de caminhos) e carrega para o SQL Server."""
+    database_url = database_url or DATABASE_URL
+    caminhos = [excel_file_path] if isinstance(excel_file_path, str) else list(excel_file_path)
+    try:
+        logging.info(f"Lendo dados de {len(caminhos)} arquivo(s) Excel: {', '.join(caminhos)}...")
+        # Todas as planilhas de pedidos de cada arquivo, lidas em paralelo (pool de processos);
+        # linhas repetidas de (order_id, product_id) ficam apenas uma vez (vale a do último arquivo)
+        df, leituras = ler_arquivos([(os.path.basename(c), c) for c in caminhos], ler=ler_planilha_completa,
+                                    processos=processos)
+        for leitura in leituras.itertuples():
+            logging.info(f"  {leitura.arquivo} [{leitura.planilha}]: {leitura.linhas} linhas em "
+                         f"{leitura.segundos:.1f}s ({leitura.origem})")
+        logging.info(f"Leitura do Excel concluída. {len(df)} linhas encontradas.")
+
+        logging.info("Conectando ao banco de dados SQL Server...")
+        # Criar a engine do SQLAlchemy
+        engine = criar_engine(database_url)
+
+        # Verificar conexão (opcional, mas bom para debug)
+        with engine.connect() as connection:
+            logging.info("Conexão com o banco de dados estabelecida com sucesso.")
+
+        limpar_colunas(df)
+
+        logging.info(f"Carregando dados para a tabela '{TABLE_NAME}' no SQL Server...")
+        mudou = True
+        if incremental:
+            # Apenas os pedidos novos ou alterados desde o último watermark
+            mudou = carregar_incremental(df, engine, TABLE_NAME, batch_bytes=batch_mb * 1024 ** 2,
+                                         lookback_days=lookback_days)
+        elif bulk:
+            # Lotes dimensionados por bytes, tipos explícitos e troca atômica via staging
+            carregar_bulk(df, engine, TABLE_NAME, batch_bytes=batch_mb * 1024 ** 2)
+        else:
+            # Usar to_sql para carregar o DataFrame
+            # if_exists='replace': Se a tabela já existir, ela será excluída e recriada.
+            #                  Use 'append' se quiser adicionar dados a uma tabela existente.
+            #                  Use 'fail' se não quiser fazer nada caso a tabela exista.
+            inicio = time.perf_counter()
+            df.to_sql(TABLE_NAME, con=engine, if_exists='replace', index=False, chunksize=1000) # chunksize ajuda com tabelas grandes
+            duracao = time.perf_counter() - inicio
+            logging.info(f"to_sql concluído em {duracao:.1f}s ({len(df) / max(duracao, 1e-9):,.0f} linhas/s).")
+        if not incremental:
+            # Registra o watermark da carga completa para as próximas cargas incrementais
+            with engine.begin() as connection:
+                registrar_carga(connection, "completa", watermark_de(df), len(df), len(df))
+        if not mudou:
+            # Mesma versão dos dados: resumos e cartão de esquema continuam válidos
+            logging.info("Dados inalterados; pós-carga e cartão de esquema mantidos.")
+        else:
+            if post_load:
+                pos_carga(engine, TABLE_NAME)
+            gerar_cartao_esquema(engine, TABLE_NAME)
+        logging.info(f"Dados carregados com sucesso na tabela '{TABLE_NAME}'.")
+
+    except FileNotFoundError:
+        logging.error(f"Erro: Arquivo Excel não encontrado em '{', '.join(caminhos)}'.")
+    except ImportError:
+        logging.error("Erro: Biblioteca 'openpyxl' necessária para ler arquivos .xlsx. Instale com 'pip install openpyxl'.")
+    except Exception as e:
+        logging.error(f"Ocorreu um erro inesperado durante o carregamento dos dados: {e}")
+        logging.exception("Detalhes do erro:") # Loga o stack trace completo
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carrega a planilha Northwind para a tabela northwind_data.")
+    parser.add_argument("--arquivo", nargs="+", default=[EXCEL_FILE_PATH],
+                        help="Planilha(s) .xlsx de origem; todas as planilhas de cada arquivo são lidas em paralelo")
+    parser.add_argument("--processos", type=int, help="Processos de leitura (padrão: número de CPUs)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Carga em lotes por bytes, com tipos explícitos e troca atômica via tabela de staging")
+    parser.add_argument("--batch-mb", type=float, default=DEFAULT_BATCH_MB, help="Tamanho de cada lote no modo bulk (MB)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Carrega apenas pedidos novos ou alterados desde o último watermark (order_date, order_id)")
+    parser.add_argument("--lookback-dias", type=int, default=DEFAULT_LOOKBACK_DAYS,
+                        help="Dias antes do watermark reprocessados no modo incremental")
+    parser.add_argument("--sem-pos-carga", action="store_true",
+                        help="Não cria índices, a coluna revenue nem as tabelas de resumo após a carga")
+    args = parser.parse_args()
+
+    if not DATABASE_URL:
+        logging.error("Erro: A variável de ambiente DATABASE_URL não está definida.")
+        exit()
+
+    for arquivo in args.arquivo:
+        if not os.path.exists(arquivo):
+            logging.error(f"Erro: O arquivo Excel '{arquivo}' não foi encontrado.")
+            exit()
+
+    load_data_to_sql(args.arquivo, bulk=args.bulk, batch_mb=args.batch_mb,
+                     incremental=args.incremental, lookback_days=args.lookback_dias,
+                     post_load=not args.sem_pos_carga, processos=args.processos)
@@ -0,0 +1,122 @@
+# mergeable_stats.py
+"""Médias, co-momentos e histogramas por dia, combináveis para qualquer janela.
+
+Para as métricas numéricas da lista (receita, frete, quantidade, desconto e
+preço unitário; nunca ids), cada dia guarda o número de linhas, as médias,
+a matriz de co-momentos (somas dos produtos dos desvios) e as contagens de
+um histograma com bordas fixas. Uma janela combina os dias pela fórmula de
+Chan (a generalização do Welford para partições), em tempo proporcional ao
+número de dias: a matriz de correlação e as distribuições marginais saem
+desses parciais, sem voltar às linhas.
+
+Só entram as linhas com todas as métricas preenchidas (casos completos).
+"""
+import numpy as np
+import pandas as pd
+
+COLS_NUMERICAS = ["revenue", "freight", "quantity", "discount", "unit_price"]
+DEFAULT_BINS = 30
+
+
+class Momentos:
+    """Estatísticas combinadas de uma janela."""
+
+    def __init__(self, colunas, n, media, comomentos, histogramas, bordas):
+        self.colunas = colunas
+        self.n = int(n)
+        self.media = media
+        self.comomentos = comomentos
+        self.histogramas = histogramas
+        self.bordas = bordas
+
+    def cov(self):
+        """Matriz de covariância amostral (ddof=1), como no pandas."""
+        return pd.DataFrame(self.comomentos / max(self.n - 1, 1), index=self.colunas, columns=self.colunas)
+
+    def corr(self):
+        """Matriz de correlação de Pearson (NaN para métricas constantes na janela)."""
+        desvio = np.sqrt(np.diag(self.comomentos))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.comomentos / np.outer(desvio, desvio)
+        return pd.DataFrame(corr, index=self.colunas, columns=self.colunas)
+
+    def histograma(self, coluna):
+        """Histograma da métrica na janela, como DataFrame (centro, contagem, largura)."""
+        k = self.colunas.index(coluna)
+        bordas = self.bordas[k]
+        return pd.DataFrame({
+            "centro": (bordas[:-1] + bordas[1:]) / 2,
+            "contagem": self.histogramas[k],
+            "largura": np.diff(bordas),
+        })
+
+
+class MomentosDiarios:
+    """Parciais por dia: contagem, médias, co-momentos e histogramas das métricas."""
+
+    def __init__(self, colunas, n, media, comomentos, histogramas, bordas):
+        self.colunas = colunas
+        self.n = n                      # (dias,)
+        self.media = media              # (dias, k)
+        self.comomentos = comomentos    # (dias, k, k)
+        self.histogramas = histogramas  # (dias, k, bins)
+        self.bordas = bordas            # (k, bins + 1)
+
+    @classmethod
+    def construir(cls, codigo_dia, n_dias, df, colunas=COLS_NUMERICAS, bins=DEFAULT_BINS):
+        """`codigo_dia`: posição do dia de cada linha (ver `codificar_dias`); `df`: linhas com as métricas."""
+        colunas = [c for c in colunas if c in df.columns]
+        k = len(colunas)
+        valores = np.empty((len(df), k))
+        for a, c in enumerate(colunas):
+            valores[:, a] = df[c].to_numpy(dtype="float64", na_value=np.nan)
+        completos = ~np.isnan(valores).any(axis=1)
+        valores, dias = valores[completos], np.asarray(codigo_dia)[completos]
+
+        n = np.bincount(dias, minlength=n_dias).astype("float64")
+        somas = np.zeros((n_dias, k))
+        for a in range(k):
+            somas[:, a] = np.bincount(dias, weights=valores[:, a], minlength=n_dias)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media = np.where(n[:, None] > 0, somas / n[:, None], 0.0)
+        # Desvios em relação à média do próprio dia (duas passadas por dia, estável numericamente)
+        desvios = valores - media[dias]
+        comomentos = np.zeros((n_dias, k, k))
+        for a in range(k):
+            for b in range(a, k):
+                comomentos[:, a, b] = comomentos[:, b, a] = np.bincount(
+                    dias, weights=desvios[:, a] * desvios[:, b], minlength=n_dias)
+
+        # Bordas fixas (faixa do dataset inteiro), para que os histogramas dos dias possam ser somados
+        bordas = np.zeros((k, bins + 1))
+        histogramas = np.zeros((n_dias, k, bins), dtype=np.int64)
+        for a in range(k):
+            minimo, maximo = (valores[:, a].min(), valores[:, a].max()) if len(valores) else (0.0, 1.0)
+            if maximo <= minimo:
+                minimo, maximo = minimo - 0.5, maximo + 0.5
+            bordas[a] = np.linspace(minimo, maximo, bins + 1)
+            classe = np.clip(np.searchsorted(bordas[a], valores[:, a], side="right") - 1, 0, bins - 1)
+            histogramas[:, a, :] = np.bincount(dias * bins + classe, minlength=n_dias * bins).reshape(n_dias, bins)
+        return cls(colunas, n, media, comomentos, histogramas, bordas)
+
+    @classmethod
+    def de_linhas(cls, df, colunas=COLS_NUMERICAS, bins=DEFAULT_BINS):
+        """Estatísticas de um conjunto de linhas, sem separar por dia (ex.: amostra do backend SQL)."""
+        return cls.construir(np.zeros(len(df), dtype=np.int64), 1, df, colunas, bins).combinar(0, 1)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.n, self.media, self.comomentos, self.histogramas, self.bordas))
+
+    def combinar(self, i, j):
+        """Combina os dias [i, j) pela fórmula de Chan: M = soma(M_d) + soma(n_d (m_d - m)(m_d - m)^T)."""
+        n_d = self.n[i:j]
+        n = n_d.sum()
+        k = len(self.colunas)
+        if n == 0:
+            return Momentos(self.colunas, 0, np.full(k, np.nan), np.zeros((k, k)),
+                            np.zeros((k, self.histogramas.shape[2]), dtype=np.int64), self.bordas)
+        media = (n_d[:, None] * self.media[i:j]).sum(axis=0) / n
+        delta = self.media[i:j] - media
+        comomentos = self.comomentos[i:j].sum(axis=0) + np.einsum("d,da,db->ab", n_d, delta, delta)
+        return Momentos(self.colunas, n, media, comomentos, self.histogramas[i:j].sum(axis=0), self.bordas)
@@ -0,0 +1,162 @@
+# multi_ingest.py
+"""Leitura de vários arquivos .xlsx (e de todas as suas planilhas) em paralelo.
+
+Cada planilha de cada arquivo vira uma tarefa em um pool de processos: a
+leitura com openpyxl é Python puro e não se beneficia de threads. Cada
+planilha passa pela mesma limpeza da leitura de um único arquivo
+(colunas essenciais e receita em `ler_xlsx_streaming`, ou a planilha
+inteira para a carga no SQL), e as partes são concatenadas com categorias
+unificadas, para que as colunas categóricas não virem object. Linhas
+repetidas de (order_id, product_id), comuns quando as exportações se
+sobrepõem, ficam apenas uma vez: vale a do último arquivo informado.
+
+Com o pool, ler um ano de exportações mensais leva aproximadamente o tempo
+do maior arquivo, e não a soma dos tempos.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+from parquet_cache import hash_bytes
+from xlsx_ingest import compactar_tipos, ler_xlsx_streaming, pico_rss_mb
+
+CHAVE_LINHA = ["order_id", "product_id"]
+
+
+def ler_planilha_essencial(fonte, planilha):
+    """Colunas essenciais, com receita e tipos compactos (caminho do dashboard); retorna (df, estatisticas)."""
+    return ler_xlsx_streaming(fonte, sheet_name=planilha)
+
+
+def ler_planilha_completa(fonte, planilha):
+    """Todas as colunas da planilha, como a carga no SQL sempre leu; retorna (df, estatisticas)."""
+    df = pd.read_excel(fonte, sheet_name=planilha)
+    return df, {"pico_rss_mb": pico_rss_mb()}
+
+
+def listar_planilhas(fonte):
+    """Nomes das planilhas do arquivo (apenas o índice do workbook é lido)."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(_abrir(fonte), read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def _abrir(fonte):
+    # Bytes (upload) viram um arquivo em memória; caminhos são lidos do disco pelo próprio worker
+    return io.BytesIO(fonte) if isinstance(fonte, bytes) else fonte
+
+
+def _ler_tarefa(ler, arquivo, fonte, planilha):
+    """Executada no worker: lê uma planilha e mede o tempo e o pico de RSS do worker na leitura."""
+    inicio = time.perf_counter()
+    df, estatisticas = ler(_abrir(fonte), planilha)
+    return df, {"arquivo": arquivo, "planilha": planilha, "linhas": len(df),
+                "segundos": round(time.perf_counter() - inicio, 3), "origem": f"processo {os.getpid()}",
+                "pico_rss_mb": round(estatisticas.get("pico_rss_mb", float("nan")), 1)}
+
+
+def concatenar(partes):
+    """Concatena DataFrames com as categorias unificadas (em ordem alfabética, como astype("category"))."""
+    partes = [p for p in partes if p is not None]
+    if len(partes) == 1:
+        return partes[0]
+    categoricas = {c for p in partes for c in p.columns if isinstance(p[c].dtype, pd.CategoricalDtype)}
+    for col in categoricas:
+        valores = set()
+        for p in partes:
+            if col in p.columns:
+                serie = p[col]
+                valores.update(serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype)
+                               else serie.dropna().unique())
+        tipo = pd.CategoricalDtype(sorted(valores, key=str))
+        partes = [p.assign(**{col: p[col].astype(tipo)}) if col in p.columns else p for p in partes]
+    df = pd.concat(partes, ignore_index=True)
+    # Colunas compactadas para tipos diferentes em cada arquivo (ex.: int16 e int32) voltam ao tipo
+    # compacto; colunas lidas em 64 bits (carga no SQL) ficam como estão
+    tipos = {c: {p[c].dtype for p in partes if c in p.columns} for c in df.columns}
+    compactas = [c for c, t in tipos.items() if len(t) > 1 and any(x.kind in "iuf" and x.itemsize < 8 for x in t)]
+    if compactas:
+        df[compactas] = compactar_tipos(df[compactas].copy())
+    return df
+
+
+def remover_duplicadas(df):
+    """Mantém a última ocorrência de cada (order_id, product_id); retorna (df, removidas)."""
+    if not all(c in df.columns for c in CHAVE_LINHA):
+        return df, 0
+    chaves = df[CHAVE_LINHA]
+    repetidas = chaves.duplicated(keep="last") & chaves.notna().all(axis=1)
+    n = int(repetidas.sum())
+    return (df[~repetidas].reset_index(drop=True), n) if n else (df, 0)
+
+
+def ler_arquivos(arquivos, ler=ler_planilha_essencial, processos=None, cache=None):
+    """Lê todas as planilhas de `arquivos` (pares nome -> caminho ou bytes) e retorna (df, leituras).
+
+    `ler(fonte, planilha)` retorna (df, estatisticas). `leituras` é um
+    DataFrame com o tempo e o pico de RSS (no worker) de cada planilha;
+    attrs["pico_rss_mb"] é o maior deles. Com `cache` (um ParquetCache),
+    cada arquivo em bytes já processado é lido do cache e só os demais vão
+    para o pool. Planilhas sem a coluna order_id são ignoradas quando o
+    arquivo tem outras planilhas com pedidos.
+    """
+    inicio = time.perf_counter()
+    arquivos = list(arquivos)
+    # Resultados por posição (dois uploads podem ter o mesmo nome)
+    resultados, leituras, tarefas, posicoes, digests = {}, [], [], [], {}
+    for i, (nome, fonte) in enumerate(arquivos):
+        if cache is not None and isinstance(fonte, bytes):
+            digests[i] = hash_bytes(fonte)
+            em_cache = cache.get(digests[i])
+            if em_cache is not None:
+                resultados[i] = em_cache
+                leituras.append({"arquivo": nome, "planilha": None, "linhas": len(em_cache),
+                                 "segundos": 0.0, "origem": "cache", "pico_rss_mb": float("nan")})
+                continue
+        for planilha in listar_planilhas(fonte):
+            tarefas.append((ler, nome, fonte, planilha))
+            posicoes.append(i)
+
+    processos = min(len(tarefas), processos or os.cpu_count() or 1)
+    if processos > 1:
+        # "spawn": o processo do Streamlit tem threads, e um fork poderia herdar locks travados
+        with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn")) as pool:
+            lidas = list(pool.map(_ler_tarefa, *zip(*tarefas)))
+    else:
+        lidas = [_ler_tarefa(*tarefa) for tarefa in tarefas]
+
+    por_arquivo = {}
+    for i, (df, leitura) in zip(posicoes, lidas):
+        por_arquivo.setdefault(i, []).append(df)
+        leituras.append(leitura)
+    for i, planilhas in por_arquivo.items():
+        com_pedidos = [p for p in planilhas if "order_id" in p.columns] or planilhas
+        resultados[i] = concatenar(com_pedidos)
+        if i in digests:
+            try:
+                cache.put(digests[i], resultados[i])
+            except (OSError, pa.ArrowException) as e:
+                # Falha ao gravar o cache não deve impedir a análise
+                logging.warning(f"Não foi possível gravar o cache Parquet de '{arquivos[i][0]}': {e}")
+
+    # Ordem dos arquivos informada: em linhas repetidas, vale a do último arquivo
+    df = concatenar([resultados[i] for i in range(len(arquivos))])
+    df, removidas = remover_duplicadas(df)
+    leituras = pd.DataFrame(leituras, columns=["arquivo", "planilha", "linhas", "segundos", "origem", "pico_rss_mb"])
+    total = time.perf_counter() - inicio
+    logging.info(f"{len(arquivos)} arquivo(s), {len(tarefas)} planilha(s) lidas em {processos} processo(s): "
+                 f"{len(df)} linhas em {total:.1f}s (soma das leituras: {leituras['segundos'].sum():.1f}s, "
+                 f"{removidas} linhas repetidas removidas).")
+    leituras.attrs.update(total_segundos=round(total, 3), removidas=removidas, processos=processos,
+                          pico_rss_mb=leituras["pico_rss_mb"].max())
+    return df, leituras
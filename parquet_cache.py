@@ -0,0 +1,106 @@
+# parquet_cache.py
+"""Cache em disco, endereçado por conteúdo, dos DataFrames já processados.
+
+Cada entrada é um arquivo Parquet cujo nome é o hash dos bytes do arquivo
+de origem combinado com uma versão de esquema. Qualquer processo (ou worker)
+que receba o mesmo arquivo lê o Parquet via memory-map em vez de reprocessar
+o XLSX. O tamanho total do diretório é limitado e as entradas menos usadas
+recentemente são removidas primeiro (LRU pelo mtime do arquivo).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "northwind_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+def hash_bytes(data):
+    """Retorna o SHA-256 (hex) dos bytes informados."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParquetCache:
+    """Armazena DataFrames em Parquet com limite de tamanho e remoção LRU."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, schema_version="1"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.schema_version = str(schema_version)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, digest):
+        # A versão do esquema entra no nome: mudar a lógica de limpeza invalida as entradas antigas
+        key = hash_bytes(f"{self.schema_version}:{digest}".encode())
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, digest):
+        """Lê a entrada (via memory-map) ou retorna None se não existir."""
+        path = self._path(digest)
+        try:
+            table = pq.read_table(path, memory_map=True)
+        except (FileNotFoundError, pa.ArrowInvalid, OSError):
+            return None
+        # Atualiza o mtime para marcar o uso recente (ordem LRU)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return table.to_pandas()
+
+    def put(self, digest, df):
+        """Grava a entrada de forma atômica e aplica o limite de tamanho."""
+        path = self._path(digest)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove as entradas menos usadas até o diretório caber em max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                logging.info(f"Cache Parquet: entrada removida (LRU) {os.path.basename(path)}")
+            except FileNotFoundError:
+                pass
+
+    def get_or_build(self, data, build):
+        """Retorna o DataFrame em cache para `data` ou o constrói com `build(data)`."""
+        digest = hash_bytes(data)
+        df = self.get(digest)
+        if df is not None:
+            return df
+        df = build(data)
+        try:
+            self.put(digest, df)
+        except (OSError, pa.ArrowException) as e:
+            # Falha ao gravar o cache não deve impedir a análise
+            logging.warning(f"Não foi possível gravar o cache Parquet: {e}")
+        return df
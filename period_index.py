@@ -0,0 +1,66 @@
+# period_index.py
+"""Índice de datas ordenadas para recorte de períodos por busca binária.
+
+O dataset é mantido ordenado pela coluna de data; qualquer janela
+[inicio, fim] vira um par de offsets obtido com `np.searchsorted`, e o
+recorte é um `iloc` contíguo (sem máscara booleana nem cópia dos dados).
+"""
+import numpy as np
+import pandas as pd
+
+
+def ordenar_por_data(df, data_col="order_date"):
+    """Ordena (de forma estável) pela coluna de data, com datas nulas no final."""
+    if data_col not in df.columns or df[data_col].is_monotonic_increasing:
+        return df
+    return df.sort_values(data_col, kind="stable", na_position="last", ignore_index=True)
+
+
+def intervalo(datas, inicio, fim):
+    """Offsets [i, j) das datas ordenadas `datas` (sem NaT) dentro de [inicio, fim]."""
+    tipo = datas.dtype
+    i = np.searchsorted(datas, np.datetime64(pd.Timestamp(inicio)).astype(tipo), side="left")
+    j = np.searchsorted(datas, np.datetime64(pd.Timestamp(fim)).astype(tipo), side="right")
+    return int(i), int(max(i, j))
+
+
+def codificar_dias(datas):
+    """(dias, códigos): dias distintos ordenados (sem NaT) e a posição do dia de cada data.
+
+    As datas nulas recebem o código len(dias), uma linha extra ao fim das
+    estruturas por dia, que só entra nas contagens do dataset inteiro.
+    """
+    datas = np.asarray(datas, dtype="datetime64[ns]")
+    sem_data = np.isnat(datas)
+    dias = np.unique(datas[~sem_data])
+    codigos = np.searchsorted(dias, datas)
+    codigos[sem_data] = len(dias)
+    return dias, codigos
+
+
+class IndicePeriodo:
+    """DataFrame ordenado por data com recorte de janelas em O(log n)."""
+
+    def __init__(self, df, data_col="order_date"):
+        self.df = ordenar_por_data(df, data_col)
+        self.data_col = data_col
+        datas = self.df[data_col].to_numpy()
+        # As datas nulas ficam no final e nunca pertencem a uma janela
+        self.datas = datas[:len(datas) - int(np.isnat(datas).sum())]
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.datas[0]) if len(self.datas) else pd.NaT
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.datas[-1]) if len(self.datas) else pd.NaT
+
+    def offsets(self, inicio, fim):
+        """Offsets [i, j) das linhas com data em [inicio, fim]."""
+        return intervalo(self.datas, inicio, fim)
+
+    def fatiar(self, inicio, fim):
+        """Linhas com data em [inicio, fim], como fatia contígua do DataFrame ordenado."""
+        i, j = self.offsets(inicio, fim)
+        return self.df.iloc[i:j]
@@ -0,0 +1,298 @@
+# report.py
+"""Relatório estático das seis seções do dashboard, sem Streamlit nem navegador.
+
+Carrega a fonte uma única vez (planilha(s) .xlsx, .parquet ou "sql"),
+recorta a janela de datas e monta as seções com as mesmas funções do app
+(dashboard_charts.py), cada seção em um processo de um pool. Os processos
+são criados por fork depois da carga: o DataFrame, o índice e o cubo diário
+são compartilhados em modo somente leitura (copy-on-write), sem serializar
+os dados para cada worker.
+
+Saídas, no diretório informado:
+
+- relatorio.html: página única e autocontida (plotly.js embutido), com os
+  indicadores e todos os gráficos;
+- tabelas/<secao>__<grafico>.csv e .parquet: a tabela agregada de cada
+  gráfico e os indicadores de cada seção.
+
+Uso: python report.py --fonte base_northwind.xlsx [--inicio 2024-01-01 --fim 2024-12-31 | --ultimos-dias 30]
+     [--saida relatorio] [--processos 6] [--agrupar Mês]
+"""
+import argparse
+import html
+import logging
+import multiprocessing
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+
+import dashboard_charts as charts
+from chart_budget import MODO_AMOSTRA, MODO_DENSIDADE, OrcamentoPontos
+from multi_ingest import ler_arquivos
+from parquet_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ParquetCache
+from period_index import ordenar_por_data
+from shared_source import VersaoDataset, fonte_da_configuracao
+from xlsx_ingest import VERSAO_ESQUEMA
+
+DEFAULT_SAIDA = "relatorio"
+FORMATOS = ("csv", "parquet")
+
+# Janela e dados do relatório; definidos antes de criar o pool, herdados pelos workers via fork
+_CONTEXTO = {}
+
+
+# ==============================
+# SEÇÕES
+# ==============================
+# Cada seção devolve uma lista de (título, item): item é um Grafico ou uma lista de indicadores
+def secao_dashboard(cubo, cubo_previous, df, orcamento, group_by):
+    return [("Principais Indicadores", charts.indicadores_gerais(cubo, cubo_previous)),
+            ("Tendência de Receita", charts.grafico_tendencia_receita(cubo, group_by, orcamento))]
+
+def secao_vendas(cubo, cubo_previous, df, orcamento, group_by):
+    blocos = [("Evolução da Receita e Número de Pedidos", charts.grafico_receita_pedidos(cubo, group_by, orcamento))]
+    if cubo.tem("product_name"):
+        blocos.append(("Top 10 Produtos por Receita",
+                       charts.grafico_top_produtos_receita(cubo.agregar("product_name", ["revenue"]))))
+    if cubo.tem("category_name"):
+        blocos.append(("Receita por Categoria", charts.grafico_receita_categoria(cubo)))
+    return blocos
+
+def secao_quantidade(cubo, cubo_previous, df, orcamento, group_by):
+    blocos = [("Quantidade Vendida ao Longo do Tempo", charts.grafico_quantidade_tempo(cubo, group_by, orcamento))]
+    if cubo.tem("ship_country"):
+        blocos.append(("Top 10 Destinos (Países) por Quantidade", charts.grafico_top_paises_quantidade(cubo)))
+    blocos.append(("Distribuição da Quantidade por Pedido", charts.grafico_histograma_quantidade(df, orcamento)))
+    return blocos
+
+def secao_clientes(cubo, cubo_previous, df, orcamento, group_by):
+    if not cubo.tem("company_name"):
+        return []
+    top_clientes, pedidos_receita = charts.graficos_clientes(cubo)
+    return [("Top 10 Clientes por Receita", top_clientes),
+            ("Relação: Número de Pedidos x Receita", pedidos_receita)]
+
+def secao_produtos(cubo, cubo_previous, df, orcamento, group_by):
+    blocos = [("Indicadores de Produtos", charts.indicadores_produtos(cubo))]
+    if cubo.tem("product_name"):
+        prod_all = cubo.agregar("product_name", ["revenue", "quantity"])
+        blocos.append(("Top 10 Produtos por Receita", charts.grafico_top_produtos_receita(prod_all)))
+        blocos.append(("Top 10 Produtos por Quantidade Vendida", charts.grafico_top_produtos_quantidade(prod_all)))
+    if "unit_price" in df.columns:
+        blocos.append(("Distribuição de Preços Unitários", charts.grafico_histograma_precos(df, orcamento)))
+    preco_desconto = charts.grafico_preco_desconto(df, orcamento)
+    if preco_desconto is not None:
+        blocos.append(("Preço vs. Desconto", preco_desconto))
+    return blocos
+
+def secao_segmentacoes(cubo, cubo_previous, df, orcamento, group_by):
+    blocos = []
+    momentos = charts.momentos_janela(cubo, df)
+    if momentos.n > 1:
+        blocos.append(("Mapa de Correlação entre Variáveis Numéricas", charts.grafico_correlacao(momentos)))
+        blocos.append(("Scatter Matrix de Métricas Estratégicas", charts.grafico_matriz_dispersao(df, orcamento)))
+    if momentos.n > 0:
+        blocos.append(("Distribuições Marginais", charts.grafico_marginais(momentos)))
+    if cubo.tem("ship_country") and cubo.tem("freight"):
+        blocos.append(("Frete Médio por País", charts.grafico_frete_pais(cubo)))
+    if cubo.tem("shipping_days_sum"):
+        blocos.append(("Tempo de Envio Médio por Mês", charts.grafico_tempo_envio(cubo)))
+    blocos.append(("Bubble Chart: Receita, Desconto e Quantidade", charts.grafico_bolhas(df, orcamento)))
+    return blocos
+
+SECOES = {
+    "Dashboard Geral": secao_dashboard,
+    "Vendas": secao_vendas,
+    "Quantidade": secao_quantidade,
+    "Clientes": secao_clientes,
+    "Produtos": secao_produtos,
+    "Segmentações": secao_segmentacoes,
+}
+
+
+# ==============================
+# MONTAGEM (executada nos workers)
+# ==============================
+def nome_arquivo(texto):
+    """"Top 10 Produtos por Receita" -> "top_10_produtos_por_receita"."""
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+
+def gravar_tabela(tabela, diretorio, nome, formatos=FORMATOS):
+    """Grava a tabela em cada formato e retorna os caminhos relativos ao diretório do relatório."""
+    tabela = tabela.rename(columns=str)
+    caminhos = []
+    for formato in formatos:
+        caminho = os.path.join("tabelas", f"{nome}.{formato}")
+        if formato == "csv":
+            tabela.to_csv(os.path.join(diretorio, caminho), index=False)
+        else:
+            tabela.to_parquet(os.path.join(diretorio, caminho), index=False)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def _html_indicadores(indicadores):
+    cartoes = []
+    for rotulo, valor, *delta in indicadores:
+        delta = delta[0] if delta else None
+        classe = "negativo" if delta and delta.startswith("-") else "positivo"
+        extra = f'<div class="delta {classe}">{html.escape(delta)}</div>' if delta else ""
+        cartoes.append(f'<div class="kpi"><div class="rotulo">{html.escape(rotulo)}</div>'
+                       f'<div class="valor">{html.escape(valor)}</div>{extra}</div>')
+    return f'<div class="kpis">{"".join(cartoes)}</div>'
+
+
+def montar_secao(nome):
+    """Calcula a seção `nome` sobre os dados do contexto, grava as tabelas e retorna o HTML da seção."""
+    inicio = time.perf_counter()
+    ctx = _CONTEXTO
+    blocos = SECOES[nome](ctx["cubo"], ctx["cubo_previous"], ctx["df"], ctx["orcamento"], ctx["group_by"])
+    partes, tabelas = [f"<h2>{html.escape(nome)}</h2>"], []
+    for titulo, item in blocos:
+        arquivo = f"{nome_arquivo(nome)}__{nome_arquivo(titulo)}"
+        partes.append(f"<h4>{html.escape(titulo)}</h4>")
+        if isinstance(item, list):
+            partes.append(_html_indicadores(item))
+            tabela = pd.DataFrame([(r, v, d[0] if d else None) for r, v, *d in item],
+                                  columns=["indicador", "valor", "delta"])
+        else:
+            if item.aviso:
+                partes.append(f'<p class="aviso">{html.escape(item.aviso)}</p>')
+            partes.append(item.figura.to_html(full_html=False, include_plotlyjs=False, default_width="100%"))
+            tabela = item.tabela
+        if tabela is not None:
+            caminhos = gravar_tabela(tabela, ctx["diretorio"], arquivo, ctx["formatos"])
+            tabelas.extend(caminhos)
+            links = " · ".join(f'<a href="{html.escape(c)}">{os.path.splitext(c)[1][1:]}</a>' for c in caminhos)
+            partes.append(f'<p class="tabelas">Tabela: {links}</p>')
+    segundos = time.perf_counter() - inicio
+    partes.append(f'<p class="aviso">Seção montada em {segundos:.2f}s (processo {os.getpid()}).</p>')
+    return {"secao": nome, "html": "\n".join(partes), "tabelas": tabelas, "segundos": segundos}
+
+
+# ==============================
+# CARGA E ORQUESTRAÇÃO
+# ==============================
+def carregar(fontes):
+    """Carrega a fonte uma única vez: um caminho (.xlsx/.parquet), "sql", "sql:<tabela>" ou vários .xlsx."""
+    cache = ParquetCache(
+        cache_dir=os.getenv("NORTHWIND_CACHE_DIR", DEFAULT_CACHE_DIR),
+        max_bytes=int(os.getenv("NORTHWIND_CACHE_MAX_MB", DEFAULT_MAX_BYTES // 1024 ** 2)) * 1024 ** 2,
+        schema_version=VERSAO_ESQUEMA,
+    )
+    if len(fontes) == 1:
+        fonte = fonte_da_configuracao(fontes[0], cache)
+        return VersaoDataset(fonte.carregar(), None, str(fonte))
+    df, _ = ler_arquivos([(os.path.basename(f), f) for f in fontes])
+    return VersaoDataset(ordenar_por_data(df), None, f"{len(fontes)} arquivos")
+
+
+def janela(dataset, inicio=None, fim=None, ultimos_dias=None):
+    """(inicio, fim) da janela: datas informadas, últimos N dias até a maior data ou o período inteiro."""
+    fim = pd.Timestamp(fim).normalize() if fim else dataset.indice.max_date.normalize()
+    if ultimos_dias:
+        inicio = fim - timedelta(days=ultimos_dias - 1)
+    inicio = pd.Timestamp(inicio).normalize() if inicio is not None else dataset.indice.min_date.normalize()
+    return inicio, fim
+
+
+def gerar_relatorio(dataset, inicio, fim, diretorio=DEFAULT_SAIDA, processos=None, group_by="Mês",
+                    orcamento=None, formatos=FORMATOS):
+    """Monta todas as seções em paralelo e grava relatorio.html e as tabelas; retorna o caminho do HTML."""
+    from plotly.offline import get_plotlyjs
+
+    os.makedirs(os.path.join(diretorio, "tabelas"), exist_ok=True)
+    # Período anterior de mesma duração, para os deltas dos indicadores (como no app)
+    delta_days = (fim - inicio).days + 1
+    prev_fim = inicio - timedelta(days=1)
+    prev_inicio = prev_fim - timedelta(days=delta_days - 1)
+    _CONTEXTO.update(
+        df=dataset.indice.fatiar(inicio, fim), cubo=dataset.cubo.fatiar(inicio, fim),
+        cubo_previous=dataset.cubo.fatiar(prev_inicio, prev_fim), orcamento=orcamento or OrcamentoPontos(),
+        group_by=group_by, diretorio=diretorio, formatos=formatos,
+    )
+
+    comeco = time.perf_counter()
+    processos = min(len(SECOES), processos or os.cpu_count() or 1)
+    if processos > 1 and "fork" in multiprocessing.get_all_start_methods():
+        # fork: os workers herdam os dados já carregados, sem cópia nem serialização
+        with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("fork")) as pool:
+            secoes = list(pool.map(montar_secao, SECOES))
+    else:
+        # Sem fork (Windows) os dados teriam de ser serializados para cada worker; as seções rodam aqui
+        processos = 1
+        secoes = [montar_secao(nome) for nome in SECOES]
+    total = time.perf_counter() - comeco
+    for secao in secoes:
+        logging.info(f"Seção '{secao['secao']}': {secao['segundos']:.2f}s, {len(secao['tabelas'])} arquivo(s) de tabela.")
+
+    cabecalho = (f"Fonte: {html.escape(dataset.origem)} | Período: {inicio:%d/%m/%Y} a {fim:%d/%m/%Y} "
+                 f"({len(_CONTEXTO['df']):,} linhas) | Gerado em {pd.Timestamp.now():%d/%m/%Y %H:%M} | "
+                 f"Seções montadas em {total:.1f}s com {processos} processo(s)")
+    pagina = f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Northwind Traders | Relatório</title>
+<script type="text/javascript">{get_plotlyjs()}</script>
+<style>
+body {{ background-color: #F7F9F9; color: #2C3E50; font-family: "Segoe UI", sans-serif; margin: 2rem; }}
+h1, h2, h4 {{ color: #2C3E50; font-weight: 700; }}
+h2 {{ border-top: 2px solid #4CA1AF; padding-top: 1rem; margin-top: 2.5rem; }}
+.kpis {{ display: flex; flex-wrap: wrap; gap: 10px; }}
+.kpi {{ background-color: #ffffff; border: 1px solid #dcdcdc; padding: 10px; border-radius: 8px; min-width: 180px; }}
+.kpi .rotulo {{ font-size: 0.85rem; }}
+.kpi .valor {{ font-size: 1.6rem; }}
+.delta.positivo {{ color: #09ab3b; }}
+.delta.negativo {{ color: #ff2b2b; }}
+.aviso, .tabelas {{ color: #808495; font-size: 0.85rem; }}
+</style>
+</head>
+<body>
+<h1>Northwind Traders | Relatório</h1>
+<p class="aviso">{cabecalho}</p>
+{"".join(secao["html"] for secao in secoes)}
+</body>
+</html>
+"""
+    caminho = os.path.join(diretorio, "relatorio.html")
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(pagina)
+    _CONTEXTO.clear()
+    logging.info(f"Relatório gravado em '{caminho}' ({os.path.getsize(caminho) / 1024 ** 2:.1f} MB); "
+                 f"seções em {total:.1f}s (soma: {sum(s['segundos'] for s in secoes):.1f}s).")
+    return caminho
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Gera o relatório HTML das seções do dashboard Northwind.")
+    parser.add_argument("--fonte", nargs="+", default=[os.getenv("NORTHWIND_SOURCE", "base_northwind.xlsx")],
+                        help="Planilha(s) .xlsx, arquivo .parquet, \"sql\" ou \"sql:<tabela>\" (padrão: NORTHWIND_SOURCE)")
+    parser.add_argument("--inicio", help="Início da janela (AAAA-MM-DD; padrão: primeira data)")
+    parser.add_argument("--fim", help="Fim da janela (AAAA-MM-DD; padrão: última data)")
+    parser.add_argument("--ultimos-dias", type=int, help="Janela dos últimos N dias até --fim")
+    parser.add_argument("--saida", default=DEFAULT_SAIDA, help="Diretório do relatório e das tabelas")
+    parser.add_argument("--processos", type=int, help="Processos que montam as seções (padrão: número de CPUs, até 6)")
+    parser.add_argument("--agrupar", choices=["Dia", "Mês", "Ano"], default="Mês", help="Grão das séries temporais")
+    parser.add_argument("--orcamento", type=int, default=5000, help="Orçamento de pontos por gráfico em nível de linha")
+    parser.add_argument("--densidade", action="store_true",
+                        help="Dispersões acima do orçamento como densidade 2-D (padrão: amostra estratificada)")
+    parser.add_argument("--formatos", default=",".join(FORMATOS), help="Formatos das tabelas (csv, parquet)")
+    args = parser.parse_args()
+
+    inicio_carga = time.perf_counter()
+    dataset = carregar(args.fonte)
+    logging.info(f"Fonte '{dataset.origem}' carregada: {len(dataset.df):,} linhas em "
+                 f"{time.perf_counter() - inicio_carga:.1f}s.")
+    inicio, fim = janela(dataset, args.inicio, args.fim, args.ultimos_dias)
+    orcamento = OrcamentoPontos(max_pontos=args.orcamento, modo=MODO_DENSIDADE if args.densidade else MODO_AMOSTRA)
+    gerar_relatorio(dataset, inicio, fim, args.saida, processos=args.processos, group_by=args.agrupar,
+                    orcamento=orcamento, formatos=[f.strip() for f in args.formatos.split(",") if f.strip()])
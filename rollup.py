@@ -0,0 +1,199 @@
+# rollup.py
+"""Cubo diário pré-agregado usado pelas seções do dashboard.
+
+O cubo é construído uma vez por dataset, com chave dia × produto × cliente
+× país × categoria e medidas aditivas (receita, quantidade, frete, linhas e
+as somas/contagens necessárias para médias). Como um pedido tem um único
+cliente, país e data, a contagem de pedidos distintos fica em um segundo
+cubo, dia × cliente × país, onde ela também é aditiva.
+
+As seções filtram o cubo pela janela de datas e reagregam apenas até o
+grão pedido (Dia/Mês/Ano) ou a dimensão do gráfico, de modo que o custo
+depende do número de dias e combinações distintas, e não de linhas de pedido.
+As contagens distintas das dimensões (clientes, produtos, ...) saem de
+estruturas por dia combinadas na janela (distinct_sketch.py), assim como
+médias, co-momentos e histogramas das métricas numéricas (mergeable_stats.py).
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from distinct_sketch import ContagensDiarias
+from mergeable_stats import MomentosDiarios
+from period_index import codificar_dias, intervalo
+
+DIMENSOES = ["product_id", "product_name", "category_name", "company_name", "ship_country"]
+DIMENSOES_PEDIDO = ["company_name", "ship_country"]
+
+# Medida do cubo -> (coluna de origem, função de agregação)
+MEDIDAS = {
+    "revenue": ("revenue", "sum"),
+    "quantity": ("quantity", "sum"),
+    "freight": ("freight", "sum"),
+    "linhas": ("revenue", "size"),
+    "freight_n": ("freight", "count"),
+    "discount_sum": ("discount", "sum"),
+    "discount_n": ("discount", "count"),
+    "unit_price_sum": ("unit_price", "sum"),
+    "unit_price_n": ("unit_price", "count"),
+    "shipping_days_sum": ("shipping_days", "sum"),
+    "shipping_days_n": ("shipping_days", "count"),
+}
+
+# Médias derivadas: nome -> (soma, contagem)
+MEDIAS = {
+    "discount": ("discount_sum", "discount_n"),
+    "unit_price": ("unit_price_sum", "unit_price_n"),
+    "shipping_time": ("shipping_days_sum", "shipping_days_n"),
+    "freight_mean": ("freight", "freight_n"),
+}
+
+
+def rotulo_periodo(datas, group_by):
+    """Rótulo de período (Dia/Mês/Ano) para uma série de datas."""
+    if group_by == "Dia":
+        return datas.dt.date
+    if group_by == "Mês":
+        return datas.dt.to_period("M").astype(str)
+    return datas.dt.year.astype(str)
+
+
+class CuboDiario:
+    """Cubo diário de medidas aditivas e cubo de pedidos distintos."""
+
+    def __init__(self, linhas, pedidos, versao=None, contagens=None, momentos=None, faixa=None):
+        self.linhas = linhas
+        self.pedidos = pedidos
+        # Identifica o dataset de origem (ex.: hash do arquivo) nas chaves de cache
+        self.versao = versao
+        # Estruturas por dia (compartilhadas pelos recortes) e a faixa de dias do recorte
+        self.contagens = contagens
+        self.momentos_diarios = momentos
+        self.faixa = faixa if faixa is not None or contagens is None else contagens.completa
+
+    @classmethod
+    def construir(cls, df, versao=None):
+        """Constrói o cubo a partir do DataFrame de linhas de pedido processado."""
+        base = pd.DataFrame(index=df.index)
+        if "order_date" in df.columns:
+            base["dia"] = df["order_date"].dt.normalize()
+        else:
+            base["dia"] = pd.NaT
+        dims = [d for d in DIMENSOES if d in df.columns]
+        for d in dims:
+            base[d] = df[d]
+        for origem in {origem for origem, _ in MEDIDAS.values()}:
+            if origem == "shipping_days":
+                if "order_date" in df.columns and "shipped_date" in df.columns:
+                    base[origem] = (df["shipped_date"] - df["order_date"]).dt.days
+            elif origem in df.columns:
+                # Acumula em 64 bits: as colunas compactas (float32/int16) perderiam precisão nas somas
+                tipo = df[origem].dtype
+                base[origem] = df[origem].astype("float64" if tipo.kind == "f" else "int64" if tipo.kind in "iu" else tipo)
+        medidas = {nome: spec for nome, spec in MEDIDAS.items() if spec[0] in base.columns}
+
+        # dropna=False preserva linhas sem dimensão preenchida, mantendo os totais exatos
+        linhas = base.groupby(["dia"] + dims, observed=True, dropna=False, sort=False).agg(**medidas).reset_index()
+        linhas = linhas.sort_values("dia", kind="stable", ignore_index=True)
+
+        if "order_id" in df.columns:
+            dims_pedido = [d for d in DIMENSOES_PEDIDO if d in df.columns]
+            chaves = base[["dia"] + dims_pedido].assign(order_id=df["order_id"])
+            pedidos = (chaves.drop_duplicates()
+                       .groupby(["dia"] + dims_pedido, observed=True, dropna=False, sort=False)
+                       .size().rename("n_pedidos").reset_index()
+                       .sort_values("dia", kind="stable", ignore_index=True))
+        else:
+            pedidos = pd.DataFrame({"dia": pd.Series(dtype="datetime64[ns]"), "n_pedidos": pd.Series(dtype="int64")})
+        dias, codigo_dia = codificar_dias(base["dia"])
+        contagens = ContagensDiarias.construir(dias, codigo_dia, {d: base[d] for d in dims})
+        momentos = MomentosDiarios.construir(codigo_dia, len(dias) + 1, df)
+        return cls(linhas, pedidos, versao, contagens, momentos)
+
+    @cached_property
+    def _dias(self):
+        # Dias ordenados (sem NaT, que ficam no final) de cada tabela, para a busca binária
+        dias = []
+        for tabela in (self.linhas, self.pedidos):
+            valores = tabela["dia"].to_numpy()
+            dias.append(valores[:len(valores) - int(np.isnat(valores).sum())])
+        return dias
+
+    def fatiar(self, inicio, fim):
+        """Restringe o cubo aos dias em [inicio, fim] (fatias contíguas, por busca binária)."""
+        inicio = pd.Timestamp(inicio).normalize()
+        fim = pd.Timestamp(fim).normalize()
+        dias_linhas, dias_pedidos = self._dias
+        i, j = intervalo(dias_linhas, inicio, fim)
+        k, m = intervalo(dias_pedidos, inicio, fim)
+        faixa = self.contagens.faixa(inicio, fim) if self.contagens is not None else None
+        return CuboDiario(self.linhas.iloc[i:j], self.pedidos.iloc[k:m], self.versao,
+                          self.contagens, self.momentos_diarios, faixa)
+
+    def vazio(self):
+        """Cubo com as mesmas colunas e nenhuma linha."""
+        return CuboDiario(self.linhas.iloc[:0], self.pedidos.iloc[:0], self.versao,
+                          self.contagens, self.momentos_diarios, (0, 0))
+
+    @property
+    def empty(self):
+        return self.linhas.empty
+
+    def tem(self, coluna):
+        return coluna in self.linhas.columns or coluna in self.pedidos.columns
+
+    def total(self, medida):
+        """Total de uma medida aditiva, de uma média derivada ou de n_pedidos na janela."""
+        if medida == "n_pedidos":
+            return self.pedidos["n_pedidos"].sum()
+        if medida in MEDIAS:
+            soma, contagem = MEDIAS[medida]
+            n = self.linhas[contagem].sum()
+            return self.linhas[soma].sum() / n if n else float("nan")
+        return self.linhas[medida].sum()
+
+    def distintos(self, dimensao):
+        """Número de valores distintos de uma dimensão na janela (combinando as estruturas diárias)."""
+        if self.contagens is not None and self.contagens.tem(dimensao):
+            return self.contagens.contar(dimensao, self.faixa)
+        return self.linhas[dimensao].nunique()
+
+    def momentos(self):
+        """Médias, co-momentos e histogramas das métricas numéricas na janela, ou None sem os parciais."""
+        if self.momentos_diarios is None:
+            return None
+        return self.momentos_diarios.combinar(*self.faixa)
+
+    def agregar(self, por, medidas, group_by=None):
+        """Reagrega o cubo por uma dimensão ou pelo período (`por="periodo"` com `group_by`).
+
+        `medidas` pode incluir medidas aditivas, médias derivadas e "n_pedidos".
+        """
+        medidas = list(medidas)
+        resultado = None
+        aditivas = set()
+        for m in medidas:
+            if m == "n_pedidos":
+                continue
+            aditivas.update(MEDIAS.get(m, (m,)))
+        if aditivas:
+            resultado = self._agrupar(self.linhas, por, sorted(aditivas), group_by)
+            for m in medidas:
+                if m in MEDIAS:
+                    soma, contagem = MEDIAS[m]
+                    resultado[m] = resultado[soma] / resultado[contagem].where(resultado[contagem] > 0)
+        if "n_pedidos" in medidas:
+            pedidos = self._agrupar(self.pedidos, por, ["n_pedidos"], group_by)
+            resultado = pedidos if resultado is None else resultado.merge(pedidos, on=por, how="left")
+            resultado["n_pedidos"] = resultado["n_pedidos"].fillna(0).astype("int64")
+        return resultado[[por] + medidas]
+
+    @staticmethod
+    def _agrupar(tabela, por, colunas, group_by):
+        if por == "periodo":
+            chave = rotulo_periodo(tabela["dia"], group_by).rename("periodo")
+        else:
+            chave = tabela[por]
+        return (tabela.groupby(chave, observed=True, sort=True)[colunas].sum()
+                .reset_index())
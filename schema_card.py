@@ -0,0 +1,196 @@
+# schema_card.py
+"""Cartão de esquema pré-calculado da tabela northwind_data para o agente SQL.
+
+Gerado pelo loader ao fim de cada carga e gravado no próprio banco, com a
+versão dos dados (última carga registrada). Traz os tipos das colunas, os
+domínios de valores das colunas de baixa cardinalidade, faixas de valores,
+linhas de exemplo, índices e as tabelas de resumo. O agente recebe o cartão
+já no prompt e não precisa gastar chamadas com sql_db_list_tables,
+sql_db_schema nem com a busca de linhas de exemplo.
+
+Depende apenas do SQLAlchemy, para não pesar na inicialização do agente.
+"""
+import json
+import time
+
+import pandas as pd
+from sqlalchemy import (Boolean, Column, DateTime, LargeBinary, MetaData, String, Table, Text, Unicode, UnicodeText,
+                        cast, distinct, func, inspect, literal, select, union_all)
+
+SCHEMA_CARD_TABLE = "northwind_schema_card"
+SUMMARY_TABLES = ["northwind_daily_summary", "northwind_monthly_summary"]  # Criadas pelo pós-carga do loader
+
+DEFAULT_MAX_DOMINIO = 30  # Colunas com até esse número de valores distintos têm o domínio listado
+DEFAULT_LINHAS_EXEMPLO = 3
+
+
+def tabela_cartoes(metadata):
+    return Table(
+        SCHEMA_CARD_TABLE, metadata,
+        Column("table_name", Unicode(128), primary_key=True),
+        Column("version", Unicode(64), nullable=False),
+        Column("generated_at", DateTime, nullable=False),
+        Column("card", UnicodeText, nullable=False),
+    )
+
+
+def _tipo(coluna, dialeto):
+    try:
+        return coluna.type.compile(dialect=dialeto)
+    except Exception:
+        return str(coluna.type)
+
+
+def _valor(v):
+    # Valores do banco em formato serializável e legível no prompt
+    if v is None:
+        return None
+    if isinstance(v, float):
+        return round(v, 4)
+    if isinstance(v, (int, str)):
+        return v
+    return str(v)
+
+
+def _texto_longo(coluna):
+    # TEXT/NVARCHAR(MAX)/binários: sem DISTINCT nem MIN/MAX no SQL Server e caros nos demais
+    tipo = coluna.type
+    return isinstance(tipo, (Text, LargeBinary)) or (isinstance(tipo, String) and tipo.length is None)
+
+
+def _do_banco(v, coluna):
+    # Valores do domínio voltam como texto (ver _dominios); restaura o tipo numérico da coluna
+    try:
+        tipo = coluna.type.python_type
+    except NotImplementedError:
+        return v
+    if tipo in (int, float):
+        try:
+            return tipo(float(v)) if tipo is int else tipo(v)
+        except ValueError:
+            return v
+    return v
+
+
+def _dominios(connection, tabela, colunas):
+    """Valores distintos de cada coluna de baixa cardinalidade, em uma única consulta (UNION ALL)."""
+    if not colunas:
+        return {}
+    partes = [
+        select(literal(coluna.name).label("coluna"), cast(coluna, Unicode(4000)).label("valor"))
+        .where(coluna.isnot(None)).distinct()
+        for coluna in colunas
+    ]
+    dominios = {coluna.name: [] for coluna in colunas}
+    for nome, valor in connection.execute(union_all(*partes)):
+        dominios[nome].append(valor)
+    por_nome = {coluna.name: coluna for coluna in colunas}
+    return {nome: sorted((_do_banco(v, por_nome[nome]) for v in valores), key=lambda v: (str(type(v)), v))
+            for nome, valores in dominios.items()}
+
+
+def gerar_cartao(connection, table_name, versao, max_dominio=DEFAULT_MAX_DOMINIO,
+                 linhas_exemplo=DEFAULT_LINHAS_EXEMPLO):
+    """Monta o cartão de esquema (dict serializável em JSON) a partir do banco.
+
+    Contagem, valores distintos, mínimo e máximo de todas as colunas saem de
+    um único SELECT (uma leitura da tabela), e os domínios das colunas de
+    baixa cardinalidade de uma segunda consulta. Colunas de texto longo só
+    têm o tipo no cartão.
+    """
+    inicio = time.perf_counter()
+    tabela = Table(table_name, MetaData(), autoload_with=connection)
+    dialeto = connection.dialect
+    perfiladas = [c for c in tabela.columns if not _texto_longo(c)]
+    expressoes = [func.count().label("total")]
+    for i, coluna in enumerate(perfiladas):
+        expressoes.append(func.count(distinct(coluna)).label(f"d{i}"))
+        if not isinstance(coluna.type, Boolean):
+            # O SQL Server não aceita MIN/MAX em colunas bit
+            expressoes += [func.min(coluna).label(f"min{i}"), func.max(coluna).label(f"max{i}")]
+    perfil = connection.execute(select(*expressoes).select_from(tabela)).one()._mapping
+    total = perfil["total"]
+    pequenas = [c for i, c in enumerate(perfiladas) if perfil[f"d{i}"] <= max_dominio]
+    dominios = _dominios(connection, tabela, pequenas)
+
+    colunas = []
+    for coluna in tabela.columns:
+        info = {"nome": coluna.name, "tipo": _tipo(coluna, dialeto)}
+        if coluna not in perfiladas:
+            info["texto_longo"] = True
+        else:
+            i = perfiladas.index(coluna)
+            info["distintos"] = perfil[f"d{i}"]
+            if coluna.name in dominios:
+                info["dominio"] = [_valor(v) for v in dominios[coluna.name]]
+            else:
+                info["min"], info["max"] = _valor(perfil.get(f"min{i}")), _valor(perfil.get(f"max{i}"))
+        colunas.append(info)
+    amostra = [
+        {k: _valor(v) for k, v in linha._mapping.items()}
+        for linha in connection.execute(select(tabela).limit(linhas_exemplo))
+    ]
+    inspetor = inspect(connection)
+    indices = [i["column_names"] for i in inspetor.get_indexes(table_name)]
+    resumos = {
+        nome: [c["name"] for c in inspetor.get_columns(nome)]
+        for nome in SUMMARY_TABLES if inspetor.has_table(nome)
+    }
+    return {
+        "tabela": table_name,
+        "versao": versao,
+        "dialeto": dialeto.name,
+        "linhas": total,
+        "colunas": colunas,
+        "amostra": amostra,
+        "indices": indices,
+        "tabelas_resumo": resumos,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+def salvar_cartao(connection, cartao):
+    """Grava (substituindo) o cartão da tabela, na transação da conexão."""
+    tabela = tabela_cartoes(MetaData())
+    tabela.create(connection, checkfirst=True)
+    connection.execute(tabela.delete().where(tabela.c.table_name == cartao["tabela"]))
+    connection.execute(tabela.insert().values(
+        table_name=cartao["tabela"], version=cartao["versao"],
+        generated_at=pd.Timestamp.now().to_pydatetime(),
+        card=json.dumps(cartao, ensure_ascii=False, default=str),
+    ))
+
+
+def ler_cartao(connection, table_name):
+    """Cartão gravado para a tabela, ou None."""
+    if not connection.dialect.has_table(connection, SCHEMA_CARD_TABLE):
+        return None
+    tabela = tabela_cartoes(MetaData())
+    conteudo = connection.execute(
+        select(tabela.c.card).where(tabela.c.table_name == table_name)
+    ).scalar()
+    return json.loads(conteudo) if conteudo else None
+
+
+def cartao_como_texto(cartao):
+    """Texto compacto do cartão para o prompt do agente."""
+    linhas = [f"Tabela {cartao['tabela']} ({cartao['linhas']} linhas, dialeto {cartao['dialeto']}, "
+              f"versão dos dados {cartao['versao']}). Colunas:"]
+    for c in cartao["colunas"]:
+        if c.get("texto_longo"):
+            detalhe = "texto longo"
+        elif "dominio" in c:
+            detalhe = f"valores: {', '.join(map(str, c['dominio']))}"
+        else:
+            detalhe = f"{c['distintos']} valores distintos, de {c['min']} a {c['max']}"
+        linhas.append(f"- {c['nome']} {c['tipo']}: {detalhe}")
+    if cartao["amostra"]:
+        nomes = list(cartao["amostra"][0])
+        linhas.append("Linhas de exemplo (" + " | ".join(nomes) + "):")
+        linhas.extend(" | ".join(str(l[n]) for n in nomes) for l in cartao["amostra"])
+    if cartao["indices"]:
+        linhas.append("Colunas indexadas: " + ", ".join("/".join(i) for i in cartao["indices"]))
+    for nome, cols in cartao["tabelas_resumo"].items():
+        linhas.append(f"Tabela de resumo {nome}({', '.join(cols)}): dimension é 'product', 'customer' "
+                      "ou 'country' e member é o nome correspondente; prefira-a para totais por período.")
+    return "\n".join(linhas)
@@ -0,0 +1,147 @@
+# shared_source.py
+"""Dataset compartilhado por todas as sessões do processo.
+
+Em vez de cada sessão carregar a própria cópia do arquivo, o app carrega uma
+fonte configurada (uma planilha .xlsx ou a tabela `northwind_data` no SQL)
+uma única vez por processo. As sessões leem a mesma `VersaoDataset` (somente
+leitura) e seus filtros produzem fatias, não cópias. Uma thread em segundo
+plano verifica a assinatura da fonte e, quando ela muda, monta a nova versão
+por completo antes de trocá-la de uma só vez.
+"""
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from multi_ingest import ler_arquivos
+from parquet_cache import hash_bytes
+from period_index import IndicePeriodo, ordenar_por_data
+from rollup import CuboDiario
+from xlsx_ingest import COLS_ESSENCIAIS, processar_dados
+
+TABLE_NAME = "northwind_data"  # O mesmo nome de tabela usado em load_data_to_sql.py
+
+
+class VersaoDataset:
+    """Dataset carregado, com índice de datas e cubo diário; não deve ser alterado."""
+
+    def __init__(self, df, versao, origem):
+        self.indice = IndicePeriodo(df, "order_date") if "order_date" in df.columns else None
+        self.df = self.indice.df if self.indice is not None else df
+        self.cubo = CuboDiario.construir(self.df, versao=versao)
+        self.versao = versao
+        self.origem = origem
+        self.carregado_em = time.time()
+
+
+class FonteXlsx:
+    """Planilha no disco; a assinatura é o mtime e o tamanho do arquivo."""
+
+    def __init__(self, caminho, cache=None):
+        self.caminho = caminho
+        self.cache = cache
+
+    def __str__(self):
+        return os.path.basename(self.caminho)
+
+    def assinatura(self):
+        st = os.stat(self.caminho)
+        return (st.st_mtime_ns, st.st_size)
+
+    def carregar(self):
+        with open(self.caminho, "rb") as f:
+            data = f.read()
+        # Todas as planilhas de pedidos do arquivo, lidas em paralelo quando houver mais de uma
+        return ordenar_por_data(ler_arquivos([(str(self), data)], cache=self.cache)[0])
+
+
+class FonteParquet(FonteXlsx):
+    """Arquivo Parquet no disco (ex.: gerado por synthetic_data.py); lê apenas as colunas essenciais."""
+
+    def carregar(self):
+        import pyarrow.parquet as pq
+
+        existentes = set(pq.read_schema(self.caminho).names)
+        colunas = [c for c in COLS_ESSENCIAIS if c in existentes]
+        return ordenar_por_data(processar_dados(pd.read_parquet(self.caminho, columns=colunas)))
+
+
+class FonteSql:
+    """Tabela carregada por load_data_to_sql.py; a assinatura é a contagem de linhas e a maior data."""
+
+    def __init__(self, database_url, tabela=TABLE_NAME):
+        from sqlalchemy import create_engine
+
+        self.tabela = tabela
+        self.engine = create_engine(database_url, pool_pre_ping=True)
+
+    def __str__(self):
+        return f"SQL: {self.tabela}"
+
+    def assinatura(self):
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            return tuple(conn.execute(text(f"SELECT COUNT(*), MAX(order_date) FROM {self.tabela}")).one())
+
+    def carregar(self):
+        from sqlalchemy import inspect, text
+
+        # Apenas as colunas essenciais saem do banco
+        existentes = {c["name"] for c in inspect(self.engine).get_columns(self.tabela)}
+        colunas = [c for c in COLS_ESSENCIAIS if c in existentes]
+        with self.engine.connect() as conn:
+            df = pd.read_sql(text(f"SELECT {', '.join(colunas)} FROM {self.tabela}"), conn)
+        return ordenar_por_data(processar_dados(df))
+
+
+def fonte_da_configuracao(valor, cache=None):
+    """Interpreta NORTHWIND_SOURCE: "sql", "sql:<tabela>", o caminho de um .parquet ou de uma planilha .xlsx."""
+    if valor == "sql" or valor.startswith("sql:"):
+        database_url = os.getenv("DATABASE_URL")
+        if not database_url:
+            raise ValueError("NORTHWIND_SOURCE=sql requer a variável de ambiente DATABASE_URL.")
+        return FonteSql(database_url, valor.partition(":")[2] or TABLE_NAME)
+    if valor.endswith(".parquet"):
+        return FonteParquet(valor)
+    return FonteXlsx(valor, cache)
+
+
+class DatasetCompartilhado:
+    """Mantém a versão atual de uma fonte e a recarrega em segundo plano quando ela muda."""
+
+    def __init__(self, fonte, intervalo=30):
+        self.fonte = fonte
+        self.intervalo = intervalo
+        self._assinatura = fonte.assinatura()
+        self._atual = self._construir(self._assinatura)
+        self._thread = threading.Thread(target=self._monitorar, name="northwind-reload", daemon=True)
+        self._thread.start()
+
+    @property
+    def atual(self):
+        """Versão vigente; cada execução do script deve lê-la uma única vez."""
+        return self._atual
+
+    def _construir(self, assinatura):
+        inicio = time.perf_counter()
+        versao = hash_bytes(f"{self.fonte}:{assinatura}".encode())
+        dataset = VersaoDataset(self.fonte.carregar(), versao, str(self.fonte))
+        logging.info(f"Fonte compartilhada '{self.fonte}' carregada: {len(dataset.df)} linhas "
+                     f"em {time.perf_counter() - inicio:.1f}s.")
+        return dataset
+
+    def _monitorar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                assinatura = self.fonte.assinatura()
+                if assinatura != self._assinatura:
+                    logging.info(f"Fonte compartilhada '{self.fonte}' alterada; recarregando em segundo plano...")
+                    nova = self._construir(assinatura)
+                    # Troca atômica da referência: as sessões passam a ler a nova versão no próximo rerun
+                    self._atual, self._assinatura = nova, assinatura
+            except Exception as e:
+                logging.warning(f"Falha ao recarregar a fonte compartilhada '{self.fonte}': {e}")
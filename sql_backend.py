@@ -0,0 +1,287 @@
+# sql_backend.py
+"""Backend SQL do dashboard: consultas empurradas para o banco (pushdown).
+
+Em vez de trazer a tabela `northwind_data` para a memória, cada KPI, o
+filtro de período e os agregados das seções viram consultas `GROUP BY`
+parametrizadas sobre `DATABASE_URL`; só resultados pequenos atravessam a
+rede. `CuboSql` tem a mesma interface de consulta do `CuboDiario` (empty,
+tem, total, distintos, agregar, fatiar, vazio) e passa pelo
+`ServicoAgregacao` sem mudanças. Os gráficos em nível de linha recebem uma
+amostra limitada da janela.
+
+As consultas usam apenas o SQLAlchemy Core e rodam no SQL Server, no
+Postgres e no SQLite.
+"""
+import logging
+import math
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, distinct, extract, false, func, literal_column, select
+
+from db_engine import criar_engine_pool
+from parquet_cache import hash_bytes
+from rollup import MEDIAS, MEDIDAS
+from xlsx_ingest import COLS_ESSENCIAIS, processar_dados
+
+TABLE_NAME = "northwind_data"  # O mesmo nome de tabela usado em load_data_to_sql.py
+
+DEFAULT_AMOSTRA_LINHAS = 50_000  # Linhas por janela para os gráficos em nível de linha
+
+
+def _dias_entre(inicio, fim, dialeto):
+    """Expressão SQL com o número de dias entre duas colunas de data."""
+    if dialeto == "mssql":
+        return func.datediff(literal_column("day"), inicio, fim)
+    if dialeto == "sqlite":
+        return func.julianday(fim) - func.julianday(inicio)
+    if dialeto in ("mysql", "mariadb"):
+        return func.datediff(fim, inicio)
+    # Postgres e demais: diferença em segundos convertida para dias
+    return extract("epoch", fim - inicio) / 86400
+
+
+# Partes da data agrupadas em cada grão de período
+PARTES_PERIODO = {"Dia": ("year", "month", "day"), "Mês": ("year", "month"), "Ano": ("year",)}
+
+
+def _rotular_periodo(partes, group_by):
+    """Mesmos rótulos de `rollup.rotulo_periodo` a partir das partes da data vindas do banco."""
+    partes = partes.astype("int64")
+    if group_by == "Dia":
+        return pd.to_datetime(partes).dt.date
+    if group_by == "Mês":
+        return partes["year"].astype(str) + "-" + partes["month"].astype(str).str.zfill(2)
+    return partes["year"].astype(str)
+
+
+class CuboSql:
+    """Consultas agregadas sobre a tabela no banco, com a interface do `CuboDiario`."""
+
+    def __init__(self, engine, tabela, versao=None, inicio=None, fim=None, vazio=False):
+        self.engine = engine
+        self.tabela = tabela
+        # Identifica a versão dos dados no banco nas chaves de cache
+        self.versao = versao
+        self.inicio = inicio
+        self.fim = fim
+        self._vazio = vazio
+
+    # --- Expressões ---
+
+    def _origem(self, nome):
+        """Expressão SQL de uma coluna de origem das medidas (ou None, se indisponível)."""
+        c = self.tabela.c
+        if nome == "shipping_days":
+            if "order_date" in c and "shipped_date" in c:
+                return _dias_entre(c.order_date, c.shipped_date, self.engine.dialect.name)
+            return None
+        if nome == "revenue" and "revenue" not in c:
+            # Receita derivada na consulta, como em xlsx_ingest
+            if all(col in c for col in ("unit_price", "quantity", "discount")):
+                return c.unit_price * c.quantity * (1 - c.discount)
+            return None
+        return c[nome] if nome in c else None
+
+    def _medida(self, nome):
+        """Expressão agregada de uma medida aditiva do cubo ou de n_pedidos."""
+        if nome == "n_pedidos":
+            return func.count(distinct(self.tabela.c.order_id))
+        origem, funcao = MEDIDAS[nome]
+        if funcao == "size":
+            return func.count()
+        expr = self._origem(origem)
+        return func.count(expr) if funcao == "count" else func.sum(expr)
+
+    def _filtro(self):
+        """Condições da janela de datas: [inicio, fim + 1 dia), parametrizadas."""
+        if self._vazio:
+            return [false()]
+        if self.inicio is None:
+            return []
+        data = self.tabela.c.order_date
+        return [data >= self.inicio.to_pydatetime(),
+                data < (self.fim + pd.Timedelta(days=1)).to_pydatetime()]
+
+    def _select(self, *colunas):
+        return select(*colunas).select_from(self.tabela).where(*self._filtro())
+
+    def _executar(self, consulta):
+        with self.engine.connect() as conn:
+            return conn.execute(consulta).all()
+
+    # --- Interface do cubo ---
+
+    def fatiar(self, inicio, fim):
+        """Restringe as consultas aos dias em [inicio, fim]."""
+        inicio = pd.Timestamp(inicio).normalize()
+        fim = pd.Timestamp(fim).normalize()
+        if self.inicio is not None:
+            inicio, fim = max(inicio, self.inicio), min(fim, self.fim)
+        return CuboSql(self.engine, self.tabela, self.versao, inicio, fim, self._vazio)
+
+    def vazio(self):
+        """Cubo cujas consultas não retornam nenhuma linha."""
+        return CuboSql(self.engine, self.tabela, self.versao, vazio=True)
+
+    @property
+    def empty(self):
+        return self.total("linhas") == 0
+
+    def tem(self, coluna):
+        if coluna == "n_pedidos":
+            return "order_id" in self.tabela.c
+        if coluna in MEDIAS:
+            return all(self.tem(m) for m in MEDIAS[coluna])
+        if coluna in MEDIDAS:
+            return MEDIDAS[coluna][1] == "size" or self._origem(MEDIDAS[coluna][0]) is not None
+        return coluna in self.tabela.c
+
+    def total(self, medida):
+        """Total de uma medida aditiva, de uma média derivada ou de n_pedidos na janela."""
+        if medida in MEDIAS:
+            soma, contagem = MEDIAS[medida]
+            s, n = self._executar(self._select(self._medida(soma), self._medida(contagem)))[0]
+            return s / n if n else float("nan")
+        valor = self._executar(self._select(self._medida(medida)))[0][0]
+        return valor if valor is not None else 0
+
+    def distintos(self, dimensao):
+        """Número de valores distintos de uma dimensão na janela."""
+        coluna = self.tabela.c[dimensao]
+        return self._executar(self._select(func.count(distinct(coluna))))[0][0]
+
+    def momentos(self):
+        """Sem parciais por dia no banco: as seções calculam os momentos da amostra de linhas."""
+        return None
+
+    def agregar(self, por, medidas, group_by=None):
+        """Agrega por uma dimensão ou pelo período (`por="periodo"` com `group_by`) em um único GROUP BY.
+
+        `medidas` pode incluir medidas aditivas, médias derivadas e "n_pedidos".
+        """
+        medidas = list(medidas)
+        if por == "periodo":
+            data = self.tabela.c.order_date
+            chaves = [extract(parte, data).label(parte) for parte in PARTES_PERIODO[group_by]]
+            nao_nulo = data.isnot(None)
+        else:
+            chaves = [self.tabela.c[por].label(por)]
+            nao_nulo = self.tabela.c[por].isnot(None)
+        componentes = []
+        for m in medidas:
+            for componente in MEDIAS.get(m, (m,)):
+                if componente not in componentes:
+                    componentes.append(componente)
+        consulta = (self._select(*chaves, *[self._medida(c).label(c) for c in componentes])
+                    .where(nao_nulo)
+                    .group_by(*chaves)
+                    .order_by(*chaves))
+        with self.engine.connect() as conn:
+            resultado = pd.read_sql(consulta, conn)
+        if por == "periodo":
+            partes = [c.name for c in chaves]
+            resultado.insert(0, "periodo", _rotular_periodo(resultado[partes], group_by))
+            resultado = resultado.drop(columns=partes)
+        for m in medidas:
+            if m in MEDIAS:
+                soma, contagem = MEDIAS[m]
+                resultado[m] = resultado[soma] / resultado[contagem].where(resultado[contagem] > 0)
+            elif m == "n_pedidos":
+                resultado[m] = resultado[m].fillna(0).astype("int64")
+        return resultado[[por] + medidas]
+
+    # --- Consultas auxiliares ---
+
+    def limites(self):
+        """Menor e maior order_date da tabela."""
+        data = self.tabela.c.order_date
+        menor, maior = self._executar(select(func.min(data), func.max(data)))[0]
+        return pd.Timestamp(menor), pd.Timestamp(maior)
+
+    def amostra(self, max_linhas):
+        """Linhas da janela para os gráficos em nível de linha, limitadas a `max_linhas`.
+
+        Acima do limite, seleciona pedidos inteiros por passo fixo de order_id
+        (determinístico e espalhado por todo o período).
+        """
+        colunas = [self.tabela.c[c] for c in COLS_ESSENCIAIS if c in self.tabela.c]
+        consulta = self._select(*colunas).limit(max_linhas)
+        passo = math.ceil(self.total("linhas") / max_linhas) if max_linhas else 1
+        if passo > 1 and "order_id" in self.tabela.c:
+            consulta = consulta.where(self.tabela.c.order_id % passo == 0)
+        with self.engine.connect() as conn:
+            df = pd.read_sql(consulta, conn)
+        return processar_dados(df)
+
+
+class IndiceSql:
+    """Substitui o `IndicePeriodo`: limites de datas do banco e recortes como amostras limitadas."""
+
+    def __init__(self, cubo, max_linhas=DEFAULT_AMOSTRA_LINHAS, servico=None):
+        self.cubo = cubo
+        self.max_linhas = max_linhas
+        self.servico = servico
+        self.min_date, self.max_date = cubo.limites()
+
+    def fatiar(self, inicio, fim):
+        """Amostra das linhas com data em [inicio, fim] (memoizada no serviço de agregação, se houver)."""
+        janela = (pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize())
+        calcular = lambda: self.cubo.fatiar(*janela).amostra(self.max_linhas)
+        if self.servico is None:
+            return calcular()
+        return self.servico.obter((self.cubo.versao, janela, None, None, (self.max_linhas,), "amostra"), calcular)
+
+
+class DatasetSql:
+    """Versão dos dados no banco, com a mesma forma de `shared_source.VersaoDataset` (sem o DataFrame)."""
+
+    def __init__(self, cubo, origem, max_linhas=DEFAULT_AMOSTRA_LINHAS, servico=None):
+        self.df = None
+        self.cubo = cubo
+        self.indice = IndiceSql(cubo, max_linhas, servico)
+        self.versao = cubo.versao
+        self.origem = origem
+        self.carregado_em = time.time()
+
+
+class BackendSql:
+    """Engine com pool e tabela refletida; a versão dos dados é reavaliada a cada `intervalo` segundos."""
+
+    def __init__(self, database_url, tabela=TABLE_NAME, intervalo=30,
+                 max_linhas=DEFAULT_AMOSTRA_LINHAS, servico=None):
+        if not database_url:
+            raise ValueError("O backend SQL requer a variável de ambiente DATABASE_URL.")
+        self.engine = criar_engine_pool(database_url)
+        self.tabela = Table(tabela, MetaData(), autoload_with=self.engine)
+        self.intervalo = intervalo
+        self.max_linhas = max_linhas
+        self.servico = servico
+        self._lock = threading.Lock()
+        self._assinatura = None
+        self._verificado_em = 0.0
+        self._atual = None
+
+    def __str__(self):
+        return f"SQL: {self.tabela.name}"
+
+    def assinatura(self):
+        data = self.tabela.c.order_date
+        with self.engine.connect() as conn:
+            return tuple(conn.execute(select(func.count(), func.max(data)).select_from(self.tabela)).one())
+
+    @property
+    def atual(self):
+        """Versão vigente; a assinatura da tabela é consultada no máximo a cada `intervalo` segundos."""
+        with self._lock:
+            if self._atual is None or time.monotonic() - self._verificado_em >= self.intervalo:
+                assinatura = self.assinatura()
+                self._verificado_em = time.monotonic()
+                if assinatura != self._assinatura:
+                    versao = hash_bytes(f"{self}:{assinatura}".encode())
+                    cubo = CuboSql(self.engine, self.tabela, versao)
+                    self._atual = DatasetSql(cubo, str(self), self.max_linhas, self.servico)
+                    self._assinatura = assinatura
+                    logging.info(f"Backend SQL '{self}': nova versão dos dados ({assinatura[0]} linhas).")
+            return self._atual
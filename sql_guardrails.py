@@ -0,0 +1,267 @@
+# sql_guardrails.py
+"""Camada de execução protegida entre o toolkit do agente SQL e a engine.
+
+Toda consulta gerada pelo agente passa por aqui antes de chegar ao banco:
+
+- só comandos de leitura (SELECT/WITH), um por vez; a verificação do texto
+  apenas antecipa o erro: a garantia vem do próprio banco, com a transação
+  em modo somente leitura (PRAGMA query_only no SQLite, SET TRANSACTION
+  READ ONLY no Postgres) e sempre desfeita com rollback, nunca com commit;
+- o custo estimado do plano é comparado com um orçamento e consultas caras
+  (scans sem filtro, junções cartesianas) são rejeitadas antes de rodar;
+- a execução tem tempo limite no próprio banco;
+- o resultado é lido em blocos (cursor no servidor) e cortado no limite de
+  linhas, sem trazer o conjunto inteiro para o processo;
+- cada comando é registrado no log com a duração e as linhas retornadas.
+
+Estimativa de custo por dialeto: Postgres (EXPLAIN), SQL Server
+(SHOWPLAN_XML) e SQLite (EXPLAIN QUERY PLAN, com o custo aproximado pelo
+produto das linhas das tabelas varridas). Nos demais dialetos o orçamento
+não é verificado.
+
+No SQL Server não há transação somente leitura: o rollback desfaz qualquer
+escrita que escape da verificação do texto, mas o agente deve usar um login
+apenas de leitura (db_datareader) para bloquear também comandos fora de
+transação.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+DEFAULT_MAX_LINHAS = 1000
+DEFAULT_TIMEOUT_S = 30
+DEFAULT_CUSTO_MAXIMO = 1e8
+DEFAULT_TAMANHO_BLOCO = 500
+
+_COMANDOS_LEITURA = ("select", "with")
+# Palavras que indicam escrita em qualquer posição (CTEs que modificam dados, SELECT ... INTO)
+_PALAVRAS_ESCRITA = re.compile(
+    r"\b(insert|update|delete|merge|upsert|into|create|alter|drop|truncate|grant|revoke|"
+    r"exec|execute|call|attach|detach|pragma|vacuum|reindex|copy)\b", flags=re.I)
+
+
+class ConsultaRejeitada(SQLAlchemyError):
+    """Consulta bloqueada pelas proteções.
+
+    Deriva de SQLAlchemyError para que o toolkit do agente a devolva como
+    erro da ferramenta ("Error: ..."), permitindo que o agente reescreva a consulta.
+    """
+
+
+# Literais de texto ('...'), identificadores entre aspas ("...", [...]) e comentários, na ordem em que aparecem
+_TOKENS_IGNORADOS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\]|/\*.*?\*/|--[^\n]*", flags=re.S)
+
+
+def _sem_comentarios(sql):
+    # Comentários dentro de literais (ex.: '--') são preservados
+    return _TOKENS_IGNORADOS.sub(lambda m: " " if m.group().startswith(("/*", "--")) else m.group(), sql).strip()
+
+
+def _sem_literais(sql):
+    return _TOKENS_IGNORADOS.sub(" ", sql)
+
+
+def validar_leitura(sql):
+    """Aceita apenas um único comando de leitura (SELECT ou WITH ... SELECT).
+
+    Verificação antecipada, com mensagens úteis ao agente; a transação somente
+    leitura no banco (ver `ExecutorProtegido`) é que impede a escrita.
+    """
+    limpo = _sem_comentarios(sql).rstrip(";").strip()
+    # Ponto e vírgula e palavras reservadas só contam fora de literais (SELECT ';' é válido)
+    codigo = _sem_literais(limpo)
+    if ";" in codigo:
+        raise ConsultaRejeitada("Apenas um comando por execução é permitido.")
+    if not codigo.strip().lower().startswith(_COMANDOS_LEITURA):
+        raise ConsultaRejeitada("Apenas consultas de leitura (SELECT) são permitidas.")
+    escrita = _PALAVRAS_ESCRITA.search(codigo)
+    if escrita:
+        raise ConsultaRejeitada(f"Apenas consultas de leitura são permitidas ('{escrita.group()}' encontrado).")
+    return limpo
+
+
+class ExecutorProtegido:
+    """Executa consultas com limite de linhas, tempo limite, orçamento de custo e leitura em blocos."""
+
+    def __init__(self, engine, max_linhas=DEFAULT_MAX_LINHAS, timeout_s=DEFAULT_TIMEOUT_S,
+                 custo_maximo=DEFAULT_CUSTO_MAXIMO, tamanho_bloco=DEFAULT_TAMANHO_BLOCO):
+        self.engine = engine
+        self.max_linhas = max_linhas
+        self.timeout_s = timeout_s
+        self.custo_maximo = custo_maximo
+        self.tamanho_bloco = tamanho_bloco
+        # Histórico dos comandos: sql, duração, linhas, custo estimado e situação
+        self.historico = []
+        self._lock = threading.Lock()
+        self._linhas_tabela = {}
+
+    # --- Estimativa de custo ---
+
+    def custo_estimado(self, connection, sql):
+        """Custo estimado do plano no dialeto da conexão, ou None se não houver estimativa."""
+        dialeto = connection.dialect.name
+        if dialeto == "postgresql":
+            plano = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            plano = json.loads(plano) if isinstance(plano, str) else plano
+            return float(plano[0]["Plan"]["Total Cost"])
+        if dialeto == "mssql":
+            connection.exec_driver_sql("SET SHOWPLAN_XML ON")
+            try:
+                xml = connection.exec_driver_sql(sql).scalar()
+            finally:
+                connection.exec_driver_sql("SET SHOWPLAN_XML OFF")
+            custos = [float(c) for c in re.findall(r'StatementSubtreeCost="([\d.Ee+-]+)"', xml or "")]
+            return max(custos) if custos else None
+        if dialeto == "sqlite":
+            return self._custo_sqlite(connection, sql)
+        return None
+
+    def _contar(self, connection, tabela):
+        if tabela not in self._linhas_tabela:
+            self._linhas_tabela[tabela] = connection.execute(text(f'SELECT COUNT(*) FROM "{tabela}"')).scalar()
+        return self._linhas_tabela[tabela]
+
+    def _custo_sqlite(self, connection, sql):
+        # Sem custo no EXPLAIN do SQLite: cada SCAN multiplica pelas linhas da tabela
+        # (laços aninhados) e cada SEARCH por índice, pelo log das linhas
+        tabelas = set(inspect(connection).get_table_names())
+        apelidos = {}
+        for tabela, apelido in re.findall(r"(?:from|join|,)\s+(\w+)(?:\s+(?:as\s+)?(\w+))?", sql, flags=re.I):
+            if tabela in tabelas:
+                apelidos[tabela] = tabela
+                if apelido and apelido.lower() not in ("on", "where", "join", "group", "order", "limit", "inner",
+                                                        "left", "right", "cross", "natural", "using"):
+                    apelidos[apelido] = tabela
+        maior = max((self._contar(connection, t) for t in set(apelidos.values())), default=1)
+        custo = 1.0
+        for linha in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+            detalhe = linha[-1]
+            encontrado = re.match(r"(SCAN|SEARCH) (\w+)", detalhe)
+            if not encontrado:
+                continue
+            operacao, nome = encontrado.groups()
+            linhas = self._contar(connection, apelidos[nome]) if nome in apelidos else maior
+            custo *= max(linhas, 1) if operacao == "SCAN" else math.log2(max(linhas, 2))
+        return custo
+
+    # --- Somente leitura ---
+
+    def _somente_leitura(self, connection):
+        """Coloca a transação em modo somente leitura; retorna uma função que o desfaz (ou None)."""
+        dialeto = connection.dialect.name
+        if dialeto == "sqlite":
+            # Vale para a conexão (do pool): é desligado ao devolvê-la
+            connection.exec_driver_sql("PRAGMA query_only = ON")
+            return lambda: connection.exec_driver_sql("PRAGMA query_only = OFF")
+        if dialeto == "postgresql":
+            # Precisa ser o primeiro comando da transação
+            connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+        elif dialeto in ("mysql", "mariadb"):
+            connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+        return None
+
+    # --- Tempo limite ---
+
+    def _aplicar_timeout(self, connection):
+        """Tempo limite no banco; retorna uma função que o desfaz (ou None)."""
+        dialeto = connection.dialect.name
+        if dialeto == "postgresql":
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.timeout_s * 1000)}")
+        elif dialeto in ("mysql", "mariadb"):
+            connection.exec_driver_sql(f"SET SESSION MAX_EXECUTION_TIME = {int(self.timeout_s * 1000)}")
+        elif dialeto == "mssql":
+            # Tempo limite de consulta do pyodbc (em segundos)
+            bruta = connection.connection.dbapi_connection
+            anterior = bruta.timeout
+            bruta.timeout = int(math.ceil(self.timeout_s))
+            return lambda: setattr(bruta, "timeout", anterior)
+        elif dialeto == "sqlite":
+            # O handler de progresso interrompe a consulta quando o prazo vence
+            bruta = connection.connection.dbapi_connection
+            prazo = time.monotonic() + self.timeout_s
+            bruta.set_progress_handler(lambda: int(time.monotonic() > prazo), 10_000)
+            return lambda: bruta.set_progress_handler(None, 0)
+        return None
+
+    # --- Execução ---
+
+    def executar(self, sql, parametros=None):
+        """Executa a consulta e retorna (linhas como dicts, truncado?)."""
+        inicio = time.perf_counter()
+        registro = {"sql": sql, "custo": None, "linhas": 0, "truncado": False, "situacao": "ok"}
+        try:
+            sql = validar_leitura(sql)
+            with self.engine.connect() as connection:
+                if connection.dialect.name in ("mysql", "mariadb"):
+                    # No MySQL o modo vale para a próxima transação: vem antes do BEGIN
+                    self._somente_leitura(connection)
+                transacao = connection.begin()
+                restaurar = None
+                try:
+                    if connection.dialect.name not in ("mysql", "mariadb"):
+                        restaurar = self._somente_leitura(connection)
+                    if self.custo_maximo is not None:
+                        registro["custo"] = self.custo_estimado(connection, sql)
+                        if registro["custo"] is not None and registro["custo"] > self.custo_maximo:
+                            raise ConsultaRejeitada(
+                                f"Custo estimado {registro['custo']:,.0f} acima do orçamento de "
+                                f"{self.custo_maximo:,.0f}. Filtre por período, agregue ou use as tabelas de resumo.")
+                    desfazer = self._aplicar_timeout(connection) if self.timeout_s else None
+                    try:
+                        linhas, truncado = self._ler_em_blocos(connection, sql, parametros)
+                    finally:
+                        if desfazer:
+                            desfazer()
+                finally:
+                    # Nunca há commit: o que escapar das proteções acima é desfeito
+                    transacao.rollback()
+                    if restaurar:
+                        restaurar()
+            registro.update(linhas=len(linhas), truncado=truncado)
+            return linhas, truncado
+        except ConsultaRejeitada as e:
+            registro["situacao"] = f"rejeitada: {e}"
+            raise
+        except SQLAlchemyError as e:
+            mensagem = str(e).lower()
+            if "readonly" in mensagem or "read-only" in mensagem or "read only" in mensagem:
+                registro["situacao"] = "rejeitada: escrita bloqueada pelo banco"
+                raise ConsultaRejeitada("Apenas consultas de leitura (SELECT) são permitidas.") from e
+            if "interrupt" in mensagem or "timeout" in mensagem or "canceling statement" in mensagem:
+                registro["situacao"] = "tempo esgotado"
+                raise ConsultaRejeitada(f"Consulta interrompida após {self.timeout_s}s (tempo limite).") from e
+            registro["situacao"] = f"erro: {e.__class__.__name__}"
+            raise
+        finally:
+            registro["segundos"] = round(time.perf_counter() - inicio, 4)
+            with self._lock:
+                self.historico.append(registro)
+            custo = "" if registro["custo"] is None else f", custo estimado {registro['custo']:,.0f}"
+            truncado = " (truncado)" if registro["truncado"] else ""
+            logging.info(f"SQL [{registro['situacao']}] em {registro['segundos']:.3f}s, "
+                         f"{registro['linhas']} linhas{truncado}{custo}: {' '.join(sql.split())}")
+
+    def _ler_em_blocos(self, connection, sql, parametros):
+        # stream_results: cursor no servidor (quando o driver suporta), lido em blocos
+        resultado = connection.execution_options(stream_results=True).execute(text(sql), parametros or {})
+        try:
+            if not resultado.returns_rows:
+                return [], False
+            colunas = list(resultado.keys())
+            linhas = []
+            while len(linhas) <= self.max_linhas:
+                bloco = resultado.fetchmany(min(self.tamanho_bloco, self.max_linhas + 1 - len(linhas)))
+                if not bloco:
+                    break
+                linhas.extend(dict(zip(colunas, l)) for l in bloco)
+            truncado = len(linhas) > self.max_linhas
+            return linhas[:self.max_linhas], truncado
+        finally:
+            # Fecha o cursor sem ler o restante do resultado
+            resultado.close()
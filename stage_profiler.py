@@ -0,0 +1,183 @@
+# stage_profiler.py
+"""Instrumentação opcional das etapas quentes do dashboard.
+
+Cada etapa (carga, filtro de período, agregações do cubo, seções render_* e
+cada gráfico) registra o tempo de parede, o pico de memória alocada durante
+a etapa (tracemalloc) e o tamanho da saída: bytes do DataFrame ou do JSON
+da figura Plotly enviado ao navegador. Etapas podem ser aninhadas (um
+gráfico dentro de uma seção); o pico de memória da etapa externa inclui o
+das internas.
+
+Desligado, o perfilador não mede nada e não liga o tracemalloc. Ligado, o
+tracemalloc vale para o processo inteiro: com várias sessões simultâneas,
+os picos de memória são aproximados. Os perfiladores ativos são contados
+(referências fracas, sob um lock): o tracemalloc é ligado pelo primeiro e
+só é desligado quando nenhum perfilador ativo existe mais, nunca no meio da
+execução de outra sessão.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Se foi este módulo que ligou o tracemalloc (para desligá-lo quando o diagnóstico for desativado)
+_tracemalloc_proprio = False
+# Perfiladores ativos ainda vivos (o de uma sessão é liberado ao fim da execução do script)
+_perfiladores_ativos = weakref.WeakSet()
+_tracemalloc_lock = threading.Lock()
+
+
+def _ligar_tracemalloc(perfilador, ligar):
+    """Registra (ou remove) o perfilador ativo e liga ou desliga o tracemalloc conforme a contagem."""
+    global _tracemalloc_proprio
+    with _tracemalloc_lock:
+        if ligar:
+            _perfiladores_ativos.add(perfilador)
+        else:
+            _perfiladores_ativos.discard(perfilador)
+        if len(_perfiladores_ativos) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_proprio = True
+        elif not len(_perfiladores_ativos) and _tracemalloc_proprio:
+            # O tracemalloc deixa todo o processo mais lento; não fica ligado sem uso
+            tracemalloc.stop()
+            _tracemalloc_proprio = False
+
+
+def tamanho_saida(valor):
+    """Bytes da saída de uma etapa: DataFrame/Series (ou o DataFrame de um dataset) em memória
+    ou figura serializada em JSON; None para outros valores."""
+    if isinstance(getattr(valor, "df", None), pd.DataFrame):
+        valor = valor.df
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True))
+    if hasattr(valor, "to_json"):
+        return len(valor.to_json())
+    return None
+
+
+class PerfiladorEtapas:
+    """Registra tempo, memória alocada e tamanho da saída de cada etapa de uma execução."""
+
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self.registros = []
+        self._pilha = []
+        self._ids = 0
+        self._lock = threading.Lock()
+        _ligar_tracemalloc(self, ativo)
+
+    @contextmanager
+    def etapa(self, nome, tipo="etapa"):
+        """Mede o bloco; o `dict` entregue aceita a chave "saida" para registrar o tamanho da saída."""
+        info = {}
+        if not self.ativo:
+            yield info
+            return
+        if not tracemalloc.is_tracing():
+            # Desligado por código de fora deste módulo: liga de novo
+            _ligar_tracemalloc(self, True)
+        if self._pilha:
+            # O pico acumulado até aqui pertence à etapa externa, antes de zerar o pico para a interna
+            self._pilha[-1]["pico"] = max(self._pilha[-1]["pico"], tracemalloc.get_traced_memory()[1])
+        atual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        quadro = {"id": self._proximo_id(), "base": atual, "pico": atual}
+        self._pilha.append(quadro)
+        inicio = time.perf_counter()
+        try:
+            yield info
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._pilha.pop()
+            pico = max(quadro["pico"], tracemalloc.get_traced_memory()[1])
+            if self._pilha:
+                self._pilha[-1]["pico"] = max(self._pilha[-1]["pico"], pico)
+            tamanho = tamanho_saida(info["saida"]) if info.get("saida") is not None else None
+            registro = {
+                "id": quadro["id"],
+                "pai": self._pilha[-1]["id"] if self._pilha else None,
+                "etapa": nome,
+                "tipo": tipo,
+                "nivel": len(self._pilha),
+                "ms": round(segundos * 1000, 2),
+                "alocado_mb": round((pico - quadro["base"]) / 1024 ** 2, 3),
+                "saida_kb": None if tamanho is None else round(tamanho / 1024, 1),
+            }
+            with self._lock:
+                self.registros.append(registro)
+
+    def _proximo_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def medir(self, nome, funcao, *args, tipo="etapa", **kwargs):
+        """Executa `funcao(*args, **kwargs)` como uma etapa, registrando o tamanho do resultado."""
+        with self.etapa(nome, tipo) as info:
+            info["saida"] = resultado = funcao(*args, **kwargs)
+        return resultado
+
+    def tabela(self):
+        """Registros em ordem de início, com o tempo próprio (fora das etapas internas) de cada etapa.
+
+        Numa seção, o tempo próprio é o que não foi agregação nem envio de
+        gráfico: essencialmente a construção das figuras e os widgets.
+        """
+        colunas = ["etapa", "tipo", "nivel", "ms", "ms_proprio", "alocado_mb", "saida_kb"]
+        if not self.registros:
+            return pd.DataFrame(columns=colunas)
+        tabela = pd.DataFrame(self.registros).sort_values("id")
+        internas = tabela.groupby("pai")["ms"].sum()
+        tabela["ms_proprio"] = (tabela["ms"] - tabela["id"].map(internas).fillna(0)).round(2)
+        return tabela[colunas]
+
+    def como_json(self, **contexto):
+        return json.dumps({**contexto, "registros": self.registros}, ensure_ascii=False, default=str)
+
+    def anexar_log(self, caminho, **contexto):
+        """Acrescenta a execução como uma linha JSON ao arquivo (agregação entre sessões)."""
+        if not self.registros:
+            return
+        try:
+            with open(caminho, "a", encoding="utf-8") as f:
+                f.write(self.como_json(**contexto) + "\n")
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar o log de diagnóstico em '{caminho}': {e}")
+
+
+class CuboPerfilado:
+    """Envolve o cubo (ou a visão agregada) e mede cada agregação feita pelas seções."""
+
+    def __init__(self, cubo, perfilador):
+        self._cubo = cubo
+        self._perfilador = perfilador
+
+    def agregar(self, por, medidas, group_by=None):
+        nome = f"agregar({por}{', ' + group_by if group_by else ''}: {', '.join(medidas)})"
+        return self._perfilador.medir(nome, self._cubo.agregar, por, medidas, group_by, tipo="agregacao")
+
+    def total(self, medida):
+        return self._perfilador.medir(f"total({medida})", self._cubo.total, medida, tipo="agregacao")
+
+    def distintos(self, dimensao):
+        return self._perfilador.medir(f"distintos({dimensao})", self._cubo.distintos, dimensao, tipo="agregacao")
+
+    def momentos(self):
+        return self._perfilador.medir("momentos", self._cubo.momentos, tipo="agregacao")
+
+    def __getattr__(self, nome):
+        return getattr(self._cubo, nome)
+
+
+def ativo_por_padrao():
+    """NORTHWIND_PROFILE=1 liga o diagnóstico por padrão."""
+    return os.getenv("NORTHWIND_PROFILE", "").lower() in ("1", "true", "sim", "yes")
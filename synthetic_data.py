@@ -0,0 +1,205 @@
+# synthetic_data.py
+"""Gerador determinístico de dados sintéticos no formato da planilha Northwind.
+
+Os dados são uma reamostragem da planilha original em qualquer escala:
+
+- cada pedido sintético copia os atributos de um pedido original sorteado
+  (cliente, endereço de entrega, funcionário, transportadora, frete e os
+  prazos de entrega/envio, inclusive pedidos não enviados);
+- cada linha copia produto, preço, quantidade e desconto de uma linha
+  original sorteada, sem repetir produto dentro do mesmo pedido;
+- o número de linhas por pedido segue a distribuição original;
+- as datas seguem a curva acumulada de pedidos por dia da planilha
+  (tendência e sazonalidade), esticada para o período pedido.
+
+O esquema (colunas, nomes e tipos, inclusive as colunas "-2") é o mesmo da
+planilha. A geração é feita em blocos, com a mesma semente produzindo
+sempre os mesmos dados.
+
+Uso: python synthetic_data.py --linhas 1000000 --saida northwind_1m.parquet
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_BASE = "base_northwind.xlsx"
+DEFAULT_BLOCO = 1_000_000
+MAX_LINHAS_XLSX = 1_048_575  # Limite de linhas de uma planilha, sem o cabeçalho
+
+# Colunas que vêm da linha original (produto e itens do pedido)
+COLS_LINHA = ["product_id", "unit_price", "quantity", "discount"]
+# Colunas derivadas do próprio pedido sintético
+COLS_DATAS = ["order_date", "required_date", "shipped_date"]
+
+
+class PerfilNorthwind:
+    """Tabelas e distribuições extraídas da planilha original."""
+
+    def __init__(self, df):
+        df = df.sort_values(["order_id", "product_id"], kind="stable", ignore_index=True)
+        self.colunas = list(df.columns)
+        self.tipos = df.dtypes.to_dict()
+        # Textos como categóricos: os sorteios viram cópias de códigos inteiros
+        textos = [c for c in df.columns if df[c].dtype == object or pd.api.types.is_string_dtype(df[c])]
+        df = df.astype({c: "category" for c in textos})
+
+        colunas_produto = [c for c in self.colunas
+                           if c not in COLS_LINHA and df.groupby("product_id")[c].nunique(dropna=False).max() == 1
+                           and df.groupby("order_id")[c].nunique(dropna=False).max() > 1]
+        colunas_pedido = [c for c in self.colunas if c not in COLS_LINHA + COLS_DATAS + colunas_produto
+                          and not c.startswith("order_id")]
+        self.colunas_produto = colunas_produto
+
+        pedidos = df.groupby("order_id", sort=True).head(1).set_index("order_id")
+        self.pedidos = pedidos[colunas_pedido].reset_index(drop=True)
+        self.prazo_entrega = (pedidos["required_date"] - pedidos["order_date"]).to_numpy()
+        self.prazo_envio = (pedidos["shipped_date"] - pedidos["order_date"]).to_numpy()
+        self.linhas_por_pedido = df.groupby("order_id").size().to_numpy()
+
+        self.linhas = df[COLS_LINHA].reset_index(drop=True)
+        self.produtos = df.drop_duplicates("product_id").set_index("product_id")[colunas_produto]
+
+        # Curva acumulada de pedidos ao longo do período original (0 -> 1)
+        datas = pedidos["order_date"].to_numpy().astype("datetime64[D]")
+        self.inicio = pd.Timestamp(datas.min())
+        self.dias_originais = int((datas.max() - datas.min()).astype(int)) + 1
+        self._offsets = np.sort((datas - datas.min()).astype("int64"))
+        self.primeiro_pedido = int(df["order_id"].min())
+
+    @classmethod
+    def da_planilha(cls, caminho=ARQUIVO_BASE):
+        return cls(pd.read_excel(caminho, sheet_name=0))
+
+    def datas(self, quantis, dias):
+        """Datas dos pedidos para quantis em [0, 1), seguindo a curva original esticada para `dias`."""
+        n = len(self._offsets)
+        posicao = np.interp(quantis * (n - 1), np.arange(n), self._offsets)
+        return self.inicio + pd.to_timedelta(np.floor(posicao * dias / self.dias_originais), unit="D")
+
+
+def _sem_produtos_repetidos(rng, pedido_da_linha, indices, produtos_originais, tentativas=50):
+    """Sorteia de novo as linhas cujo produto se repete no mesmo pedido."""
+    for _ in range(tentativas):
+        chave = pd.DataFrame({"pedido": pedido_da_linha, "produto": produtos_originais[indices]})
+        repetidas = chave.duplicated().to_numpy()
+        if not repetidas.any():
+            break
+        indices[repetidas] = rng.integers(0, len(produtos_originais), int(repetidas.sum()))
+    return indices
+
+
+def gerar(perfil, n_linhas, seed=0, dias=None, bloco=DEFAULT_BLOCO):
+    """Gera `n_linhas` linhas de pedido em blocos (DataFrames com as colunas da planilha).
+
+    `dias` é a duração do período (padrão: a da planilha).
+    """
+    dias = dias or perfil.dias_originais
+    rng = np.random.default_rng([seed, 0])
+    # Linhas por pedido de todo o conjunto, para saber o número total de pedidos e datar cada um
+    media = perfil.linhas_por_pedido.mean()
+    linhas_por_pedido = rng.choice(perfil.linhas_por_pedido, int(n_linhas / media * 1.1) + 10)
+    acumulado = np.cumsum(linhas_por_pedido)
+    n_pedidos = int(np.searchsorted(acumulado, n_linhas)) + 1
+    linhas_por_pedido = linhas_por_pedido[:n_pedidos]
+    linhas_por_pedido[-1] -= int(acumulado[n_pedidos - 1] - n_linhas)
+    acumulado = np.concatenate([[0], np.cumsum(linhas_por_pedido)])
+
+    produtos_originais = perfil.linhas["product_id"].to_numpy()
+    pedido = 0
+    for numero_bloco in range(int(np.ceil(n_linhas / bloco))):
+        # Pedidos inteiros: o bloco termina no primeiro pedido que ultrapassa o limite
+        fim = int(np.searchsorted(acumulado, min((numero_bloco + 1) * bloco, n_linhas), side="left"))
+        if fim <= pedido:
+            continue
+        rng_bloco = np.random.default_rng([seed, numero_bloco + 1])
+        n_bloco = fim - pedido
+        contagem = linhas_por_pedido[pedido:fim]
+
+        origem = rng_bloco.integers(0, len(perfil.pedidos), n_bloco)
+        pedidos = perfil.pedidos.iloc[origem].reset_index(drop=True)
+        pedidos.insert(0, "order_id", np.arange(pedido, fim, dtype="int64") + perfil.primeiro_pedido)
+        datas = perfil.datas((np.arange(pedido, fim) + 0.5) / n_pedidos, dias).astype(perfil.tipos["order_date"])
+        pedidos["order_date"] = datas
+        pedidos["required_date"] = datas + pd.to_timedelta(perfil.prazo_entrega[origem])
+        pedidos["shipped_date"] = datas + pd.to_timedelta(perfil.prazo_envio[origem])
+
+        pedido_da_linha = np.repeat(np.arange(n_bloco), contagem)
+        indices = rng_bloco.integers(0, len(perfil.linhas), len(pedido_da_linha))
+        indices = _sem_produtos_repetidos(rng_bloco, pedido_da_linha, indices, produtos_originais)
+
+        linhas = pedidos.iloc[pedido_da_linha].reset_index(drop=True)
+        itens = perfil.linhas.iloc[indices].reset_index(drop=True)
+        for c in COLS_LINHA:
+            linhas[c] = itens[c]
+        produto = perfil.produtos.loc[itens["product_id"]].reset_index(drop=True)
+        for c in perfil.colunas_produto:
+            linhas[c] = produto[c]
+        # Colunas duplicadas da planilha (junções do SQL de origem)
+        for c in perfil.colunas:
+            if c.endswith("-2") and c not in linhas.columns and c[:-2] in linhas.columns:
+                linhas[c] = linhas[c[:-2]]
+        pedido = fim
+        yield linhas[perfil.colunas]
+
+
+def para_tipos_originais(df, perfil):
+    """Converte os categóricos de volta aos tipos da planilha (para gravar ou comparar)."""
+    return df.astype({c: t for c, t in perfil.tipos.items() if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+def salvar(blocos, caminho, perfil):
+    """Grava os blocos em .parquet (em streaming) ou .xlsx (até o limite de linhas de uma planilha)."""
+    total = 0
+    if caminho.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        escritor = None
+        try:
+            for df in blocos:
+                # Colunas de texto com números misturados (códigos postais) viram texto, como dicionário
+                df = df.assign(**{c: df[c].cat.rename_categories(str) for c in df.columns
+                                  if isinstance(df[c].dtype, pd.CategoricalDtype)})
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(caminho, tabela.schema)
+                escritor.write_table(tabela)
+                total += len(df)
+        finally:
+            if escritor is not None:
+                escritor.close()
+        return total
+
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(perfil.colunas)
+    for df in blocos:
+        total += len(df)
+        if total > MAX_LINHAS_XLSX:
+            raise ValueError(f"Uma planilha .xlsx comporta no máximo {MAX_LINHAS_XLSX:,} linhas; use .parquet.")
+        df = para_tipos_originais(df, perfil).astype(object).where(df.notna(), None)
+        for linha in df.itertuples(index=False, name=None):
+            ws.append([v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in linha])
+    wb.save(caminho)
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no formato da planilha Northwind.")
+    parser.add_argument("--linhas", type=int, required=True, help="Número de linhas de pedido")
+    parser.add_argument("--saida", required=True, help="Arquivo de saída (.parquet ou .xlsx)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente (mesma semente, mesmos dados)")
+    parser.add_argument("--dias", type=int, help="Duração do período em dias (padrão: a da planilha)")
+    parser.add_argument("--base", default=ARQUIVO_BASE, help="Planilha usada como perfil")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    perfil = PerfilNorthwind.da_planilha(args.base)
+    total = salvar(gerar(perfil, args.linhas, seed=args.seed, dias=args.dias), args.saida, perfil)
+    logging.info(f"{total:,} linhas gravadas em '{args.saida}' em {time.perf_counter() - inicio:.1f}s.")
@@ -0,0 +1,174 @@
+# tests/test_answer_cache.py
+"""Cache de respostas: TTL, invalidação pela versão dos dados e revalidação de todas as consultas."""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from answer_cache import CacheRespostas, consultar_cache, guardar_saida, normalizar_pergunta, versao_dados
+
+
+class BancoFalso:
+    """Substituto do SQLDatabase: resultados fixos por consulta, com contagem de execuções."""
+
+    def __init__(self, resultados):
+        self.resultados = resultados
+        self.executadas = []
+
+    def run(self, consulta):
+        self.executadas.append(consulta)
+        return self.resultados[consulta]
+
+
+def _saida(*passos, resposta="42 pedidos"):
+    acoes = [(SimpleNamespace(tool="sql_db_query", tool_input={"query": c}), r) for c, r in passos]
+    return {"output": resposta, "intermediate_steps": acoes}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheRespostas(str(tmp_path / "respostas.sqlite"), ttl=60)
+
+
+def test_normalizar_pergunta():
+    assert normalizar_pergunta("  Quantos PEDIDOS em São Paulo? ") == "quantos pedidos em sao paulo"
+
+
+def test_hit_com_mesma_versao(cache):
+    guardar_saida("Quantos pedidos?", _saida(("SELECT 1", "[(42,)]")), cache, "carga:1")
+    banco = BancoFalso({})
+    assert consultar_cache("quantos pedidos", banco, cache, "carga:1") == ("42 pedidos", "cache", ["SELECT 1"])
+    assert banco.executadas == []
+    assert cache.estatisticas()["hits"] == 1
+
+
+def test_ttl_expira(cache, monkeypatch):
+    guardar_saida("Quantos pedidos?", _saida(("SELECT 1", "[(42,)]")), cache, "carga:1")
+    agora = time.time()
+    monkeypatch.setattr("answer_cache.time.time", lambda: agora + 61)
+    assert cache.obter("Quantos pedidos?") is None
+    assert consultar_cache("Quantos pedidos?", BancoFalso({}), cache, "carga:1") is None
+    assert cache.estatisticas()["misses"] == 1
+
+
+def test_nova_versao_reexecuta_todas_as_consultas(cache):
+    saida = _saida(("SELECT a", "[(1,)]"), ("SELECT b", "[(2,)]"))
+    guardar_saida("Pergunta", saida, cache, "carga:1")
+
+    # Mesmos resultados: a resposta anterior continua valendo
+    banco = BancoFalso({"SELECT a": "[(1,)]", "SELECT b": "[(2,)]"})
+    assert consultar_cache("Pergunta", banco, cache, "carga:2") == ("42 pedidos", "sql", ["SELECT a", "SELECT b"])
+    assert banco.executadas == ["SELECT a", "SELECT b"]
+
+    # Só a primeira consulta muda: a resposta é refeita a partir de todos os resultados
+    banco = BancoFalso({"SELECT a": "[(9,)]", "SELECT b": "[(2,)]"})
+    resposta, origem, _ = consultar_cache("Pergunta", banco, cache, "carga:3")
+    assert origem == "sql" and resposta == "[(9,)]\n[(2,)]"
+    assert cache.obter("Pergunta")["resultados"] == ["[(9,)]", "[(2,)]"]
+
+
+def test_consulta_com_erro_volta_ao_agente(cache):
+    guardar_saida("Pergunta", _saida(("SELECT a", "[(1,)]"), ("SELECT b", "[(2,)]")), cache, "carga:1")
+
+    class BancoComErro(BancoFalso):
+        def run(self, consulta):
+            if consulta == "SELECT b":
+                raise RuntimeError("tabela removida")
+            return super().run(consulta)
+
+    assert consultar_cache("Pergunta", BancoComErro({"SELECT a": "[(1,)]"}), cache, "carga:2") is None
+
+
+def test_sem_consulta_nao_guarda(cache):
+    resposta, origem, consultas = guardar_saida("Oi", {"output": "Olá!", "intermediate_steps": []}, cache, "carga:1")
+    assert (resposta, origem, consultas) == ("Olá!", "agente", [])
+    assert cache.obter("Oi") is None
+
+
+def test_limite_de_entradas(tmp_path):
+    cache = CacheRespostas(str(tmp_path / "respostas.sqlite"), max_entradas=2)
+    for i in range(3):
+        guardar_saida(f"pergunta {i}", _saida((f"SELECT {i}", "[]")), cache, "carga:1")
+    assert cache.estatisticas()["entradas"] == 2
+    assert cache.obter("pergunta 0") is None
+
+
+# ==============================
+# SQLITE REAL E LLM FALSO
+# ==============================
+class LlmFalso:
+    """Registra cada chamada e responde com um texto numerado."""
+
+    def __init__(self):
+        self.chamadas = []
+
+    def invoke(self, prompt, config=None):
+        self.chamadas.append(prompt)
+        return SimpleNamespace(content=f"resposta atualizada {len(self.chamadas)}")
+
+
+@pytest.fixture
+def banco(tmp_path):
+    sql_database = pytest.importorskip("langchain_community.utilities.sql_database")
+    from sqlalchemy import create_engine, text
+
+    from load_data_to_sql import registrar_carga
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'northwind.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE northwind_data (order_id INTEGER, ship_country TEXT)"))
+        connection.execute(text("INSERT INTO northwind_data VALUES (1, 'Brazil'), (2, 'Brazil'), (3, 'France')"))
+        registrar_carga(connection, "completa", (None, 3), 3, 3)
+
+    def nova_carga(*linhas):
+        with engine.begin() as connection:
+            if linhas:
+                connection.execute(text("INSERT INTO northwind_data VALUES (:i, :p)"),
+                                   [{"i": i, "p": p} for i, p in linhas])
+            registrar_carga(connection, "incremental", (None, 3), len(linhas), len(linhas))
+
+    def versao():
+        with engine.connect() as connection:
+            return versao_dados(connection)
+
+    yield SimpleNamespace(db=sql_database.SQLDatabase(engine), nova_carga=nova_carga, versao=versao)
+    engine.dispose()
+
+
+CONSULTAS = ["SELECT COUNT(*) FROM northwind_data WHERE ship_country = 'Brazil'",
+             "SELECT COUNT(DISTINCT ship_country) FROM northwind_data"]
+
+
+def _responder_com_agente(banco, cache):
+    # Saída do agente: as duas consultas executadas de verdade no SQLite
+    passos = [(c, banco.db.run(c)) for c in CONSULTAS]
+    return guardar_saida("Pedidos do Brasil?", _saida(*passos, resposta="2 pedidos em 2 países"), cache,
+                         banco.versao())
+
+
+def test_nova_carga_com_resultados_diferentes_chama_o_llm_uma_vez(banco, cache):
+    _responder_com_agente(banco, cache)
+    banco.nova_carga((4, "Brazil"))
+    llm = LlmFalso()
+
+    resposta, origem, consultas = consultar_cache("Pedidos do Brasil?", banco.db, cache, banco.versao(), llm)
+    assert (resposta, origem, consultas) == ("resposta atualizada 1", "sql", CONSULTAS)
+    assert len(llm.chamadas) == 1
+    # O prompt traz a resposta anterior e os novos resultados de todas as consultas
+    assert "2 pedidos em 2 países" in llm.chamadas[0]
+    assert "[(3,)]" in llm.chamadas[0] and "[(2,)]" in llm.chamadas[0]
+
+    # Mesma versão: resposta atualizada servida do cache, sem LLM nem SQL
+    assert consultar_cache("pedidos do brasil", banco.db, cache, banco.versao(), llm) == (
+        "resposta atualizada 1", "cache", CONSULTAS)
+    assert len(llm.chamadas) == 1
+    assert cache.estatisticas()["hits"] == 1 and cache.estatisticas()["reexecucoes"] == 1
+
+
+def test_nova_carga_com_mesmos_resultados_nao_chama_o_llm(banco, cache):
+    _responder_com_agente(banco, cache)
+    banco.nova_carga()
+    llm = LlmFalso()
+    assert consultar_cache("Pedidos do Brasil?", banco.db, cache, banco.versao(), llm) == (
+        "2 pedidos em 2 países", "sql", CONSULTAS)
+    assert llm.chamadas == []
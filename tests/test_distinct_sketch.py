@@ -0,0 +1,29 @@
+# tests/test_distinct_sketch.py
+"""Contagens distintas por dia: bitmap exato e HyperLogLog contra o valor exato da janela."""
+import numpy as np
+import pytest
+
+from distinct_sketch import BitmapDiario, HllDiario
+
+
+@pytest.fixture
+def linhas():
+    rng = np.random.default_rng(0)
+    dias = rng.integers(0, 60, 20_000)
+    codigos = rng.integers(0, 5_000, 20_000)
+    return dias, codigos
+
+
+@pytest.mark.parametrize("i, j", [(0, 60), (10, 11), (5, 40), (30, 30)])
+def test_bitmap_exato(linhas, i, j):
+    dias, codigos = linhas
+    bitmap = BitmapDiario.construir(dias, codigos, 60, 5_000)
+    esperado = len(np.unique(codigos[(dias >= i) & (dias < j)]))
+    assert bitmap.contar(i, j) == esperado
+
+
+def test_hll_dentro_do_erro(linhas):
+    dias, codigos = linhas
+    hll = HllDiario.construir(dias, codigos, 60, erro=0.01)
+    esperado = len(np.unique(codigos))
+    assert hll.contar(0, 60) == pytest.approx(esperado, rel=0.05)
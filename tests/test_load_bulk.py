@@ -0,0 +1,49 @@
+# tests/test_load_bulk.py
+"""Carga bulk via staging: troca da tabela em uma única transação (SQLite em arquivo)."""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import load_data_to_sql
+from load_data_to_sql import carregar_bulk
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'northwind.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _carga(n):
+    return pd.DataFrame({"order_id": range(n), "product_name": [f"produto {i % 3}" for i in range(n)],
+                         "order_date": pd.date_range("2024-01-01", periods=n, freq="D")})
+
+
+def _linhas(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM northwind_data")).scalar()
+
+
+def test_troca_substitui_a_tabela(engine):
+    carregar_bulk(_carga(10), engine, "northwind_data")
+    carregar_bulk(_carga(25), engine, "northwind_data")
+    assert _linhas(engine) == 25
+    assert sorted(inspect(engine).get_table_names()) == ["northwind_data"]
+
+
+def test_falha_no_meio_da_troca_e_desfeita(engine, monkeypatch):
+    carregar_bulk(_carga(10), engine, "northwind_data")
+    renomear = load_data_to_sql._renomear
+
+    def renomear_com_falha(connection, origem, destino):
+        if origem.endswith("_staging"):
+            raise RuntimeError("falha simulada entre os dois renames")
+        renomear(connection, origem, destino)
+
+    monkeypatch.setattr(load_data_to_sql, "_renomear", renomear_com_falha)
+    with pytest.raises(RuntimeError):
+        carregar_bulk(_carga(25), engine, "northwind_data")
+    # O primeiro rename (northwind_data -> northwind_data_old) foi desfeito
+    assert _linhas(engine) == 10
+    assert "northwind_data_old" not in inspect(engine).get_table_names()
@@ -0,0 +1,106 @@
+# tests/test_load_incremental.py
+"""Carga incremental por watermark (order_date, order_id) em um SQLite em arquivo."""
+import pandas as pd
+import pytest
+from sqlalchemy import UnicodeText, create_engine, inspect, text
+
+from answer_cache import versao_dados
+from load_data_to_sql import LOAD_LOG_TABLE, TEXT_WIDTH, carregar_incremental, ler_watermark, tipos_sql
+
+
+def _pedidos(ids, inicio="2024-01-01"):
+    """Dois itens por pedido, um pedido por dia a partir de `inicio`."""
+    linhas = []
+    for n, pedido in enumerate(ids):
+        data = pd.Timestamp(inicio) + pd.Timedelta(days=n)
+        for produto in (1, 2):
+            linhas.append({"order_id": pedido, "product_id": produto, "order_date": data,
+                           "unit_price": 10.0, "quantity": produto, "discount": 0.0})
+    return pd.DataFrame(linhas)
+
+
+def _tabela(engine):
+    with engine.connect() as connection:
+        df = pd.read_sql(text("SELECT order_id, product_id, quantity FROM northwind_data"), connection)
+    return df.sort_values(["order_id", "product_id"]).reset_index(drop=True)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'northwind.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_primeira_carga_e_completa(engine):
+    carregar_incremental(_pedidos(range(1, 31)), engine)
+    assert len(_tabela(engine)) == 60
+    with engine.connect() as connection:
+        assert connection.execute(text(f"SELECT mode FROM {LOAD_LOG_TABLE}")).scalars().all() == ["completa"]
+        assert ler_watermark(connection) == (pd.Timestamp("2024-01-30"), 30)
+
+
+def test_novos_e_alterados_dentro_do_lookback(engine):
+    base = _pedidos(range(1, 31))
+    carregar_incremental(base, engine)
+
+    novo = base.copy()
+    # Pedido recente alterado (dentro do lookback) e pedido antigo alterado (fora dele)
+    novo.loc[novo["order_id"] == 28, "quantity"] = 99
+    novo.loc[novo["order_id"] == 2, "quantity"] = 77
+    novo = pd.concat([novo, _pedidos([31, 32], inicio="2024-01-31")], ignore_index=True)
+    carregar_incremental(novo, engine, lookback_days=7)
+
+    tabela = _tabela(engine)
+    assert len(tabela) == 64
+    assert (tabela.loc[tabela["order_id"] == 28, "quantity"] == 99).all()
+    # Fora da janela de lookback o pedido não é reprocessado
+    assert (tabela.loc[tabela["order_id"] == 2, "quantity"] != 77).all()
+    assert not tabela.duplicated(["order_id", "product_id"]).any()
+    with engine.connect() as connection:
+        assert ler_watermark(connection) == (pd.Timestamp("2024-02-01"), 32)
+        modo, inseridas, removidas, pedidos = connection.execute(text(
+            f"SELECT mode, rows_inserted, rows_deleted, orders_affected FROM {LOAD_LOG_TABLE} "
+            "ORDER BY load_id DESC LIMIT 1")).one()
+    # Pedidos 23 a 30 (lookback a partir de 23/01) mais os dois novos
+    assert (modo, pedidos) == ("incremental", 10)
+    assert (inseridas, removidas) == (20, 16)
+
+
+def test_reexecucao_sem_mudancas_nao_grava(engine):
+    base = _pedidos(range(1, 11))
+    assert carregar_incremental(base, engine)
+    antes = _tabela(engine)
+    with engine.connect() as connection:
+        versao = versao_dados(connection)
+    # Os pedidos do lookback são relidos, mas estão iguais no banco: nada é gravado nem registrado
+    assert not carregar_incremental(base, engine)
+    pd.testing.assert_frame_equal(_tabela(engine), antes)
+    with engine.connect() as connection:
+        assert versao_dados(connection) == versao
+        assert not connection.dialect.has_table(connection, "northwind_data_delta")
+
+
+def test_texto_tem_largura_fixa():
+    tipos = tipos_sql(pd.DataFrame({"curto": ["ab", None], "longo": ["x" * (TEXT_WIDTH + 1), "y"]}))
+    # A largura não depende da amostra: só vira texto sem limite se a planilha já passar dela
+    assert tipos["curto"].length == TEXT_WIDTH
+    assert isinstance(tipos["longo"], UnicodeText)
+
+
+def test_strings_maiores_na_incremental_alargam_a_coluna(engine, caplog):
+    base = _pedidos(range(1, 11)).assign(product_name="Chai")
+    carregar_incremental(base, engine)
+    with engine.connect() as connection:
+        colunas = {c["name"]: c["type"] for c in inspect(connection).get_columns("northwind_data")}
+    assert colunas["product_name"].length == TEXT_WIDTH
+
+    longo = "Produto " * 1000
+    novo = _pedidos([11], inicio="2024-01-11").assign(product_name=longo)
+    with caplog.at_level("WARNING"):
+        assert carregar_incremental(pd.concat([base, novo], ignore_index=True), engine)
+    assert "['product_name']" in caplog.text
+    with engine.connect() as connection:
+        gravados = connection.execute(text(
+            "SELECT DISTINCT product_name FROM northwind_data WHERE order_id = 11")).scalars().all()
+    assert gravados == [longo]
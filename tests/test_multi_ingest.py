@@ -0,0 +1,27 @@
+# tests/test_multi_ingest.py
+"""Leitura de várias planilhas no pool de processos, com o pico de RSS de cada worker."""
+import pandas as pd
+import pytest
+
+from multi_ingest import ler_arquivos, ler_planilha_completa
+
+
+@pytest.fixture
+def planilha(tmp_path):
+    caminho = tmp_path / "pedidos.xlsx"
+    with pd.ExcelWriter(caminho) as writer:
+        for n, nome in enumerate(["jan", "fev"]):
+            pd.DataFrame({"order_id": [n * 10 + 1, n * 10 + 2], "product_id": [1, 2],
+                          "quantity": [3, 4]}).to_excel(writer, sheet_name=nome, index=False)
+    return str(caminho)
+
+
+@pytest.mark.parametrize("processos", [1, 2])
+def test_leituras_trazem_o_pico_de_rss_dos_workers(planilha, processos):
+    df, leituras = ler_arquivos([("pedidos.xlsx", planilha)], ler=ler_planilha_completa, processos=processos)
+    assert sorted(df["order_id"]) == [1, 2, 11, 12]
+    assert list(leituras["planilha"]) == ["jan", "fev"]
+    # O pico vem das estatísticas de cada leitura (no worker), não do processo principal
+    assert (leituras["pico_rss_mb"] > 0).all()
+    assert leituras.attrs["pico_rss_mb"] == leituras["pico_rss_mb"].max()
+    assert leituras.attrs["processos"] == processos
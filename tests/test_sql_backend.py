@@ -0,0 +1,67 @@
+# tests/test_sql_backend.py
+"""CuboSql (consultas no banco) deve responder como o CuboDiario (em memória) sobre os mesmos dados."""
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import MetaData, Table, create_engine
+
+from load_data_to_sql import carregar_bulk, limpar_colunas
+from rollup import DIMENSOES_PEDIDO, MEDIAS, MEDIDAS, CuboDiario
+from sql_backend import CuboSql
+from xlsx_ingest import processar_dados
+
+JANELAS = [(None, None), ("1997-01-01", "1997-06-30"), ("1998-04-01", "1998-04-01")]
+
+
+@pytest.fixture(scope="module")
+def cubos(tmp_path_factory):
+    bruto = pd.read_excel("base_northwind.xlsx")
+    df = processar_dados(bruto.copy())
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('sql') / 'northwind.db'}")
+    carregar_bulk(limpar_colunas(bruto), engine, "northwind_data")
+    tabela = Table("northwind_data", MetaData(), autoload_with=engine)
+    yield CuboDiario.construir(df), CuboSql(engine, tabela)
+    engine.dispose()
+
+
+def _janela(cubos, inicio, fim):
+    if inicio is None:
+        return cubos
+    return tuple(cubo.fatiar(pd.Timestamp(inicio), pd.Timestamp(fim)) for cubo in cubos)
+
+
+@pytest.mark.parametrize("inicio, fim", JANELAS)
+def test_totais(cubos, inicio, fim):
+    memoria, sql = _janela(cubos, inicio, fim)
+    for medida in [*MEDIDAS, *MEDIAS, "n_pedidos"]:
+        if memoria.tem(medida):
+            assert sql.total(medida) == pytest.approx(memoria.total(medida), rel=1e-6, nan_ok=True), medida
+    for dimensao in ["product_name", "company_name", "ship_country"]:
+        assert sql.distintos(dimensao) == memoria.distintos(dimensao), dimensao
+
+
+@pytest.mark.parametrize("inicio, fim", JANELAS)
+@pytest.mark.parametrize("por", ["product_name", "category_name", "company_name", "ship_country"])
+def test_agregar_por_dimensao(cubos, inicio, fim, por):
+    memoria, sql = _janela(cubos, inicio, fim)
+    # Pedidos distintos só são aditivos nas dimensões do pedido (cliente, país)
+    medidas = ["revenue", "quantity", "discount"] + (["n_pedidos"] if por in DIMENSOES_PEDIDO else [])
+    esperado = memoria.agregar(por, medidas).astype({por: str}).sort_values(por).reset_index(drop=True)
+    obtido = sql.agregar(por, medidas).astype({por: str}).sort_values(por).reset_index(drop=True)
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False, rtol=1e-6)
+
+
+@pytest.mark.parametrize("group_by", ["Dia", "Mês", "Ano"])
+def test_agregar_por_periodo(cubos, group_by):
+    memoria, sql = _janela(cubos, *JANELAS[1])
+    esperado = memoria.agregar("periodo", ["revenue", "freight_mean"], group_by)
+    obtido = sql.agregar("periodo", ["revenue", "freight_mean"], group_by)
+    assert list(map(str, obtido["periodo"])) == list(map(str, esperado["periodo"]))
+    np.testing.assert_allclose(obtido[["revenue", "freight_mean"]], esperado[["revenue", "freight_mean"]],
+                               rtol=1e-6)
+
+
+def test_vazio(cubos):
+    memoria, sql = cubos
+    assert sql.vazio().empty and memoria.vazio().empty
+    assert sql.vazio().total("revenue") == 0
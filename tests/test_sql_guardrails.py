@@ -0,0 +1,108 @@
+# tests/test_sql_guardrails.py
+"""Verificação de leitura e execução protegida do agente SQL, em um SQLite em arquivo."""
+import logging
+import re
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import sql_guardrails
+from sql_guardrails import ConsultaRejeitada, ExecutorProtegido, validar_leitura
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'northwind.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE northwind_data (order_id INTEGER, product_name TEXT)"))
+        connection.execute(text("INSERT INTO northwind_data VALUES (:i, :p)"),
+                           [{"i": i, "p": f"produto {i % 7}"} for i in range(50)])
+    yield engine
+    engine.dispose()
+
+
+def _contar(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM northwind_data")).scalar()
+
+
+CTE_DELETE = ("WITH x AS (SELECT 1) DELETE FROM northwind_data "
+              "WHERE order_id IN (SELECT order_id FROM northwind_data LIMIT 5)")
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM northwind_data",
+    CTE_DELETE,
+    "SELECT * INTO copia FROM northwind_data",
+    "SELECT 1; DROP TABLE northwind_data",
+    "SELECT 1 /* ; */; DELETE FROM northwind_data",
+])
+def test_validar_leitura_rejeita_escrita(sql):
+    with pytest.raises(ConsultaRejeitada):
+        validar_leitura(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT ';' AS separador",
+    "SELECT 'delete' AS acao FROM northwind_data;",
+    "-- comentário\nWITH t AS (SELECT order_id FROM northwind_data) SELECT COUNT(*) FROM t",
+    "SELECT REPLACE(product_name, ' ', '_') FROM northwind_data",
+])
+def test_validar_leitura_aceita_leitura(sql):
+    assert validar_leitura(sql)
+
+
+def test_cte_delete_nao_apaga_linhas(engine):
+    with pytest.raises(ConsultaRejeitada):
+        ExecutorProtegido(engine).executar(CTE_DELETE)
+    assert _contar(engine) == 50
+
+
+def test_banco_bloqueia_escrita_sem_validacao_do_texto(engine, monkeypatch):
+    # Mesmo se a verificação do texto deixar passar, a transação é somente leitura
+    monkeypatch.setattr(sql_guardrails, "validar_leitura", lambda sql: sql)
+    executor = ExecutorProtegido(engine, custo_maximo=None)
+    with pytest.raises(ConsultaRejeitada):
+        executor.executar(CTE_DELETE)
+    assert _contar(engine) == 50
+    # A conexão volta ao pool com escrita liberada
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM northwind_data WHERE order_id = 0"))
+    assert _contar(engine) == 49
+
+
+def test_executar_limita_linhas(engine, caplog):
+    caplog.set_level(logging.INFO)
+    executor = ExecutorProtegido(engine, max_linhas=10, tamanho_bloco=4)
+    linhas, truncado = executor.executar("SELECT * FROM northwind_data ORDER BY order_id")
+    assert len(linhas) == 10 and truncado
+    assert [l["order_id"] for l in linhas] == list(range(10))
+    linhas, truncado = executor.executar("SELECT ';' AS separador")
+    assert linhas == [{"separador": ";"}] and not truncado
+    # Uma linha por comando no histórico, com duração e número de linhas
+    assert [(r["linhas"], r["truncado"], r["situacao"]) for r in executor.historico] == [
+        (10, True, "ok"), (1, False, "ok")]
+    assert all(r["segundos"] >= 0 for r in executor.historico)
+    assert re.search(r"SQL \[ok\] em \d+\.\d{3}s, 10 linhas \(truncado\)", caplog.text)
+
+
+def test_custo_acima_do_orcamento(engine):
+    # Produto cartesiano: 50 x 50 x 50 linhas estimadas, acima do orçamento de 10 mil
+    executor = ExecutorProtegido(engine, custo_maximo=10_000)
+    with pytest.raises(ConsultaRejeitada, match="Custo estimado"):
+        executor.executar("SELECT COUNT(*) FROM northwind_data a, northwind_data b, northwind_data c")
+    assert executor.historico[-1]["custo"] == 50 ** 3
+    assert executor.historico[-1]["situacao"].startswith("rejeitada")
+    # Dentro do orçamento, a mesma tabela sem a junção passa
+    assert executor.executar("SELECT COUNT(*) AS n FROM northwind_data")[0] == [{"n": 50}]
+
+
+def test_tempo_limite_interrompe(engine):
+    executor = ExecutorProtegido(engine, timeout_s=0.05, custo_maximo=None)
+    with pytest.raises(ConsultaRejeitada, match="tempo limite"):
+        executor.executar("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+                          "SELECT COUNT(*) FROM n")
+    assert executor.historico[-1]["situacao"] == "tempo esgotado"
+    assert executor.historico[-1]["segundos"] < 5
+    # A conexão continua utilizável depois da interrupção
+    assert executor.executar("SELECT COUNT(*) AS n FROM northwind_data")[0] == [{"n": 50}]
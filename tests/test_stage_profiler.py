@@ -0,0 +1,48 @@
+# tests/test_stage_profiler.py
+"""Perfilador de etapas: medições e controle do tracemalloc entre sessões."""
+import gc
+import tracemalloc
+
+import pytest
+
+from stage_profiler import PerfiladorEtapas
+
+
+@pytest.fixture(autouse=True)
+def sem_tracemalloc():
+    gc.collect()
+    yield
+    gc.collect()
+    PerfiladorEtapas(ativo=False)
+    assert not tracemalloc.is_tracing()
+
+
+def test_inativo_nao_mede():
+    perfilador = PerfiladorEtapas(ativo=False)
+    assert perfilador.medir("soma", sum, [1, 2, 3]) == 6
+    assert perfilador.registros == []
+    assert not tracemalloc.is_tracing()
+
+
+def test_etapas_aninhadas():
+    perfilador = PerfiladorEtapas(ativo=True)
+    with perfilador.etapa("secao", tipo="secao"):
+        perfilador.medir("lista", lambda: list(range(100_000)))
+    tabela = perfilador.tabela()
+    assert list(tabela["etapa"]) == ["secao", "lista"]
+    assert list(tabela["nivel"]) == [0, 1]
+    assert tabela["alocado_mb"].iloc[0] >= tabela["alocado_mb"].iloc[1] > 0
+
+
+def test_outra_sessao_nao_desliga_o_tracemalloc():
+    ativa = PerfiladorEtapas(ativo=True)
+    with ativa.etapa("secao"):
+        # Outra sessão renderiza com o diagnóstico desligado no meio da etapa
+        PerfiladorEtapas(ativo=False)
+        assert tracemalloc.is_tracing()
+    assert tracemalloc.is_tracing()
+    # Sem perfiladores ativos vivos, a próxima sessão desligada desliga o tracemalloc
+    del ativa
+    gc.collect()
+    PerfiladorEtapas(ativo=False)
+    assert not tracemalloc.is_tracing()
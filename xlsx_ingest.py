@@ -0,0 +1,234 @@
+# xlsx_ingest.py
+"""Leitura e limpeza da planilha Northwind com tipos compactos.
+
+`ler_xlsx_streaming` percorre a planilha em blocos de linhas com o modo
+read-only do openpyxl e monta apenas as colunas essenciais, já no tipo
+final (categorias, inteiros reduzidos, float32), sem passar por um
+DataFrame intermediário com todas as colunas como object.
+"""
+import logging
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Versão da lógica de limpeza – incremente ao alterar este módulo (ou multi_ingest) para invalidar o cache em disco
+# 3: cada entrada do cache reúne todas as planilhas de pedidos do arquivo
+VERSAO_ESQUEMA = 3
+
+# Colunas essenciais (incluindo "revenue", derivada)
+COLS_ESSENCIAIS = [
+    "order_id", "customer_id", "order_date", "required_date", "shipped_date",
+    "freight", "ship_country", "product_id", "product_name", "unit_price",
+    "quantity", "discount", "company_name", "category_name", "revenue"
+]
+COLS_DATA = ["order_date", "required_date", "shipped_date"]
+COLS_CATEGORIA = ["customer_id", "company_name", "product_name", "category_name", "ship_country"]
+COLS_INTEIRO = ["order_id", "product_id", "quantity"]
+COLS_FLOAT = ["freight", "unit_price", "discount"]
+
+# Erro máximo aceito ao converter valores monetários/percentuais para float32
+TOLERANCIA_FLOAT32 = 1e-4
+
+
+def rss_atual_mb():
+    """RSS atual do processo em MB (Linux); usa o pico do processo como aproximação nos demais sistemas."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * resource.getpagesize() / 1024 ** 2
+    except (OSError, AttributeError, ValueError):
+        return pico_rss_mb()
+
+
+def pico_rss_mb():
+    """Pico de RSS do processo desde o início, em MB."""
+    if resource is None:
+        return float("nan")
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def _compactar_inteiro(valores):
+    serie = pd.to_numeric(pd.Series(valores), errors="coerce")
+    if serie.isna().any():
+        return serie.astype("float32") if _cabe_em_float32(serie) else serie
+    return pd.to_numeric(serie.astype("int64"), downcast="integer")
+
+
+def _cabe_em_float32(serie):
+    valores = serie.to_numpy(dtype="float64", na_value=np.nan)
+    convertidos = valores.astype("float32").astype("float64")
+    return bool(np.nanmax(np.abs(valores - convertidos), initial=0) <= TOLERANCIA_FLOAT32)
+
+
+def _compactar_float(valores):
+    serie = pd.to_numeric(pd.Series(valores), errors="coerce").astype("float64")
+    return serie.astype("float32") if _cabe_em_float32(serie) else serie
+
+
+def compactar_tipos(df):
+    """Converte as colunas conhecidas para tipos compactos (in-place) e retorna o DataFrame."""
+    for col in df.columns:
+        if col in COLS_CATEGORIA:
+            df[col] = df[col].astype("category")
+        elif col in COLS_INTEIRO:
+            df[col] = _compactar_inteiro(df[col].to_numpy()).to_numpy()
+        elif col in COLS_FLOAT:
+            df[col] = _compactar_float(df[col].to_numpy()).to_numpy()
+    return df
+
+
+def processar_dados(df_raw):
+    """Limpa um DataFrame lido com pd.read_excel (caminho não-streaming)."""
+    # Remover colunas redundantes (com "-2" no nome)
+    df_raw = df_raw.loc[:, ~df_raw.columns.str.contains('-2')]
+
+    # Converter colunas de data (se existirem)
+    for col in COLS_DATA:
+        if col in df_raw.columns:
+            df_raw[col] = pd.to_datetime(df_raw[col], errors="coerce")
+
+    # Calcular receita: unit_price * quantity * (1 - discount)
+    if all(col in df_raw.columns for col in ["unit_price", "quantity", "discount"]):
+        df_raw["revenue"] = df_raw["unit_price"] * df_raw["quantity"] * (1 - df_raw["discount"])
+    else:
+        df_raw["revenue"] = 0
+
+    df = df_raw[[c for c in COLS_ESSENCIAIS if c in df_raw.columns]].copy()
+    return compactar_tipos(df)
+
+
+class _ColunaCategoria:
+    """Acumula códigos int32 e o dicionário de categorias à medida que os blocos chegam."""
+
+    def __init__(self):
+        self.mapa = {}
+        self.partes = []
+
+    def adicionar(self, valores):
+        mapa = self.mapa
+        codigos = np.empty(len(valores), dtype="int32")
+        for i, v in enumerate(valores):
+            if v is None:
+                codigos[i] = -1
+                continue
+            codigo = mapa.get(v)
+            if codigo is None:
+                codigo = mapa[v] = len(mapa)
+            codigos[i] = codigo
+        self.partes.append(codigos)
+
+    def finalizar(self):
+        codigos = np.concatenate(self.partes) if self.partes else np.empty(0, dtype="int32")
+        categorias = list(self.mapa)
+        # Reordena as categorias em ordem alfabética (mesma ordem de astype("category"))
+        ordem = sorted(range(len(categorias)), key=lambda i: str(categorias[i]))
+        remap = np.empty(len(categorias) + 1, dtype="int32")
+        remap[-1] = -1
+        remap[np.array(ordem, dtype="int64")] = np.arange(len(ordem), dtype="int32")
+        return pd.Categorical.from_codes(remap[codigos], categories=[categorias[i] for i in ordem])
+
+
+class _ColunaValores:
+    """Acumula blocos já convertidos (datas ou números) para concatenação no final."""
+
+    def __init__(self, converter):
+        self.converter = converter
+        self.partes = []
+
+    def adicionar(self, valores):
+        self.partes.append(self.converter(valores))
+
+    def finalizar(self):
+        return np.concatenate(self.partes) if self.partes else np.empty(0)
+
+
+def _para_data(valores):
+    return pd.to_datetime(pd.Series(valores, dtype="object"), errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+def _para_float64(valores):
+    return pd.to_numeric(pd.Series(valores, dtype="object"), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def ler_xlsx_streaming(fonte, sheet_name=0, bloco=50_000):
+    """Lê a planilha em blocos de `bloco` linhas e retorna (df, estatisticas).
+
+    `fonte` pode ser um caminho ou um objeto arquivo. `estatisticas` traz o
+    número de linhas, o tempo gasto e o pico de RSS observado durante a leitura.
+    """
+    from openpyxl import load_workbook
+
+    inicio = time.perf_counter()
+    pico_rss = rss_atual_mb()
+    wb = load_workbook(fonte, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if isinstance(sheet_name, str) else wb.worksheets[sheet_name]
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = next(linhas, None) or ()
+        # Apenas as colunas essenciais são extraídas; as colunas "-2" ficam de fora naturalmente
+        indices = {c: i for i, c in enumerate(cabecalho) if c in COLS_ESSENCIAIS and c != "revenue"}
+
+        colunas = {}
+        for col in indices:
+            if col in COLS_CATEGORIA:
+                colunas[col] = _ColunaCategoria()
+            elif col in COLS_DATA:
+                colunas[col] = _ColunaValores(_para_data)
+            else:
+                # Numéricos ficam em float64 por bloco; o tipo compacto é decidido no final
+                colunas[col] = _ColunaValores(_para_float64)
+        tem_receita = all(c in indices for c in ["unit_price", "quantity", "discount"])
+        receita = []
+        n_linhas = 0
+
+        while True:
+            buffer = [linha for _, linha in zip(range(bloco), linhas)]
+            if not buffer:
+                break
+            n_linhas += len(buffer)
+            for col, i in indices.items():
+                colunas[col].adicionar([linha[i] if i < len(linha) else None for linha in buffer])
+            if tem_receita:
+                # A receita é calculada em float64 antes da compactação dos preços
+                preco, qtd, desc = (colunas[c].partes[-1] for c in ["unit_price", "quantity", "discount"])
+                receita.append(preco * qtd * (1 - desc))
+            del buffer
+            pico_rss = max(pico_rss, rss_atual_mb())
+    finally:
+        wb.close()
+
+    dados = {}
+    for col in COLS_ESSENCIAIS:
+        if col == "revenue":
+            dados[col] = np.concatenate(receita) if receita else np.zeros(n_linhas, dtype="int64")
+        elif col in colunas:
+            valores = colunas.pop(col).finalizar()
+            if col in COLS_INTEIRO:
+                valores = _compactar_inteiro(valores).to_numpy()
+            elif col in COLS_FLOAT:
+                valores = _compactar_float(valores).to_numpy()
+            dados[col] = valores
+        pico_rss = max(pico_rss, rss_atual_mb())
+    df = pd.DataFrame(dados)
+    pico_rss = max(pico_rss, rss_atual_mb())
+
+    estatisticas = {
+        "linhas": n_linhas,
+        "segundos": time.perf_counter() - inicio,
+        "pico_rss_mb": pico_rss,
+        "memoria_df_mb": df.memory_usage(deep=True).sum() / 1024 ** 2,
+    }
+    logging.info(
+        f"Leitura streaming concluída: {n_linhas} linhas em {estatisticas['segundos']:.1f}s, "
+        f"DataFrame {estatisticas['memoria_df_mb']:.1f} MB, pico de RSS {pico_rss:.1f} MB."
+    )
+    return df, estatisticas